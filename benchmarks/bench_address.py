@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:10:26 2026
+Benchmarks for address cleaning, matching and resolving matches.
+@author: LiRogers
+"""
+
+from hmo_identifier.process import address, resolve
+from . import synthetic
+
+
+def _gazatteer_addresses(n: int):
+    """
+    Gazatteer prepared for matching on geo_address and dp_address, as in
+    notebook 02.
+    """
+    gaz = synthetic.postcode_addresses(synthetic.gazatteer(n))
+    gaz_geo = (
+        address.match_prep(gaz.drop(columns="dp_address"), add_var="geo_address")
+        .rename(columns={"clean_address": "clean_address_geo", "numbers": "numbers_geo"})
+    )
+    gaz_dp = (
+        address.match_prep(
+            gaz.loc[gaz.dp_address.notna()].drop(columns="geo_address"),
+            add_var="dp_address",
+        )
+        .rename(columns={"clean_address": "clean_address_dp", "numbers": "numbers_dp"})
+    )
+
+    return gaz_geo.merge(gaz_dp, how="outer", on=["uprn", "postcode"]).fillna("")
+
+
+class MatchPrep:
+    params = synthetic.SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.epc = synthetic.epc(n)
+
+    def time_match_prep(self, n):
+        address.match_prep(self.epc, add_var="address")
+
+    def peakmem_match_prep(self, n):
+        address.match_prep(self.epc, add_var="address")
+
+
+class CandidateMatches:
+    params = synthetic.SIZES
+    param_names = ["n"]
+    timeout = 600
+
+    def setup(self, n):
+        self.gaz = _gazatteer_addresses(n)
+        self.epc = address.match_prep(synthetic.epc(n), add_var="address")
+        self.kwargs = dict(
+            ref=self.gaz,
+            ref_id="uprn",
+            ref_addresses=["clean_address_geo", "clean_address_dp"],
+            add=self.epc,
+            add_id="brn",
+            add_addresses=["clean_address"],
+        )
+
+    def time_candidate_pairs(self, n):
+        address.candidate_pairs(**self.kwargs)
+
+    def peakmem_candidate_pairs(self, n):
+        address.candidate_pairs(**self.kwargs)
+
+    def time_candidate_matches(self, n):
+        address.candidate_matches(**self.kwargs)
+
+    def peakmem_candidate_matches(self, n):
+        address.candidate_matches(**self.kwargs)
+
+
+class StructuredMatches:
+    params = synthetic.SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.gaz = synthetic.gazatteer(n)
+        self.lr = synthetic.land_registry(n)
+
+    def time_structured_matches(self, n):
+        address.structured_matches(self.gaz, "uprn", self.lr, "trans_id")
+
+    def peakmem_structured_matches(self, n):
+        address.structured_matches(self.gaz, "uprn", self.lr, "trans_id")
+
+
+class CleanEstateName:
+    params = synthetic.SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.estates = synthetic.estates(n)
+
+    def time_clean_estate_name(self, n):
+        address.clean_estate_name(self.estates)
+
+    def peakmem_clean_estate_name(self, n):
+        address.clean_estate_name(self.estates)
+
+
+def _labelled_candidates(n: int) -> tuple:
+    """
+    Candidate matches of EPC onto the gazatteer, with a simple score and
+    whether each candidate is a true match.
+    """
+    gaz = _gazatteer_addresses(n)
+    epc = address.match_prep(synthetic.epc(n), add_var="address")
+    candidates = address.candidate_matches(
+        ref=gaz, ref_id="uprn",
+        ref_addresses=["clean_address_geo", "clean_address_dp"],
+        add=epc, add_id="brn", add_addresses=["clean_address"],
+    )
+    scores = candidates[resolve.match_features(candidates)].mean(axis=1).values
+    # EPC brn is the udprn of the address the certificate was made from
+    udprn = synthetic.gazatteer(n).set_index("uprn").udprn.astype(str)
+    labels = candidates.uprn.map(udprn).values == candidates.brn.values
+
+    return candidates, scores, labels
+
+
+class Train:
+    params = ([n for n in synthetic.SIZES if n <= synthetic.CAMDEN],
+              ["logistic", "boosting"])
+    param_names = ["n", "method"]
+    timeout = 600
+
+    def setup(self, n, method):
+        self.candidates, _, self.labels = _labelled_candidates(n)
+
+    def time_train(self, n, method):
+        resolve.train(self.candidates, self.labels, method=method)
+
+
+class Score:
+    params = synthetic.PAIRS
+    param_names = ["n_pairs"]
+    timeout = 600
+
+    def setup(self, n_pairs):
+        self.candidates, labels = synthetic.candidate_pairs(n_pairs)
+        self.model = resolve.train(self.candidates.iloc[:100000], labels[:100000])
+
+    def time_score(self, n_pairs):
+        resolve.score(self.model, self.candidates)
+
+    def peakmem_score(self, n_pairs):
+        resolve.score(self.model, self.candidates)
+
+
+class Resolve:
+    params = (synthetic.PAIRS, ["greedy", "hungarian"])
+    param_names = ["n_pairs", "method"]
+    timeout = 1200
+
+    def setup(self, n_pairs, method):
+        self.candidates, labels = synthetic.candidate_pairs(n_pairs)
+        model = resolve.train(self.candidates.iloc[:100000], labels[:100000])
+        self.scores = resolve.score(model, self.candidates)
+
+    def time_resolve(self, n_pairs, method):
+        resolve.resolve(self.candidates, self.scores, "uprn", "brn", method=method)
+
+    def peakmem_resolve(self, n_pairs, method):
+        resolve.resolve(self.candidates, self.scores, "uprn", "brn", method=method)
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:24:13 2026
+Benchmarks for data typing and feature generation.
+@author: LiRogers
+"""
+
+import io
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from hmo_identifier.data import open, utils
+from hmo_identifier.process import features, latest
+from . import synthetic
+
+
+class TypeEpc:
+    params = synthetic.SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.epc = synthetic.epc(n)
+        # Pages of CSV as the EPC API returns them
+        page_size = max(len(self.epc) // 10, 1)
+        self.pages = [
+            self.epc.iloc[i:i + page_size].to_csv(index=False)
+            for i in range(0, len(self.epc), page_size)
+        ]
+
+    def load_untyped(self):
+        # Every column as strings, as open.epc read pages before typing
+        return pd.concat(
+            [pd.read_csv(io.StringIO(page), dtype=str) for page in self.pages]
+        )
+
+    def load_typed(self):
+        # Each page typed as it arrives, as open.epc does now
+        return utils.concat_categorical(
+            [
+                open.type_epc(pd.read_csv(io.StringIO(page), dtype=str))
+                for page in self.pages
+            ]
+        )
+
+    def time_type_epc(self, n):
+        open.type_epc(self.epc)
+
+    def peakmem_type_epc(self, n):
+        open.type_epc(self.epc)
+
+    def time_load_untyped(self, n):
+        self.load_untyped()
+
+    def peakmem_load_untyped(self, n):
+        self.load_untyped()
+
+    def time_load_typed(self, n):
+        self.load_typed()
+
+    def peakmem_load_typed(self, n):
+        self.load_typed()
+
+    def track_bytes_untyped(self, n):
+        return int(self.load_untyped().memory_usage(deep=True).sum())
+
+    track_bytes_untyped.unit = "bytes"
+
+    def track_bytes_typed(self, n):
+        return int(self.load_typed().memory_usage(deep=True).sum())
+
+    track_bytes_typed.unit = "bytes"
+
+
+class LatestRecords:
+    params = synthetic.SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.epc = synthetic.epc(n)
+
+    def time_latest_records(self, n):
+        latest.latest_records(self.epc, key="brn", date="lodgement_date")
+
+
+class MapUnique:
+    params = synthetic.SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.transaction = synthetic.combined(n).transaction_type_epc
+
+    def time_map_unique(self, n):
+        utils.map_unique(self.transaction, lambda x: x.str.contains("rental|sale", na=False))
+
+    def time_str_contains(self, n):
+        # The same transform on every row, for comparison
+        self.transaction.str.contains("rental|sale", na=False)
+
+
+def notebook_features(df):
+    """
+    The feature derivations of notebook 03, cell for cell without the plots,
+    as the baseline for features.generate.
+    """
+    df = df.copy()
+    df = df.assign(date_lr=pd.to_datetime(df.date_lr),
+                   lodgement_date_epc=pd.to_datetime(df.lodgement_date_epc))
+
+    df['tenure'] = 'Unknown'
+    df.loc[((df.lodgement_date_epc > df.date_lr) |
+            ((pd.isna(df.date_lr)) & (~pd.isna(df.lodgement_date_epc))))
+           & (df.transaction_type_epc.str.contains("rental|sale")), 'tenure'] = (
+        df.loc[((df.lodgement_date_epc > df.date_lr) |
+                ((pd.isna(df.date_lr)) & (~pd.isna(df.lodgement_date_epc))))
+               & (df.transaction_type_epc.str.contains("rental|sale")), 'transaction_type_epc'])
+    df.loc[((df.lodgement_date_epc < df.date_lr) |
+            ((~pd.isna(df.date_lr)) & (pd.isna(df.lodgement_date_epc)))), 'tenure'] = "sale"
+    df.loc[(df.social_housing) & (df.tenure == "Unknown"), 'tenure'] = 'Social Rent'
+    df.tenure = (df.tenure
+                 .replace("rental", "Private Rent")
+                 .replace("rental (private)", "Private Rent")
+                 .str.replace('rental.*social.*', "Social Rent", regex=True)
+                 .str.replace(".*sale.*", "Owner Occupied", regex=True))
+
+    df['building_type'] = 'Unknown'
+    df.loc[(~pd.isna(df.built_form_epc)) & (df.built_form_epc != "NO DATA!"), 'building_type'] = df.loc[(~pd.isna(df.built_form_epc)) & (df.built_form_epc != "NO DATA!"), 'built_form_epc']
+    df.loc[(~pd.isna(df.dwelling_type_text_ukb)) & (df.building_type == "Unknown"), 'building_type'] = df.loc[(~pd.isna(df.dwelling_type_text_ukb)) & (df.building_type == "Unknown"), 'dwelling_type_text_ukb']
+    df.loc[(df.building_type == "Unknown"), 'building_type'] = df.loc[(df.building_type == "Unknown"), 'tertiary_desc']
+    df.building_type = (df.building_type
+                        .str.lower()
+                        .str.replace(".*flat.*", "flat", case=False, regex=True)
+                        .str.replace(".*terrace.*", "terrace", case=False, regex=True))
+    df.loc[~df.building_type.isin(['terrace', 'flat', 'semi-detached', 'detached']), 'building_type'] = 'other'
+
+    df.loc[(df.property_type_epc.isin(['Flat', 'Maisonette'])) | (df.building_type == "flat") | (df.dwelling_type_text_ukb.str.contains("flat", case=False)), 'flat'] = True
+    df.flat = df.flat.fillna(False)
+
+    df = df.assign(ukb_rooms=df.bedroom_number_ukb + df.wet_room_number_ukb + df.reception_number_ukb)
+    df = df.assign(bedrooms=df.bedroom_number_ukb,
+                   rooms=df.ukb_rooms)
+
+    df = df.assign(ukb_min=pd.to_numeric(df.building__age_text_ukb.str.extract(" ([0-9]{4})")[0]),
+                   ukb_max=pd.to_numeric(df.building__age_text_ukb.str.extract("-([0-9]{4})")[0]))
+    df.loc[pd.isna(df.ukb_max) & (~pd.isna(df.ukb_min)), 'ukb_max'] = datetime.today().year
+    df = df.assign(epc_min=pd.to_numeric(df.construction_age_band_epc.str.extract(" ([0-9]{4})")[0]),
+                   epc_max=pd.to_numeric(df.construction_age_band_epc.str.extract("-([0-9]{4})")[0]))
+    df.loc[(df.epc_min == 1900) & (pd.isna(df.epc_max)), ['epc_min', 'epc_max']] = [1800, 1900]
+    df.loc[(df.epc_min == 2007) & (pd.isna(df.epc_max)), 'epc_max'] = datetime.today().year
+    df = df.assign(lr_min=df.date_lr.dt.year,
+                   lr_max=df.date_lr.dt.year)
+    df.loc[df.new_build_lr != "Y", ['lr_min', 'lr_max']] = [np.nan, np.nan]
+    df['build_age_min'] = df[['epc_min', 'lr_min', 'ukb_min']].max(axis=1)
+    df['build_age_max'] = df[['epc_max', 'lr_max', 'ukb_max']].min(axis=1)
+    df.loc[(df.build_age_min > df.build_age_max), ['build_age_min', 'build_age_max']] = [np.nan, np.nan]
+    for ds in ['lr', 'ukb', 'epc']:
+        for tp in ['min', 'max']:
+            df[f'build_age_{tp}'] = df[f'build_age_{tp}'].combine_first(df[f'{ds}_{tp}'])
+    df['build_age'] = df[['build_age_min', 'build_age_max']].mean(axis=1)
+
+    df['other_households_3bed_plus'] = df[df.columns[df.columns.str.startswith("household_composition") & df.columns.str.contains("other_household") & df.columns.str.contains("3|4")]].sum(axis=1)
+
+    df.loc[(df.energy_consumption_potential_epc <= 0) | (df.energy_consumption_current_epc <= 0),
+           ['energy_consumption_current_epc', 'energy_consumption_potential_epc']] = [np.nan, np.nan]
+    df = df.assign(energy_eff_def=df.energy_consumption_current_epc / df.energy_consumption_potential_epc)
+
+    df = df[['uprn', 'geo_address', 'postcode', 'tenure', 'social_housing', 'building_type', 'flat', 'bedrooms', 'rooms',
+             'build_age', 'other_households_3bed_plus', 'energy_eff_def', 'asb_sum_crime', 'price_pp_median_abnb',
+             'imd_decile_imd', 'hmo']].rename(columns={'imd_decile_imd': 'imd_decile'})
+
+    return df
+
+
+class Features:
+    params = synthetic.SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.df = synthetic.combined(n)
+
+    def time_notebook(self, n):
+        notebook_features(self.df)
+
+    def peakmem_notebook(self, n):
+        notebook_features(self.df)
+
+    def time_generate(self, n):
+        features.generate(self.df)
+
+    def peakmem_generate(self, n):
+        features.generate(self.df)
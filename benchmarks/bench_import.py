@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:20:05 2026
+Benchmarks for the time to import modules, and a check of the import budget.
+@author: LiRogers
+"""
+
+import re
+import subprocess
+import sys
+
+
+# Modules that should only be imported by the functions that need them
+HEAVY = [
+    "geopandas", "shapely", "fiona", "pyogrio", "pyproj", "scipy",
+    "psycopg2", "bs4", "recordlinkage", "sklearn",
+]
+
+# Modules every module imports anyway, not counted against the budget
+BASELINE = ["pandas", "numpy"]
+
+# Cumulative import time allowed, in seconds, beyond importing BASELINE
+BUDGET = {
+    "hmo_identifier.data.utils": 0.1,
+    "hmo_identifier.data.reference": 0.1,
+    "hmo_identifier.data.open": 0.2,
+    "hmo_identifier.data.gla": 0.2,
+    "hmo_identifier.data.local": 0.2,
+    "hmo_identifier.process.address": 0.1,
+    "hmo_identifier.process.merge": 0.1,
+    "hmo_identifier.process.tiles": 0.1,
+    "hmo_identifier.process.resolve": 0.1,
+    "hmo_identifier.process.features": 0.1,
+}
+
+
+def import_tree(module: str) -> list:
+    """
+    Every module imported by importing module in a new interpreter, as
+    (depth, name, cumulative seconds) in the order python -X importtime
+    reports them (each module after the modules it imported).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    tree = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match:
+            tree.append(
+                (len(match.group(2)), match.group(3), int(match.group(1)) / 1e6)
+            )
+
+    return tree
+
+
+def import_times(tree: list) -> dict:
+    """
+    Cumulative import time of each module in tree, in seconds.
+    """
+    return {name: seconds for _, name, seconds in tree}
+
+
+def heavy_imported(times: dict) -> list:
+    """
+    Heavy modules that were imported.
+    """
+    return sorted({m for m in times if m.split(".")[0] in HEAVY and "." not in m})
+
+
+def own_time(module: str, tree: list) -> float:
+    """
+    Import time of module, less the time of importing BASELINE modules
+    wherever they were first imported (e.g. numpy before pandas).
+    """
+    baseline = 0
+    parents = []
+    # Walk parents before children, so a baseline module imported within
+    # another (numpy within pandas) isn't counted twice
+    for depth, name, seconds in reversed(tree):
+        while parents and parents[-1][0] >= depth:
+            parents.pop()
+        is_baseline = name.split(".")[0] in BASELINE
+        if is_baseline and not any(p[1] for p in parents):
+            baseline += seconds
+        parents.append((depth, is_baseline))
+
+    return import_times(tree)[module] - baseline
+
+
+def over_budget(module: str) -> list:
+    """
+    Problems with importing module: heavy modules it imports and time over
+    its budget. Empty if there are none.
+    """
+    tree = import_tree(module)
+    problems = [f"imports {m}" for m in heavy_imported(import_times(tree))]
+    seconds = own_time(module, tree)
+    if seconds > BUDGET[module]:
+        problems.append(f"takes {seconds:.3f}s (budget {BUDGET[module]}s)")
+
+    return problems
+
+
+class ImportTime:
+    params = list(BUDGET)
+    param_names = ["module"]
+    timeout = 120
+
+    def timeraw_import(self, module):
+        return f"import {module}"
+
+    def track_heavy_modules(self, module):
+        return len(heavy_imported(import_times(import_tree(module))))
+
+    track_heavy_modules.unit = "modules"
+
+    def track_import_seconds(self, module):
+        return own_time(module, import_tree(module))
+
+    track_import_seconds.unit = "seconds"
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.bench_import exits with an error if any module
+    # imports a heavy dependency or takes longer than its budget. The same
+    # check runs with the tests, in tests/test_import_budget.py
+    over = []
+    for module in BUDGET:
+        problems = over_budget(module)
+        print(f"{module}: {'; '.join(problems) or 'ok'}")
+        if problems:
+            over.append(module)
+    if over:
+        sys.exit(f"Over import budget: {', '.join(over)}")
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:18:52 2026
+Benchmarks for merging datasets onto the gazatteer.
+@author: LiRogers
+"""
+
+from hmo_identifier.data import utils
+from hmo_identifier.process import merge
+from . import synthetic
+
+
+class ByUprn:
+    params = synthetic.SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.gaz = synthetic.gazatteer(n)
+        epc = synthetic.epc(n)
+        # UPRNs as the EPC API returns them, and as typed at ingest
+        self.add_str = epc.loc[
+            epc.uprn != "", ["uprn", "current_energy_rating", "total_floor_area"]
+        ].drop_duplicates("uprn")
+        self.add = utils.type_keys(self.add_str)
+        self.gaz_keys = utils.type_keys(self.gaz)
+
+    def time_by_uprn(self, n):
+        merge.by_uprn(self.gaz_keys, self.add, "epc")
+
+    def peakmem_by_uprn(self, n):
+        merge.by_uprn(self.gaz_keys, self.add, "epc")
+
+    def time_by_uprn_untyped(self, n):
+        merge.by_uprn(self.gaz, self.add_str, "epc")
+
+
+class ByGeog:
+    params = synthetic.SIZES
+    param_names = ["n"]
+
+    def setup(self, n):
+        self.gaz = synthetic.gazatteer(n)
+        self.oas = synthetic.output_areas(self.gaz)
+        self.gaz = merge.by_geography(self.gaz, self.oas)
+        self.census = synthetic.census(self.oas.oacd)
+
+    def time_by_geog(self, n):
+        merge.by_geog(self.gaz, self.census, "census")
+
+    def peakmem_by_geog(self, n):
+        merge.by_geog(self.gaz, self.census, "census")
+
+    def time_by_geography(self, n):
+        merge.by_geography(self.gaz, self.oas)
+
+    def peakmem_by_geography(self, n):
+        merge.by_geography(self.gaz, self.oas)
+
+
+class ByBuffer:
+    params = (synthetic.SIZES, [100, 200])
+    param_names = ["n", "buffer"]
+    timeout = 600
+
+    def setup(self, n, buffer):
+        self.gaz = synthetic.gazatteer(n)
+        # A year of crime and the current Airbnb listings per address, at
+        # about Camden's rates
+        bounds = synthetic.bounds_for(n)
+        self.crime = synthetic.crime(n // 3, bounds=bounds)
+        self.airbnb = synthetic.airbnb(n // 20, bounds=bounds)
+
+    def time_by_buffer_crime(self, n, buffer):
+        merge.by_buffer(self.gaz, self.crime, "crime", buffer, sum_cols=["sum"])
+
+    def peakmem_by_buffer_crime(self, n, buffer):
+        merge.by_buffer(self.gaz, self.crime, "crime", buffer, sum_cols=["sum"])
+
+    def time_by_buffer_airbnb(self, n, buffer):
+        merge.by_buffer(self.gaz, self.airbnb, "abnb", buffer, sum_cols=["median"])
+
+    def peakmem_by_buffer_airbnb(self, n, buffer):
+        merge.by_buffer(self.gaz, self.airbnb, "abnb", buffer, sum_cols=["median"])
@@ -0,0 +1,544 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:48:05 2026
+Seeded synthetic versions of the datasets used by hmo_identifier, so the
+processing steps can be benchmarked without network or database access.
+@author: LiRogers
+"""
+
+import os
+import functools
+import numpy as np
+import pandas as pd
+
+
+# Approximate number of residential UPRNs
+CAMDEN = 110000
+LONDON = 3800000
+
+# Gazatteer sizes benchmarks are run at. Whole London scale takes a long
+# time so is only included if HMO_BENCH_LONDON is set
+SIZES = [1000, 10000, CAMDEN]
+if os.environ.get("HMO_BENCH_LONDON"):
+    SIZES.append(LONDON)
+
+# Numbers of scored candidate pairs the match resolution is run at
+PAIRS = [1000000, 5000000]
+
+# British National Grid bounds
+CAMDEN_BOUNDS = (524000, 181000, 531500, 187500)
+LONDON_BOUNDS = (503000, 155000, 561500, 200500)
+
+_AREAS = ["E", "EC", "N", "NW", "SE", "SW", "W", "WC"]
+_UNIT_LETTERS = list("ABDEFGHJLNPQRSTUWXYZ")
+_STREET_NAMES = [
+    "ADELAIDE", "ALBERT", "BELSIZE", "CAMDEN", "CHALK FARM", "DELANCEY",
+    "ELSWORTHY", "FITZROY", "GLOUCESTER", "HAVERSTOCK", "ISLIP", "JEFFREYS",
+    "KENTISH", "LEIGHTON", "MALDEN", "NETHERHALL", "OAKLEY", "PRIMROSE",
+    "QUEENS", "ROSSLYN", "ST PANCRAS", "TORRIANO", "UPPER PARK", "WILLOW",
+]
+_STREET_TYPES = ["ROAD", "STREET", "GARDENS", "PLACE", "CRESCENT", "LANE", "TERRACE"]
+_BUILDING_NAMES = [
+    "ROSE COURT", "ABBEY HOUSE", "CROWN MANSIONS", "WELLS HOUSE", "KEATS COURT",
+    "ORIEL PLACE", "HOLLY LODGE", "GRAFTON HOUSE",
+]
+_ESTATES = [
+    "Abbey Road Estate", "St. John's Wood (1-20)", "Rose & Crown Flats 2-4",
+    "Regents Park Estate", "Ampthill Square", "Somers Town Estate",
+    "Kilburn Vale Estate", "Maiden Lane Estate", "Gospel Oak Estate",
+]
+_CRIME_CATEGORIES = [
+    "anti-social-behaviour", "public-order", "violent-crime",
+    "possession-of-weapons", "other-theft", "theft-from-the-person",
+    "burglary", "robbery", "shoplifting", "vehicle-crime", "drugs",
+    "criminal-damage-arson", "other-crime",
+]
+
+
+def bounds_for(n: int) -> tuple:
+    """
+    Camden's bounds for up to Camden's number of addresses, otherwise London's.
+    """
+    return CAMDEN_BOUNDS if n <= CAMDEN else LONDON_BOUNDS
+
+
+def _rng(seed: int) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+def typos(x: pd.Series, rate: float, rng: np.random.Generator) -> pd.Series:
+    """
+    Add a single character deletion, swap or substitution to a fraction
+    (rate) of strings.
+    """
+    x = x.astype(str).copy()
+    chosen = np.flatnonzero(rng.random(len(x)) < rate)
+    values = x.values
+    for i, kind in zip(chosen, rng.integers(0, 3, len(chosen))):
+        s = values[i]
+        if len(s) < 3:
+            continue
+        j = rng.integers(1, len(s) - 1)
+        if kind == 0:
+            s = s[:j] + s[j + 1:]
+        elif kind == 1:
+            s = s[:j - 1] + s[j] + s[j - 1] + s[j + 1:]
+        else:
+            s = s[:j] + chr(rng.integers(65, 91)) + s[j + 1:]
+        values[i] = s
+
+    return pd.Series(values, index=x.index, name=x.name)
+
+
+def _postcodes(n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    n distinct London-like postcodes, e.g. "NW1 2AB".
+    """
+    codes = set()
+    while len(codes) < n:
+        size = 2 * (n - len(codes))
+        area = rng.choice(_AREAS, size)
+        district = rng.integers(1, 21, size)
+        sector = rng.integers(0, 10, size)
+        unit = rng.choice(_UNIT_LETTERS, (size, 2))
+        codes.update(
+            f"{a}{d} {s}{u[0]}{u[1]}" for a, d, s, u in zip(area, district, sector, unit)
+        )
+
+    return np.array(sorted(codes)[:n], dtype=object)
+
+
+@functools.lru_cache(maxsize=8)
+def gazatteer(n: int, seed: int = 0, bounds: tuple = None) -> pd.DataFrame:
+    """
+
+    Synthetic residential gazatteer with n addresses.
+
+    Addresses are grouped into buildings and buildings into postcodes.
+    Most buildings are houses, some are converted into a few flats and
+    a few are large blocks, so some postcodes are dense with flats.
+
+    Parameters
+    ----------
+    n : int
+        Number of addresses.
+    seed : int, optional
+        Random seed. The default is 0.
+    bounds : tuple, optional
+        minx, miny, maxx, maxy of the coordinates. The default is None
+        (see bounds_for).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Gazatteer with the columns of gla.gazateer plus geo_address and
+        dp_address as used in notebook 02.
+
+    """
+    rng = _rng(seed)
+    # Flats per building - houses, conversions and blocks
+    kind = rng.choice(3, n, p=[0.6, 0.35, 0.05])
+    flats = np.select(
+        [kind == 0, kind == 1], [1, rng.integers(2, 7, n)], rng.integers(20, 150, n)
+    )
+    n_buildings = np.searchsorted(np.cumsum(flats), n) + 1
+    flats = flats[:n_buildings]
+    flats[-1] -= flats.sum() - n
+    n_postcodes = max(1, n_buildings // 6)
+    building_postcode = np.sort(rng.integers(0, n_postcodes, n_buildings))
+    postcodes = _postcodes(n_postcodes, rng)
+    streets = np.array(
+        [f"{a} {b}" for a in _STREET_NAMES for b in _STREET_TYPES], dtype=object
+    )
+    postcode_street = rng.choice(streets, n_postcodes)
+    minx, miny, maxx, maxy = bounds_for(n) if bounds is None else bounds
+    postcode_x = rng.uniform(minx, maxx, n_postcodes)
+    postcode_y = rng.uniform(miny, maxy, n_postcodes)
+
+    building = np.repeat(np.arange(n_buildings), flats)
+    is_flat = np.repeat(flats > 1, flats)
+    flat_number = np.arange(n) - np.repeat(np.cumsum(flats) - flats, flats) + 1
+    postcode = building_postcode[building]
+    # Buildings are numbered along the street within each postcode
+    house_number = (
+        np.arange(n_buildings)
+        - np.searchsorted(building_postcode, building_postcode)
+        + rng.integers(1, 200, n_postcodes)[building_postcode]
+    )[building]
+    named = np.repeat((flats >= 20) & (rng.random(n_buildings) < 0.7), flats)
+    building_name = np.where(
+        named, rng.choice(_BUILDING_NAMES, n_buildings)[building], None
+    )
+    sao_text = np.where(
+        is_flat & (rng.random(n) < 0.1),
+        rng.choice(["GROUND FLOOR FLAT", "BASEMENT FLAT", "FIRST FLOOR FLAT"], n),
+        None,
+    )
+    sao_start_number = np.where(is_flat & pd.isna(sao_text), flat_number, np.nan)
+    pao_start_number = np.where(named, np.nan, house_number)
+    pao_start_suffix = np.where(
+        ~named & (rng.random(n) < 0.03), rng.choice(["A", "B"], n), None
+    )
+    street = postcode_street[postcode]
+
+    df = pd.DataFrame(
+        {
+            "uprn": 100000000 + rng.permutation(n * 3)[:n],
+            "udprn": 20000000 + np.arange(n),
+            "class": np.where(is_flat, "RD06", rng.choice(["RD02", "RD03", "RD04"], n)),
+            "parent_uprn": np.where(is_flat, 200000000 + building, np.nan),
+            "tertiary_desc": np.where(
+                is_flat,
+                "Self Contained Flat (Includes Maisonette / Apartment)",
+                rng.choice(["Terraced", "Semi-Detached", "Detached"], n),
+            ),
+            "x_coordinate": (postcode_x[postcode] + rng.normal(0, 30, n_buildings)[building]).round(1),
+            "y_coordinate": (postcode_y[postcode] + rng.normal(0, 30, n_buildings)[building]).round(1),
+            "sao_start_number": sao_start_number,
+            "sao_start_suffix": None,
+            "sao_end_number": np.nan,
+            "sao_end_suffix": None,
+            "sao_text": sao_text,
+            "pao_start_number": pao_start_number,
+            "pao_start_suffix": pao_start_suffix,
+            "pao_end_number": np.nan,
+            "pao_end_suffix": None,
+            "pao_text": building_name,
+            "street_description": street,
+            "town_name": "LONDON",
+            "postcode_locator": postcodes[postcode],
+        }
+    )
+    sao = (
+        pd.Series(sao_text, dtype=object)
+        .fillna("FLAT " + pd.Series(sao_start_number).astype("Int64").astype(str))
+        .where(is_flat, "")
+    )
+    pao = (
+        pd.Series(building_name, dtype=object)
+        .fillna(
+            pd.Series(pao_start_number).astype("Int64").astype(str)
+            + pd.Series(pao_start_suffix, dtype=object).fillna("")
+        )
+    )
+    df["geo_address"] = (sao + " " + pao + " " + street).str.strip()
+    df["dp_address"] = (sao + ", " + pao + " " + street).str.strip(", ").where(
+        rng.random(n) < 0.8
+    )
+
+    return df
+
+
+def postcode_addresses(gaz: pd.DataFrame) -> pd.DataFrame:
+    """
+    The gazatteer address columns used for matching, as in notebook 02.
+    """
+    return gaz[["uprn", "geo_address", "dp_address"]].assign(
+        postcode=gaz.postcode_locator
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def epc(n: int, seed: int = 0, typo_rate: float = 0.05) -> pd.DataFrame:
+    """
+
+    Synthetic EPC certificates for half the addresses of gazatteer(n), with
+    typos in some addresses and postcodes, and repeat certificates for
+    some buildings.
+
+    Parameters
+    ----------
+    n : int
+        Number of addresses in the gazatteer.
+    seed : int, optional
+        Random seed. The default is 0.
+    typo_rate : float, optional
+        Fraction of addresses with a typo. The default is 0.05.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        EPC data with lower case column names, as from open.epc before typing.
+
+    """
+    gaz = gazatteer(n, seed)
+    rng = _rng(seed + 1)
+    sample = gaz.sample(frac=0.5, random_state=seed)
+    repeats = sample.sample(frac=0.2, random_state=seed + 1)
+    sample = pd.concat([sample, repeats], ignore_index=True)
+    m = len(sample)
+    address = sample.geo_address.str.title().str.replace("Flat (\\d+) ", "Flat \\1, ")
+    lodged = pd.Timestamp("2008-10-01") + pd.to_timedelta(rng.integers(0, 4500, m), "D")
+    current = rng.normal(220, 90, m).clip(20)
+    df = pd.DataFrame(
+        {
+            "lmk_key": [f"{k:x}" for k in rng.integers(1 << 40, 1 << 44, m)],
+            "brn": sample.udprn.astype(str),
+            "address": typos(address, typo_rate, rng),
+            "postcode": typos(sample.postcode_locator, typo_rate / 5, rng),
+            "current_energy_rating": rng.choice(list("ABCDEFG"), m),
+            "potential_energy_rating": rng.choice(list("ABCDE"), m),
+            "current_energy_efficiency": rng.integers(1, 100, m).astype(str),
+            "potential_energy_efficiency": rng.integers(20, 100, m).astype(str),
+            "property_type": np.where(
+                sample["class"] == "RD06",
+                rng.choice(["Flat", "Maisonette"], m, p=[0.9, 0.1]),
+                "House",
+            ),
+            "built_form": rng.choice(
+                ["Mid-Terrace", "End-Terrace", "Semi-Detached", "Detached", "NO DATA!"], m
+            ),
+            "inspection_date": lodged.strftime("%Y-%m-%d"),
+            "local_authority": "E09000007",
+            "constituency": "E14000750",
+            "county": "Greater London Authority",
+            "lodgement_date": lodged.strftime("%Y-%m-%d"),
+            "transaction_type": rng.choice(
+                ["marketed sale", "rental (private)", "rental (social)",
+                 "new dwelling", "non marketed sale", "ECO assessment"], m
+            ),
+            "energy_consumption_current": current.round().astype(str),
+            "energy_consumption_potential": (current * rng.uniform(0.4, 1, m)).round().astype(str),
+            "total_floor_area": rng.gamma(4, 18, m).round(1).astype(str),
+            "number_habitable_rooms": rng.integers(1, 8, m).astype(str),
+            "floor_level": rng.choice(["Ground", "1st", "2nd", "3rd", "mid floor", "NODATA!"], m),
+            "construction_age_band": rng.choice(
+                ["England and Wales: before 1900", "England and Wales: 1900-1929",
+                 "England and Wales: 1930-1949", "England and Wales: 1967-1975",
+                 "England and Wales: 2007 onwards", "NO DATA!"], m
+            ),
+            "uprn": sample.uprn.astype(str).where(rng.random(m) < 0.3, ""),
+        }
+    )
+
+    return df
+
+
+@functools.lru_cache(maxsize=8)
+def land_registry(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic Land Registry price paid records for a fifth of the
+    addresses of gazatteer(n), with paon and saon as addressable objects.
+    """
+    gaz = gazatteer(n, seed)
+    rng = _rng(seed + 2)
+    sample = gaz.sample(frac=0.2, random_state=seed + 2).reset_index(drop=True)
+    m = len(sample)
+    sao_number = sample.sao_start_number.astype("Int64").astype(str).replace("<NA>", "")
+    saon = sample.sao_text.fillna(("FLAT " + sao_number).where(sao_number != ""))
+    pao_number = sample.pao_start_number.astype("Int64").astype(str).replace("<NA>", "")
+    paon = sample.pao_text.fillna(pao_number + sample.pao_start_suffix.fillna(""))
+    df = pd.DataFrame(
+        {
+            "trans_id": [f"{{{k:X}}}" for k in rng.integers(1 << 60, 1 << 62, m)],
+            "price": rng.lognormal(13.3, 0.5, m).round(-3).astype(int),
+            "date_of_transfer": (
+                pd.Timestamp("1995-01-01") + pd.to_timedelta(rng.integers(0, 9000, m), "D")
+            ).strftime("%Y-%m-%d"),
+            "postcode": sample.postcode_locator,
+            "property_type": np.where(sample["class"] == "RD06", "F", "T"),
+            "new_build": rng.choice(["Y", "N"], m, p=[0.1, 0.9]),
+            "paon": paon,
+            "saon": saon.fillna(""),
+            "street": sample.street_description,
+            "district": "CAMDEN",
+        }
+    )
+
+    return df
+
+
+def _points(n: int, rng: np.random.Generator, bounds: tuple) -> tuple:
+    minx, miny, maxx, maxy = bounds
+    return (rng.uniform(minx, maxx, n).round(1), rng.uniform(miny, maxy, n).round(1))
+
+
+@functools.lru_cache(maxsize=8)
+def crime(n: int, seed: int = 0, bounds: tuple = CAMDEN_BOUNDS) -> pd.DataFrame:
+    """
+    Synthetic street level crimes as summarised in notebook 02, with
+    coordinates in EPSG:27700.
+    """
+    rng = _rng(seed + 3)
+    x, y = _points(n, rng, bounds)
+    category = rng.choice(_CRIME_CATEGORIES, n)
+    df = pd.DataFrame(
+        {
+            "x_coordinate": x,
+            "y_coordinate": y,
+            "asb": np.isin(category, ["anti-social-behaviour", "public-order"]),
+            "violent": np.isin(category, ["violent-crime", "possession-of-weapons"]),
+            "theft": np.isin(
+                category, ["other-theft", "theft-from-the-person", "burglary",
+                           "robbery", "shoplifting"]
+            ),
+        }
+    )
+
+    return df
+
+
+@functools.lru_cache(maxsize=8)
+def airbnb(n: int, seed: int = 0, bounds: tuple = CAMDEN_BOUNDS) -> pd.DataFrame:
+    """
+    Synthetic Airbnb listings as summarised in notebook 02, with
+    coordinates in EPSG:27700.
+    """
+    rng = _rng(seed + 4)
+    x, y = _points(n, rng, bounds)
+    accommodates = rng.integers(1, 9, n)
+    df = pd.DataFrame(
+        {
+            "x_coordinate": x,
+            "y_coordinate": y,
+            "price_pp": rng.lognormal(4.3, 0.6, n).round() / accommodates,
+            "accommodates": accommodates,
+        }
+    )
+
+    return df
+
+
+def estates(n: int, seed: int = 0) -> pd.Series:
+    """
+    Estate names with the variation of a social housing register.
+    """
+    rng = _rng(seed + 5)
+    names = pd.Series(rng.choice(_ESTATES, n))
+    names = names.where(rng.random(n) > 0.3, names.str.upper())
+
+    return typos(names, 0.05, rng)
+
+
+def output_areas(gaz: pd.DataFrame, size: float = 250):
+    """
+    Square grid polygons covering the gazatteer, standing in for census
+    output areas, with an oacd column.
+    """
+    import geopandas as gpd
+    from shapely.geometry import box
+
+    minx, miny = gaz.x_coordinate.min(), gaz.y_coordinate.min()
+    maxx, maxy = gaz.x_coordinate.max(), gaz.y_coordinate.max()
+    xs = np.arange(minx, maxx + size, size)
+    ys = np.arange(miny, maxy + size, size)
+    cells = [(x, y) for x in xs for y in ys]
+    df = gpd.GeoDataFrame(
+        {"oacd": [f"E00{i:06d}" for i in range(len(cells))]},
+        geometry=[box(x, y, x + size, y + size) for (x, y) in cells],
+        crs=27700,
+    )
+
+    return df
+
+
+def census(oacd: pd.Series, seed: int = 0) -> pd.DataFrame:
+    """
+    Census household composition counts by output area.
+    """
+    rng = _rng(seed + 6)
+    cols = [
+        f"household_composition_{kind}_{beds}"
+        for kind in ["one_person", "family", "other_household"]
+        for beds in ["1bed", "2bed", "3bed", "4bed_plus"]
+    ]
+    df = pd.DataFrame(rng.integers(0, 40, (len(oacd), len(cols))), columns=cols)
+    df.insert(0, "oacd", oacd.values)
+
+    return df
+
+
+def candidate_pairs(n_pairs: int, block: int = 4, seed: int = 0) -> tuple:
+    """
+    Candidate matches between blocks of block ref (uprn) and add (brn)
+    records, every pair within a block, as address.candidate_matches
+    gives for addresses sharing a postcode. Returns the candidates, with
+    similarity columns ending "_match", and whether each is a true match.
+    """
+    rng = _rng(seed + 7)
+    n_blocks = -(-n_pairs // (block * block))
+    pair = np.arange(n_blocks * block * block)[:n_pairs]
+    first = pair // (block * block) * block
+    ref = first + pair // block % block
+    add = first + rng.permutation(block)[pair % block]
+    labels = ref == add
+    candidates = pd.DataFrame(
+        {
+            "uprn": ref,
+            "brn": add,
+            "clean_address_match": np.clip(
+                rng.normal(np.where(labels, 0.85, 0.5), 0.15), 0, 1
+            ).astype("float32"),
+            "numbers_match": (
+                labels | (rng.random(n_pairs) < 0.1)
+            ).astype("float32"),
+        }
+    )
+
+    return candidates, labels
+
+
+@functools.lru_cache(maxsize=8)
+def combined(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic combined gazatteer (output of notebook 02) with the columns
+    used by features.generate.
+    """
+    gaz = gazatteer(n, seed)
+    rng = _rng(seed + 7)
+
+    def choice(options, p_missing=0.0):
+        values = pd.Series(rng.choice(np.array(options, dtype=object), n))
+        return values.where(rng.random(n) >= p_missing)
+
+    def dates(p_missing):
+        days = pd.to_timedelta(rng.integers(0, 9000, n), "D")
+        values = pd.Series(pd.Timestamp("1995-01-01") + days).dt.strftime("%Y-%m-%d")
+        return values.where(rng.random(n) >= p_missing)
+
+    df = pd.DataFrame(
+        {
+            "uprn": gaz.uprn,
+            "geo_address": gaz.geo_address,
+            "postcode": gaz.postcode_locator,
+            "date_lr": dates(0.7),
+            "new_build_lr": choice(["Y", "N"], 0.7),
+            "lodgement_date_epc": dates(0.5),
+            "transaction_type_epc": choice(
+                ["marketed sale", "rental (private)", "rental (social)", "rental",
+                 "new dwelling", "non marketed sale", "ECO assessment"], 0.5
+            ),
+            "social_housing": rng.random(n) < 0.25,
+            "built_form_epc": choice(
+                ["Mid-Terrace", "End-Terrace", "Semi-Detached", "Detached", "NO DATA!"], 0.5
+            ),
+            "property_type_epc": choice(["Flat", "House", "Maisonette"], 0.5),
+            "dwelling_type_text_ukb": choice(
+                ["Purpose built flat", "Converted Flat", "Terraced house",
+                 "Semi-detached house"], 0.3
+            ),
+            "tertiary_desc": gaz.tertiary_desc,
+            "bedroom_number_ukb": pd.Series(rng.integers(0, 6, n)).where(rng.random(n) > 0.3),
+            "wet_room_number_ukb": rng.integers(1, 3, n),
+            "reception_number_ukb": rng.integers(0, 3, n),
+            "building__age_text_ukb": choice(
+                ["Victorian 1837-1901", "Inter War 1919-1938", "Post War 1945-1955",
+                 "Modern 2000"], 0.3
+            ),
+            "construction_age_band_epc": choice(
+                ["England and Wales: before 1900", "England and Wales: 1930-1949",
+                 "England and Wales: 1967-1975", "England and Wales: 2007 onwards",
+                 "NO DATA!", "INVALID!"], 0.5
+            ),
+            "energy_consumption_current_epc": rng.normal(220, 90, n),
+            "energy_consumption_potential_epc": rng.normal(150, 80, n),
+            "household_composition_other_household_3bed": rng.integers(0, 10, n),
+            "household_composition_other_household_4bed_plus": rng.integers(0, 10, n),
+            "asb_sum_crime": rng.poisson(5, n),
+            "price_pp_median_abnb": rng.lognormal(3.5, 0.5, n),
+            "imd_decile_imd": rng.integers(1, 11, n),
+            "hmo": rng.random(n) < 0.03,
+        }
+    )
+
+    return df
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:06:12 2026
+Run the command line interface with python -m hmo_identifier
+@author: LiRogers
+"""
+
+import sys
+from hmo_identifier.cli import main
+
+sys.exit(main())
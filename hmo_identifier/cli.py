@@ -0,0 +1,490 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:05:48 2026
+Command line interface, e.g. hmo_identifier fetch --borough Camden
+@author: LiRogers
+"""
+
+import argparse
+import concurrent.futures
+import functools
+import os
+import shutil
+import threading
+import time
+import traceback
+from hmo_identifier.data import batch, gla, local, open, reference, transport
+
+
+# %% Fetch jobs
+# Each job fetches one source and returns its files, by path within the
+# data directory. Geo DataFrames saved as .shp, everything else as .csv.
+# Each shapefile has a directory of its own, which is replaced as a whole.
+
+
+def _boroughs(options) -> dict:
+    boroughs = reference.london_boroughs(borough=options.borough, inc_geom=True)
+    # Later jobs filter to the borough area, so build it once here rather
+    # than in each of them at the same time
+    reference.borough_area(options.borough)
+    reference.borough_area(options.borough, crs=27700)
+
+    return {"reference/boroughs/boroughs.shp": boroughs}
+
+
+def _wards(options) -> dict:
+    wards = reference.london_wards(borough=options.borough, inc_geom=True)
+
+    return {"reference/wards/wards.shp": wards}
+
+
+def _output_areas(options) -> dict:
+    oas = reference.london_output_areas(borough=options.borough, inc_geom=True)
+
+    return {"reference/output_areas/output_areas.shp": oas}
+
+
+def _airbnb(options) -> dict:
+    return {"open/airbnb.csv": open.airbnb(options.borough)}
+
+
+def _census(options) -> dict:
+    return {"open/census.csv": open.merge_census(options.borough)}
+
+
+def _crime_store(options, borough: str) -> str:
+    """
+    Directory of the borough's crime store, see open.crime_archive.
+    """
+    name = "london" if borough is None else batch.borough_slug(borough)
+
+    return os.path.join(options.cache_dir, "crime", name)
+
+
+def _crime(options) -> dict:
+    store = _crime_store(options, options.borough)
+    if options.crime_archive:
+        open.crime_archive(options.crime_archive, store, borough=options.borough)
+    crime = open.crime_year(options.borough, archive=store)
+
+    return {"open/crime.csv": crime.drop(columns=["geometry"])}
+
+
+def _imd(options) -> dict:
+    imd = open.imd(options.borough, cache_dir=os.path.join(options.cache_dir, "imd"))
+
+    return {"open/imd.csv": imd}
+
+
+def _epc(options) -> dict:
+    api_key = os.getenv("epc_api_key")
+
+    return {"open/epc.csv": open.epc(api_key=api_key, borough=options.borough)}
+
+
+def _land_registry(options) -> dict:
+    return {"open/land_registry.csv": open.land_registry(options.borough)}
+
+
+def _hmo_register(options) -> dict:
+    hmos = local.hmo_register(cache_dir=os.path.join(options.cache_dir, "soda"))
+
+    return {"local/hmo_register.csv": hmos}
+
+
+def _social_housing(options) -> dict:
+    housing = local.social_housing(cache_dir=os.path.join(options.cache_dir, "soda"))
+
+    return {"local/social_housing.csv": housing}
+
+
+def _gazatteer(options) -> dict:
+    gaz = gla.gazateer(
+        table_name="addbase_ldn_pending",
+        dbname=os.getenv("DATABASE"),
+        user=os.getenv("USER"),
+        password=os.getenv("KEY"),
+        host=os.getenv("HOST"),
+        borough=options.borough,
+    )
+
+    return {"local/gazatteer.csv": gaz}
+
+
+def _uk_buildings(options) -> dict:
+    ukb = gla.uk_buildings(
+        ukb_file=options.ukb_file,
+        ukb_link_file=options.ukb_link_file,
+        borough=options.borough,
+    )
+
+    return {
+        "local/uk_buildings.csv": ukb["data"],
+        "local/uk_buildings_link.csv": ukb["link_data"],
+    }
+
+
+# Job functions and the jobs they need to finish first
+JOBS = {
+    "boroughs": (_boroughs, []),
+    "wards": (_wards, ["boroughs"]),
+    "output_areas": (_output_areas, ["boroughs"]),
+    "airbnb": (_airbnb, ["boroughs"]),
+    "census": (_census, ["boroughs"]),
+    "crime": (_crime, ["boroughs"]),
+    "imd": (_imd, ["boroughs"]),
+    "epc": (_epc, ["boroughs"]),
+    "land_registry": (_land_registry, ["boroughs"]),
+    "hmo_register": (_hmo_register, []),
+    "social_housing": (_social_housing, []),
+    "gazatteer": (_gazatteer, []),
+    "uk_buildings": (_uk_buildings, ["boroughs"]),
+}
+
+
+# %% Batch jobs for all boroughs
+# London-wide sources are fetched once and split into a directory per
+# borough, e.g. boroughs/camden/open/imd.csv. Sources with an API per
+# borough are fetched for each borough at the same time.
+_SHARED = {
+    "airbnb": batch.airbnb_by_borough,
+    "census": batch.census_by_borough,
+    "imd": batch.imd_by_borough,
+    "land_registry": batch.land_registry_by_borough,
+}
+
+
+def _shared(options, source: str, boroughs) -> dict:
+    kwargs = {}
+    if source == "imd":
+        kwargs["cache_dir"] = os.path.join(options.cache_dir, "imd")
+    parts = _SHARED[source](boroughs, **kwargs)
+
+    return {
+        f"boroughs/{batch.borough_slug(ladnm)}/open/{source}.csv": df
+        for ladnm, df in parts.items()
+    }
+
+
+def _borough_crime(options, ladnm: str) -> dict:
+    store = _crime_store(options, ladnm)
+    if options.crime_archive:
+        open.crime_archive(options.crime_archive, store, borough=ladnm)
+    crime = open.crime_year(ladnm, archive=store)
+
+    return {
+        f"boroughs/{batch.borough_slug(ladnm)}/open/crime.csv": crime.drop(
+            columns=["geometry"]
+        )
+    }
+
+
+def _borough_epc(options, ladnm: str) -> dict:
+    epc = open.epc(api_key=os.getenv("epc_api_key"), borough=ladnm)
+
+    return {f"boroughs/{batch.borough_slug(ladnm)}/open/epc.csv": epc}
+
+
+def batch_jobs(boroughs) -> dict:
+    """
+
+    Jobs to fetch every borough at once, in the same form as JOBS. Job
+    names of per borough jobs are the source and borough, e.g. "epc:camden".
+
+    Parameters
+    ----------
+    boroughs : pd.DataFrame
+        Boroughs to fetch, from reference.london_boroughs.
+
+    Returns
+    -------
+    jobs : dict
+        Job functions and the jobs they need to finish first, by name.
+
+    """
+    jobs = {name: JOBS[name] for name in ["boroughs", "wards", "output_areas"]}
+    for source in _SHARED:
+        jobs[source] = (
+            functools.partial(_shared, source=source, boroughs=boroughs),
+            ["boroughs"],
+        )
+    for ladnm in boroughs.ladnm:
+        for source, func in [("crime", _borough_crime), ("epc", _borough_epc)]:
+            jobs[f"{source}:{batch.borough_slug(ladnm)}"] = (
+                functools.partial(func, ladnm=ladnm),
+                ["boroughs"],
+            )
+
+    return jobs
+
+
+# %% Running jobs
+_PRINT_LOCK = threading.Lock()
+
+
+def _progress(message: str) -> None:
+    with _PRINT_LOCK:
+        print(time.strftime("%H:%M:%S"), message, flush=True)
+
+
+def write_atomic(files: dict, data_dir: str, workers: int = 1) -> list:
+    """
+
+    Write a job's files so that each appears complete or not at all.
+
+    Files are written to a temporary directory beside them and then moved
+    into place, so an interrupted or failed fetch never leaves a partly
+    written file, and the previous version is kept until the new one is
+    ready. Shapefiles are several files (.shp, .shx, .dbf, .prj), so each
+    must be alone in its directory, and the whole directory is swapped for
+    the new one.
+
+    Parameters
+    ----------
+    files : dict
+        DataFrames or GeoDataFrames by path within data_dir, e.g.
+        "open/airbnb.csv" or "reference/wards/wards.shp".
+    data_dir : str
+        Directory of the raw data, e.g. "data/raw".
+    workers : int, optional
+        Number of files to write at once. The default is 1.
+
+    Returns
+    -------
+    paths : list
+        Paths of the files written.
+
+    """
+
+    def write_shapefile(path, df):
+        folder, file = os.path.split(path)
+        parent, name = os.path.split(folder)
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = os.path.join(parent, f".tmp-{name}-{os.getpid()}")
+        old_dir = os.path.join(parent, f".old-{name}-{os.getpid()}")
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            df.to_file(os.path.join(tmp_dir, file))
+            # A directory can't replace a non-empty one, so move the old
+            # version aside first. Readers see the old or new directory,
+            # or briefly none, but never a mix of the two.
+            if os.path.exists(folder):
+                os.replace(folder, old_dir)
+            try:
+                os.replace(tmp_dir, folder)
+            except OSError:
+                if os.path.exists(old_dir):
+                    os.replace(old_dir, folder)
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+        return [os.path.join(folder, part) for part in sorted(os.listdir(folder))]
+
+    def write(name, df):
+        path = os.path.join(data_dir, name)
+        if path.endswith(".shp"):
+            return write_shapefile(path, df)
+        folder, file = os.path.split(path)
+        os.makedirs(folder, exist_ok=True)
+        tmp_dir = os.path.join(folder, f".tmp-{file}-{os.getpid()}")
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            df.to_csv(os.path.join(tmp_dir, file), index=False)
+            os.replace(os.path.join(tmp_dir, file), path)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return [path]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        paths = sum(executor.map(write, files.keys(), files.values()), [])
+
+    return paths
+
+
+def _run_job(name: str, func, options) -> dict:
+    """
+    Run a job and write its files, returning its status.
+    """
+    start = time.perf_counter()
+    _progress(f"{name}: started")
+    try:
+        files = func(options)
+        write_atomic(files, options.data_dir, workers=options.workers)
+    except Exception:
+        seconds = time.perf_counter() - start
+        error = traceback.format_exc(limit=-3)
+        _progress(f"{name}: FAILED after {seconds:.1f}s\n{error}")
+        return {"status": "failed", "seconds": seconds, "error": error}
+    seconds = time.perf_counter() - start
+    rows = sum(len(df) for df in files.values())
+    _progress(f"{name}: done in {seconds:.1f}s ({rows} rows)")
+
+    return {"status": "done", "seconds": seconds, "rows": rows}
+
+
+def run_jobs(names: list, options, workers: int = 6, jobs: dict = None) -> dict:
+    """
+
+    Run jobs concurrently, each as soon as the jobs it needs have finished.
+
+    A failed job doesn't stop the others, but jobs that need it are
+    skipped. Jobs not in names are treated as already done, e.g. to rerun
+    only the sources that failed.
+
+    Parameters
+    ----------
+    names : list
+        Jobs to run, from JOBS.
+    options : argparse.Namespace
+        Options of the fetch command.
+    workers : int, optional
+        Number of jobs to run at once. The default is 6.
+    jobs : dict, optional
+        Job functions and the jobs they need, by name. The default is None
+        (JOBS).
+
+    Returns
+    -------
+    results : dict
+        Status of each job, by name.
+
+    """
+    jobs = JOBS if jobs is None else jobs
+    results = {}
+    waiting = list(names)
+    running = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        while waiting or running:
+            for name in list(waiting):
+                func, deps = jobs[name]
+                deps = [d for d in deps if d in names]
+                if any(results.get(d, {}).get("status") in ("failed", "skipped")
+                       for d in deps):
+                    waiting.remove(name)
+                    results[name] = {"status": "skipped"}
+                    _progress(f"{name}: skipped, needs {', '.join(deps)}")
+                elif all(results.get(d, {}).get("status") == "done" for d in deps):
+                    waiting.remove(name)
+                    future = executor.submit(_run_job, name, func, options)
+                    running[future] = name
+            if not running:
+                continue
+            finished, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                results[running.pop(future)] = future.result()
+
+    return results
+
+
+# %% Commands
+def fetch(options) -> int:
+    """
+    Fetch every source (or those chosen) into the raw data directory.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    if options.all_boroughs:
+        jobs = batch_jobs(reference.london_boroughs())
+    else:
+        jobs = JOBS
+    # Per borough jobs are chosen by their source, e.g. epc for epc:camden
+    names = list(jobs)
+    if options.only:
+        names = [n for n in names if n.split(":")[0] in options.only]
+    names = [n for n in names if n.split(":")[0] not in options.skip]
+    if options.crime_archive and options.crime_archive.startswith("http"):
+        # Downloaded once for every borough's crime job
+        folder = os.path.join(options.cache_dir, "crime")
+        os.makedirs(folder, exist_ok=True)
+        file = os.path.join(folder, os.path.basename(options.crime_archive))
+        if not os.path.exists(file):
+            print("Downloading", options.crime_archive)
+            transport.download(options.crime_archive, file)
+        options.crime_archive = file
+    start = time.perf_counter()
+    results = run_jobs(names, options, workers=options.workers, jobs=jobs)
+    print(f"\nFetched in {time.perf_counter() - start:.1f}s")
+    for name in names:
+        result = results[name]
+        seconds = f"{result['seconds']:8.1f}s" if "seconds" in result else " " * 9
+        print(f"  {name:<32}{result['status']:<9}{seconds}")
+    failed = [n for n in names if results[n]["status"] != "done"]
+
+    return 1 if failed else 0
+
+
+def _sources(value: str) -> list:
+    names = value.split(",")
+    unknown = [n for n in names if n not in JOBS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown source {', '.join(unknown)}, choose from {', '.join(JOBS)}"
+        )
+
+    return names
+
+
+def main(argv: list = None) -> int:
+    """
+
+    Run the command line interface.
+
+    Parameters
+    ----------
+    argv : list, optional
+        Arguments. The default is None (sys.argv).
+
+    Returns
+    -------
+    int
+        Exit code, 1 if any job failed.
+
+    """
+    parser = argparse.ArgumentParser(prog="hmo_identifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    parser_fetch = commands.add_parser(
+        "fetch", help="fetch all raw data, reference geographies first"
+    )
+    area = parser_fetch.add_mutually_exclusive_group()
+    area.add_argument(
+        "--borough", default=None, help="London borough (default all London)"
+    )
+    area.add_argument(
+        "--all-boroughs",
+        action="store_true",
+        help="fetch London-wide sources once and split them by borough",
+    )
+    parser_fetch.add_argument("--data-dir", default="data/raw")
+    parser_fetch.add_argument(
+        "--cache-dir", default="data/interim", help="cache of parsed downloads"
+    )
+    parser_fetch.add_argument(
+        "--only", type=_sources, default=[], help="comma separated sources to fetch"
+    )
+    parser_fetch.add_argument(
+        "--skip", type=_sources, default=[], help="comma separated sources to skip"
+    )
+    parser_fetch.add_argument("--workers", type=int, default=6)
+    parser_fetch.add_argument(
+        "--crime-archive",
+        default=None,
+        help="path or URL of a data.police.uk archive zip to backfill crime from",
+    )
+    # This will need adjusted for your local file location
+    parser_fetch.add_argument(
+        "--ukb-file",
+        default="F:/project_folders/GIS/UK_Map/201910/GLA/GLA/UKBuildings_Edition_7_GLA.gdb",
+    )
+    parser_fetch.add_argument(
+        "--ukb-link-file",
+        default="F:/project_folders/GIS/UK_Map/201910/OSAB_UKBUILDINGS_NN_LINK_FILE_190822.csv",
+    )
+    options = parser.parse_args(argv)
+
+    return fetch(options)
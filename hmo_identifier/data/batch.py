@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 19:34:21 2026
+Fetch London-wide sources once and split them by borough.
+@author: LiRogers
+"""
+
+import pandas as pd
+from hmo_identifier.data import open, reference, utils
+
+
+def borough_slug(ladnm: str) -> str:
+    """
+    Borough name for file and directory names, e.g. "kensington_and_chelsea".
+    """
+    return ladnm.lower().replace(" ", "_").replace(",", "")
+
+
+def partition(df: pd.DataFrame, ladcd: pd.Series, boroughs: pd.DataFrame) -> dict:
+    """
+
+    Split rows by borough in a single pass.
+
+    Borough codes are hashed once (with groupby) rather than filtering the
+    whole of df once for each borough. Boroughs with no rows get an empty
+    DataFrame, and rows with no borough are dropped.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        London-wide data.
+    ladcd : pd.Series
+        Borough code of each row of df.
+    boroughs : pd.DataFrame
+        Boroughs to return, from reference.london_boroughs.
+
+    Returns
+    -------
+    parts : dict
+        Rows of df by borough name (ladnm).
+
+    """
+    names = boroughs.set_index("ladcd").ladnm
+    groups = {
+        code: part.reset_index(drop=True)
+        for code, part in df.groupby(ladcd.values, sort=False)
+    }
+    parts = {
+        names[code]: groups.get(code, df.iloc[:0]) for code in names.index
+    }
+
+    return parts
+
+
+def _codes_by_name(names: pd.Series, boroughs: pd.DataFrame) -> pd.Series:
+    """
+    Borough codes of borough names written in any form, e.g. "CITY OF
+    WESTMINSTER" or "Kingston upon Thames".
+    """
+    lookup = pd.Series(
+        boroughs.ladcd.values, index=boroughs.ladnm.apply(utils.clean_borough_names)
+    )
+
+    return utils.map_unique(
+        names, lambda x: x.apply(utils.clean_borough_names).map(lookup)
+    )
+
+
+def airbnb_by_borough(boroughs: pd.DataFrame) -> dict:
+    """
+
+    Fetch the most recent AirBnB listings once and split them by borough.
+
+    Parameters
+    ----------
+    boroughs : pd.DataFrame
+        Boroughs to return, from reference.london_boroughs.
+
+    Returns
+    -------
+    dict
+        Listings by borough name, as returned by open.airbnb for each.
+
+    """
+    df = open.airbnb()
+
+    return partition(df, _codes_by_name(df.neighbourhood_cleansed, boroughs), boroughs)
+
+
+def census_by_borough(boroughs: pd.DataFrame) -> dict:
+    """
+
+    Fetch each census table once and split them by borough.
+
+    Parameters
+    ----------
+    boroughs : pd.DataFrame
+        Boroughs to return, from reference.london_boroughs.
+
+    Returns
+    -------
+    dict
+        Census data by borough name, as returned by open.merge_census for
+        each.
+
+    """
+    oas = reference.london_output_areas()
+    oas = oas.loc[oas.ladcd.isin(boroughs.ladcd), :]
+    df = open.merge_census(output_areas=oas)
+    ladcd = df.geography_code.map(oas.set_index("oacd").ladcd)
+
+    return partition(df, ladcd, boroughs)
+
+
+def imd_by_borough(boroughs: pd.DataFrame, cache_dir: str = None) -> dict:
+    """
+
+    Fetch the Index of Multiple Deprivation once and split it by borough.
+
+    Parameters
+    ----------
+    boroughs : pd.DataFrame
+        Boroughs to return, from reference.london_boroughs.
+    cache_dir : str, optional
+        Directory to cache the parsed data in, see open.imd.
+        The default is None.
+
+    Returns
+    -------
+    dict
+        IMD data by borough name, as returned by open.imd for each.
+
+    """
+    df = open.imd(cache_dir=cache_dir)
+
+    return partition(df, df.ladcd, boroughs)
+
+
+def land_registry_by_borough(boroughs: pd.DataFrame) -> dict:
+    """
+
+    Fetch each year of Land Registry price paid data once and split it by
+    borough.
+
+    Parameters
+    ----------
+    boroughs : pd.DataFrame
+        Boroughs to return, from reference.london_boroughs.
+
+    Returns
+    -------
+    dict
+        Price paid data by borough name, as returned by open.land_registry
+        for each.
+
+    """
+    df = open.land_registry()
+
+    return partition(df, _codes_by_name(df.district, boroughs), boroughs)
@@ -6,12 +6,7 @@ Created on Tue Mar 24 10:57:32 2020
 """
 
 import pandas as pd
-import geopandas as gpd
-from dotenv import load_dotenv
-import os
-import psycopg2
-import sys
-from hmo_identifier.data import reference
+from hmo_identifier.data import reference, utils
 
 
 # %% AddressBase/Gazatteer
@@ -48,7 +43,8 @@ def gazateer(
     Returns
     -------
     df : pandas.DataFrame
-        Gazatteer data.
+        Gazatteer data sorted by UPRN, with uprn, udprn and parent_uprn as
+        utils.KEY_DTYPE.
 
     """
 
@@ -91,11 +87,13 @@ def gazateer(
         "postcode_locator",
     ]
     if borough == None:
-        query = f"SELECT {', '.join(cols)} FROM {table_name} WHERE class LIKE 'R%'"
+        query = f"SELECT {', '.join(cols)} FROM {table_name} WHERE class LIKE 'R%' ORDER BY uprn"
     else:
-        query = f"SELECT {', '.join(cols)} FROM {table_name} WHERE administrative_area='{borough.upper()}' AND class LIKE 'R%'"
+        query = f"SELECT {', '.join(cols)} FROM {table_name} WHERE administrative_area='{borough.upper()}' AND class LIKE 'R%' ORDER BY uprn"
+    import psycopg2
+
     con = psycopg2.connect(dbname=dbname, user=user, password=password, host=host)
-    df = pd.read_sql(sql=query, con=con)
+    df = utils.type_keys(pd.read_sql(sql=query, con=con))
 
     return df
 
@@ -132,11 +130,12 @@ def uk_buildings(ukb_file: str, ukb_link_file: str, borough: str = None) -> dict
 
     """
 
-    boroughs = reference.london_boroughs(borough=borough, inc_geom=True)
-    poly_27700 = boroughs.to_crs(27700).unary_union
+    import geopandas as gpd
+
+    area = reference.borough_area(borough=borough, crs=27700)
 
-    df = gpd.read_file(filename=ukb_file, bbox=boroughs)
-    df = df.loc[df.geometry.intersects(poly_27700), :]
+    df = gpd.read_file(filename=ukb_file, bbox=area["bounds"])
+    df = df.loc[reference.geometries_intersect(df.geometry, area), :]
     df = df.assign(
         ubn=df.unique_building_number.astype(str),
         upn=df.unique_property_number.astype(str),
@@ -159,49 +158,9 @@ def uk_buildings(ukb_file: str, ukb_link_file: str, borough: str = None) -> dict
         usecols=["upn", "ubn", "uprn", "udprn"],
         dtype={"upn": str, "ubn": str, "uprn": str, "udprn": str},
     )
+    link_file = utils.type_keys(link_file)
     link_file = link_file.merge(df[["ubn"]], how="inner")
 
     ukb = {"data": df, "link_data": link_file}
 
     return ukb
-
-
-# %% main
-
-if __name__ == "__main__":
-
-    if (len(sys.argv) == 1) | (sys.argv[1] == None):
-        borough = None
-    else:
-        borough = sys.argv[1]
-
-    load_dotenv()
-    dbname = os.getenv("DATABASE")
-    user = os.getenv("USER")
-    password = os.getenv("KEY")
-    host = os.getenv("HOST")
-    table_name = "addbase_ldn_pending"
-    gaz = gazateer(
-        table_name=table_name,
-        dbname=dbname,
-        user=user,
-        password=password,
-        host=host,
-        borough=borough,
-    )
-    file = "data/raw/local/gazatteer.csv"
-    print("Saving file", file)
-    gaz.to_csv(file, index=False)
-
-    # This will need adjusted for your local file location
-    ukb = uk_buildings(
-        ukb_file="F:/project_folders/GIS/UK_Map/201910/GLA/GLA/UKBuildings_Edition_7_GLA.gdb",
-        ukb_link_file="F:/project_folders/GIS/UK_Map/201910/OSAB_UKBUILDINGS_NN_LINK_FILE_190822.csv",
-        borough=borough,
-    )
-    file = "data/raw/local/uk_buildings.csv"
-    print("Saving file", file)
-    ukb["data"].to_csv(file, index=False)
-    file = "data/raw/local/uk_buildings_link.csv"
-    print("Saving file", file)
-    ukb["link_data"].to_csv(file, index=False)
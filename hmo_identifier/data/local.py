@@ -5,15 +5,206 @@ Created on Wed Mar 18 15:47:45 2020
 @author: lirogers
 """
 
+import concurrent.futures
+import hashlib
+import os
 import pandas as pd
+from hmo_identifier.data import transport
 
 
-def hmo_register() -> pd.DataFrame:
+# Camden's Socrata Open Data API. Will need to be adjusted for your own
+# borough's portal.
+SODA_URL = "https://opendata.camden.gov.uk/resource"
+
+
+# %% Socrata Open Data API
+def soda_count(dataset: str, where: str = None) -> int:
+    """
+
+    Number of rows of a Socrata dataset matching where.
+
+    Parameters
+    ----------
+    dataset : str
+        Dataset ID, e.g. "x43g-c2rf".
+    where : str, optional
+        SoQL $where filter. The default is None (all rows).
+
+    Returns
+    -------
+    int
+        Number of rows.
+
+    """
+    params = {"$select": "count(*) AS n"}
+    if where:
+        params["$where"] = where
+    r = transport.get(f"{SODA_URL}/{dataset}.json", params=params)
+    r.raise_for_status()
+
+    return int(r.json()[0]["n"])
+
+
+def soda(
+    dataset: str,
+    select: list = None,
+    where: str = None,
+    page_size: int = 50000,
+    workers: int = 4,
+) -> pd.DataFrame:
+    """
+
+    Fetch rows of a Socrata dataset, pages at a time in parallel.
+
+    Only the columns in select and rows matching where are downloaded.
+    The rows are counted first, then pages are fetched at the same time by
+    $offset, ordered by row ID so pages don't overlap. Every row has its
+    row ID (soda_id) and when it was last updated (soda_updated_at).
+
+    Parameters
+    ----------
+    dataset : str
+        Dataset ID, e.g. "x43g-c2rf".
+    select : list, optional
+        API field names of the columns to fetch. The default is None
+        (all columns).
+    where : str, optional
+        SoQL $where filter, e.g. "ward = 'Camden Town'".
+        The default is None (all rows).
+    page_size : int, optional
+        Rows per request. The default is 50000.
+    workers : int, optional
+        Pages to fetch at once. The default is 4.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The rows, with every column as strings.
+
+    """
+    columns = ":id,:updated_at," + (",".join(select) if select else "*")
+    n = soda_count(dataset, where)
+
+    def page(offset):
+        params = {
+            "$select": columns,
+            "$order": ":id",
+            "$limit": page_size,
+            "$offset": offset,
+        }
+        if where:
+            params["$where"] = where
+        return transport.read_csv(
+            f"{SODA_URL}/{dataset}.csv", params=params, dtype=str
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pages = list(executor.map(page, range(0, max(n, 1), page_size)))
+    df = pd.concat(pages, ignore_index=True).rename(
+        columns={":id": "soda_id", ":updated_at": "soda_updated_at"}
+    )
+
+    return df
+
+
+def soda_sync(
+    dataset: str,
+    cache_dir: str,
+    select: list = None,
+    where: str = None,
+    refresh: bool = False,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+
+    Keep a local copy of a Socrata dataset up to date, only downloading
+    rows changed since the last sync.
+
+    The copy is saved as Parquet in cache_dir, one file for each dataset,
+    select and where. Rows updated since the latest soda_updated_at in the
+    copy replace those with the same soda_id. The API doesn't list deleted
+    rows, so use refresh now and then to download everything again.
+
+    Parameters
+    ----------
+    dataset : str
+        Dataset ID, e.g. "x43g-c2rf".
+    cache_dir : str
+        Directory of the local copies, e.g. "data/interim/soda".
+    select : list, optional
+        API field names of the columns to fetch. The default is None.
+    where : str, optional
+        SoQL $where filter. The default is None.
+    refresh : bool, optional
+        Download every row again. The default is False.
+    **kwargs
+        Passed to soda, e.g. page_size.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Every row of the dataset matching where.
+
+    """
+    key = hashlib.blake2b(
+        repr((dataset, select, where)).encode(), digest_size=8
+    ).hexdigest()
+    os.makedirs(cache_dir, exist_ok=True)
+    file = os.path.join(cache_dir, f"{dataset}_{key}.parquet")
+    df = None
+    if not refresh and os.path.exists(file):
+        df = pd.read_parquet(file)
+    if df is None or len(df) == 0:
+        df = soda(dataset, select=select, where=where, **kwargs)
+    else:
+        # Timestamps are floating, without the trailing Z
+        since = df.soda_updated_at.max().rstrip("Z")
+        changed = f":updated_at >= '{since}'"
+        if where:
+            changed = f"({where}) AND {changed}"
+        new = soda(dataset, select=select, where=changed, **kwargs)
+        df = (
+            pd.concat([df.loc[~df.soda_id.isin(new.soda_id), :], new])
+            .sort_values("soda_id")
+            .reset_index(drop=True)
+        )
+    df.to_parquet(file + ".tmp", index=False)
+    os.replace(file + ".tmp", file)
+
+    return df
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Snake case column names and numbers as numbers, as pd.read_csv would
+    give.
+    """
+    df = df.apply(pd.to_numeric, errors="ignore")
+    df.columns = df.columns.str.lower().str.replace(" ", "_")
+
+    return df
+
+
+# %% Camden datasets
+def hmo_register(
+    select: list = None, where: str = None, cache_dir: str = None
+) -> pd.DataFrame:
     """
     Fetch the Camden HMO Register from
     (here)[https://opendata.camden.gov.uk/Housing/HMO-Licensing-Register/x43g-c2rf].
     Will need to be adjusted for your own borough.
-    
+
+    Parameters
+    ----------
+    select : list, optional
+        API field names of the columns to fetch. The default is None
+        (all columns).
+    where : str, optional
+        SoQL $where filter. The default is None (all rows).
+    cache_dir : str, optional
+        Directory to keep a local copy in, so later calls only download
+        rows that have changed (see soda_sync). The default is None
+        (download everything).
 
     Returns
     -------
@@ -21,39 +212,42 @@ def hmo_register() -> pd.DataFrame:
         HMO register as a pandas dataframe.
 
     """
-    url = "https://opendata.camden.gov.uk/api/views/x43g-c2rf/rows.csv?accessType=DOWNLOAD"
-    df = pd.read_csv(url)
-    df.columns = df.columns.str.lower().str.replace(" ", "_")
+    if cache_dir is None:
+        df = soda("x43g-c2rf", select=select, where=where)
+    else:
+        df = soda_sync("x43g-c2rf", cache_dir, select=select, where=where)
 
-    return df
+    return _typed(df)
 
 
-def social_housing() -> pd.DataFrame:
+def social_housing(
+    select: list = None, where: str = None, cache_dir: str = None
+) -> pd.DataFrame:
     """
-    Fetch data on Camden Housing stock from 
+    Fetch data on Camden Housing stock from
     (here)[https://opendata.camden.gov.uk/Housing/Camden-Housing-Stock/pkzy-2qkt].
     Will need to be adjusted for your own borough.
 
+    Parameters
+    ----------
+    select : list, optional
+        API field names of the columns to fetch. The default is None
+        (all columns).
+    where : str, optional
+        SoQL $where filter. The default is None (all rows).
+    cache_dir : str, optional
+        Directory to keep a local copy in, see hmo_register.
+        The default is None.
+
     Returns
     -------
     df : pd.DataFrame
         Details of social housing as a pandas dataframe.
 
     """
-    url = "https://opendata.camden.gov.uk/api/views/pkzy-2qkt/rows.csv?accessType=DOWNLOAD"
-    df = pd.read_csv(url)
-    df.columns = df.columns.str.lower().str.replace(" ", "_")
-
-    return df
-
-
-if __name__ == "__main__":
+    if cache_dir is None:
+        df = soda("pkzy-2qkt", select=select, where=where)
+    else:
+        df = soda_sync("pkzy-2qkt", cache_dir, select=select, where=where)
 
-    df = hmo_register()
-    file = "data/raw/local/hmo_register.csv"
-    print("Saving file", file)
-    df.to_csv(file, index=False)
-    df = social_housing()
-    file = "data/raw/local/social_housing.csv"
-    print("Saving file", file)
-    df.to_csv(file, index=False)
+    return _typed(df)
@@ -5,25 +5,96 @@ Functions to fetch open data
 @author: lirogers
 """
 
+from __future__ import annotations
+
 import pandas as pd
-from bs4 import BeautifulSoup
-import requests
 import re
-from hmo_identifier.data import utils, reference
-import geopandas as gpd
-import shapely
-from pandas.io.json import json_normalize
+from hmo_identifier.data import utils, reference, transport
 import datetime
-import dateutil
-import time
-import sys
 import io
-from dotenv import load_dotenv
 import os
+from typing import TYPE_CHECKING, Union
+
+# Scraping, geo and date libraries are imported by the functions that use
+# them, so importing this module doesn't load them all
+if TYPE_CHECKING:
+    import geopandas as gpd
+    import shapely.geometry
 
 
 # %% Airbnb data
 
+# Listing attributes kept once per listing in the archive index
+_AIRBNB_LISTING_COLS = [
+    "id",
+    "host_id",
+    "neighbourhood_cleansed",
+    "latitude",
+    "longitude",
+    "room_type",
+    "property_type",
+    "accommodates",
+    "bedrooms",
+]
+# Attributes kept for every snapshot a listing appears in
+_AIRBNB_SNAPSHOT_COLS = ["id", "price", "availability_365", "number_of_reviews"]
+
+
+def airbnb_links() -> list:
+    """
+    Find the links to all London listings snapshots published by Inside Airbnb.
+
+    Returns
+    -------
+    list
+        Links to the listings files, sorted from oldest to most recent.
+
+    """
+    inside_airbnb = "http://insideairbnb.com/get-the-data.html"
+    req = transport.get(inside_airbnb)
+    req.raise_for_status()
+    html_page = req.content
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_page)
+    links = [
+        link.get("href")
+        for link in soup.findAll("a", href=re.compile("london/.+listings\.csv\.gz"))
+    ]
+
+    return list(sorted(set(links)))
+
+
+def airbnb_borough(df: pd.DataFrame, borough: str = None) -> pd.DataFrame:
+    """
+    Filter AirBnB listings to a London borough.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        AirBnB listings, must contain neighbourhood_cleansed.
+    borough : str, optional
+        London borough name. The default is None (all boroughs returned).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Listings in the requested borough.
+
+    """
+    if borough is not None:
+        borough_clean = utils.clean_borough_names(borough)
+        df = df.loc[
+            utils.map_unique(
+                df.neighbourhood_cleansed,
+                lambda x: x.apply(utils.clean_borough_names),
+            )
+            == borough_clean,
+            :,
+        ].reset_index(drop=True)
+
+    return df
+
 
 def airbnb(borough: str = None) -> pd.DataFrame:
     """
@@ -43,17 +114,8 @@ def airbnb(borough: str = None) -> pd.DataFrame:
         A dataframe of AirBnB listings.
 
     """
-    inside_airbnb = "http://insideairbnb.com/get-the-data.html"
-    req = requests.get(inside_airbnb)
-    req.raise_for_status()
-    html_page = req.content
-    soup = BeautifulSoup(html_page)
-    links = [
-        link.get("href")
-        for link in soup.findAll("a", href=re.compile("london/.+listings\.csv\.gz"))
-    ]
-    most_recent_link = list(sorted(set(links)))[-1]
-    df = pd.read_csv(
+    most_recent_link = airbnb_links()[-1]
+    df = transport.read_csv(
         most_recent_link,
         compression="gzip",
         dtype={
@@ -63,12 +125,255 @@ def airbnb(borough: str = None) -> pd.DataFrame:
             "jurisdiction_names": str,
         },
     )
-    if borough is not None:
-        borough_clean = utils.clean_borough_names(borough)
-        df = df.loc[
-            df.neighbourhood_cleansed.apply(utils.clean_borough_names) == borough_clean,
-            :,
-        ].reset_index(drop=True)
+    df = airbnb_borough(df, borough)
+
+    return df
+
+
+def airbnb_snapshot(link: str, borough: str = None) -> pd.DataFrame:
+    """
+    Read the columns needed for the AirBnB archive from one listings snapshot.
+
+    Parameters
+    ----------
+    link : str
+        Link to a listings snapshot, as returned by airbnb_links.
+    borough : str, optional
+        London borough name. The default is None (all boroughs returned).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Compactly typed listings with a snapshot date column.
+
+    """
+    snapshot = re.search("/([0-9]{4}-[0-9]{2}-[0-9]{2})/", link).group(1)
+    wanted = set(_AIRBNB_LISTING_COLS + _AIRBNB_SNAPSHOT_COLS)
+    df = transport.read_csv(
+        link,
+        compression="gzip",
+        usecols=lambda col: col in wanted,
+        dtype={"price": str},
+    )
+    df = airbnb_borough(df, borough)
+    # Older snapshots do not always have every column
+    df = df.reindex(
+        columns=_AIRBNB_LISTING_COLS + _AIRBNB_SNAPSHOT_COLS[1:]
+    ).drop_duplicates("id")
+    df = df.assign(
+        snapshot=pd.Timestamp(snapshot),
+        price=pd.to_numeric(
+            df.price.str.replace("[$,]", ""), errors="coerce"
+        ).astype("float32"),
+        latitude=df.latitude.astype("float32"),
+        longitude=df.longitude.astype("float32"),
+        accommodates=df.accommodates.astype("float32"),
+        bedrooms=df.bedrooms.astype("float32"),
+        availability_365=df.availability_365.astype("float32"),
+        number_of_reviews=df.number_of_reviews.astype("float32"),
+        neighbourhood_cleansed=df.neighbourhood_cleansed.astype("category"),
+        room_type=df.room_type.astype("category"),
+        property_type=df.property_type.astype("category"),
+    )
+
+    return df
+
+
+def _write_partition(path: str, partition: str, df: pd.DataFrame, **kwargs) -> None:
+    """
+    Write df as path/partition/part.parquet. The partition is written in a
+    hidden directory (skipped when reading the dataset) then renamed into
+    place, so it only ever appears complete. An existing partition is
+    replaced. kwargs are passed to to_parquet.
+    """
+    import shutil
+
+    tmp_path = os.path.join(path, f".{partition}.tmp")
+    part_path = os.path.join(path, partition)
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    df.to_parquet(os.path.join(tmp_path, "part.parquet"), index=False, **kwargs)
+    shutil.rmtree(part_path, ignore_errors=True)
+    os.replace(tmp_path, part_path)
+
+
+# Rows per row group of archived snapshots, so looking up listings by id
+# only reads the row groups that could contain them
+_AIRBNB_ROW_GROUP_SIZE = 10000
+# Key of the archived snapshot dates in the listing index's metadata
+_AIRBNB_SNAPSHOTS_KEY = b"hmo_identifier.snapshots"
+
+
+def airbnb_snapshots(path: str) -> list:
+    """
+
+    Snapshots in an AirBnB archive, in the form YYYY-MM-DD.
+
+    A snapshot is only archived once the listing index includes it, so
+    partitions left by a failed run aren't counted.
+
+    Parameters
+    ----------
+    path : str
+        Directory of an archive created by airbnb_archive.
+
+    Returns
+    -------
+    list
+        Sorted snapshot dates.
+
+    """
+    import json
+    import pyarrow.parquet as pq
+
+    index_file = os.path.join(path, "listings.parquet")
+    if not os.path.exists(index_file):
+        return []
+    metadata = pq.read_schema(index_file).metadata or {}
+    if _AIRBNB_SNAPSHOTS_KEY not in metadata:
+        # Archives made before the index listed its snapshots
+        snapshot_path = os.path.join(path, "snapshots")
+        return sorted(
+            part.replace("snapshot=", "")
+            for part in os.listdir(snapshot_path)
+            if part.startswith("snapshot=")
+            and os.path.exists(os.path.join(snapshot_path, part, "part.parquet"))
+        )
+
+    return json.loads(metadata[_AIRBNB_SNAPSHOTS_KEY])
+
+
+def airbnb_archive(path: str, borough: str = None) -> pd.DataFrame:
+    """
+    Archive every AirBnB listings snapshot published by Inside Airbnb.
+
+    Snapshots already in the archive are skipped, so only new snapshots are
+    downloaded and read. Each snapshot is appended as its own partition
+    (path/snapshots/snapshot=YYYY-MM-DD) holding only the columns that change
+    between snapshots, sorted by listing id in row groups of
+    _AIRBNB_ROW_GROUP_SIZE listings. Listing attributes are kept once per
+    listing in an index (path/listings.parquet) along with when the listing
+    was first and last seen.
+
+    The index also lists the archived snapshots, and is replaced after each
+    snapshot's partition is in place. A snapshot is only archived once the
+    index has been replaced, so a failed run is picked up again from the
+    snapshot it failed on.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the archive. Created if it doesn't exist.
+        An archive should only ever be used for one borough (or all).
+    borough : str, optional
+        London borough name. The default is None (all boroughs returned).
+
+    Returns
+    -------
+    index : pd.DataFrame
+        The updated listing index, one row per listing id.
+
+    """
+    import json
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    snapshot_path = os.path.join(path, "snapshots")
+    index_file = os.path.join(path, "listings.parquet")
+    os.makedirs(snapshot_path, exist_ok=True)
+    archived = set(airbnb_snapshots(path))
+    if os.path.exists(index_file):
+        index = pd.read_parquet(index_file)
+    else:
+        index = pd.DataFrame()
+
+    for link in airbnb_links():
+        snapshot = re.search("/([0-9]{4}-[0-9]{2}-[0-9]{2})/", link).group(1)
+        if snapshot in archived:
+            continue
+        df = airbnb_snapshot(link, borough=borough)
+
+        # Replaces any partition left by a failed run
+        _write_partition(
+            snapshot_path,
+            f"snapshot={snapshot}",
+            df[_AIRBNB_SNAPSHOT_COLS].sort_values("id"),
+            row_group_size=_AIRBNB_ROW_GROUP_SIZE,
+        )
+
+        # Update the listing index with this snapshot only
+        new = df[_AIRBNB_LISTING_COLS + ["snapshot"]].assign(n_snapshots=1)
+        new = new.rename(columns={"snapshot": "last_seen"}).assign(
+            first_seen=new.snapshot
+        )
+        index = pd.concat([index, new], sort=False, ignore_index=True)
+        index = index.sort_values(["id", "last_seen"])
+        seen = index.groupby("id").agg(
+            {"first_seen": "min", "n_snapshots": "sum"}
+        )
+        index = (
+            index.drop_duplicates("id", keep="last")
+            .drop(columns=["first_seen", "n_snapshots"])
+            .merge(seen, left_on="id", right_index=True)
+            .reset_index(drop=True)
+        )
+
+        # Replacing the index is what marks the snapshot as archived
+        archived.add(snapshot)
+        table = pa.Table.from_pandas(index, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {
+                **(table.schema.metadata or {}),
+                _AIRBNB_SNAPSHOTS_KEY: json.dumps(sorted(archived)).encode(),
+            }
+        )
+        pq.write_table(table, index_file + ".tmp")
+        os.replace(index_file + ".tmp", index_file)
+
+    return index
+
+
+def airbnb_history(path: str, listing_ids: list = None) -> pd.DataFrame:
+    """
+    Fetch the snapshot history of listings from an AirBnB archive.
+
+    Only the row groups containing the requested listings are read from
+    each snapshot partition.
+
+    Parameters
+    ----------
+    path : str
+        Directory of an archive created by airbnb_archive.
+    listing_ids : list, optional
+        Listing ids to look up. The default is None (all listings returned).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Price and availability of each listing at each snapshot, indexed by
+        listing id and sorted by snapshot. first_seen and last_seen
+        are included from the listing index.
+
+    """
+    filters = None
+    if listing_ids is not None:
+        filters = [("id", "in", set(listing_ids))]
+    df = pd.read_parquet(os.path.join(path, "snapshots"), filters=filters)
+    # Partitions of snapshots not yet in the index are from a failed run
+    df = df.loc[df.snapshot.astype(str).isin(airbnb_snapshots(path)), :]
+    if listing_ids is not None:
+        # Filters only prune row groups, not rows
+        df = df.loc[df.id.isin(listing_ids), :]
+    df = df.assign(snapshot=pd.to_datetime(df.snapshot.astype(str)))
+    index = pd.read_parquet(
+        os.path.join(path, "listings.parquet"),
+        columns=["id", "first_seen", "last_seen"],
+    )
+    df = (
+        df.merge(index, how="left", on="id")
+        .sort_values(["id", "snapshot"])
+        .set_index("id")
+    )
 
     return df
 
@@ -76,7 +381,9 @@ def airbnb(borough: str = None) -> pd.DataFrame:
 # %% Census data
 
 
-def fetch_census(table: str, borough: str = None) -> pd.DataFrame:
+def fetch_census(
+    table: str, borough: str = None, output_areas: pd.DataFrame = None
+) -> pd.DataFrame:
     """
     Fetch a census table.
 
@@ -87,6 +394,10 @@ def fetch_census(table: str, borough: str = None) -> pd.DataFrame:
         Options are 'hhold_comp_bedrooms', 'hhold_comp_occ_rating' or 'tenure_occ_rating'
     borough : str, optional
         London borough name. The default is None (all boroughs returned).
+    output_areas : pd.DataFrame, optional
+        Output areas to keep, from reference.london_output_areas, to save
+        fetching them for each table. The default is None (fetched for
+        borough).
 
     Returns
     -------
@@ -94,7 +405,9 @@ def fetch_census(table: str, borough: str = None) -> pd.DataFrame:
         A dataframe of census data from the relevant table for the requested areas.
 
     """
-    if borough is not None:
+    if output_areas is not None:
+        oas = output_areas
+    elif borough is not None:
         borough_name = utils.match_borough_name(borough)
         oas = reference.london_output_areas(borough=borough_name)
     else:
@@ -106,7 +419,7 @@ def fetch_census(table: str, borough: str = None) -> pd.DataFrame:
     }
     url = census_urls[table]
 
-    df = pd.read_csv(url)
+    df = transport.read_csv(url)
 
     df.columns = (
         df.columns.str.replace("[:; ]+", "_")
@@ -120,7 +433,9 @@ def fetch_census(table: str, borough: str = None) -> pd.DataFrame:
     return df
 
 
-def merge_census(borough: str = None) -> pd.DataFrame:
+def merge_census(
+    borough: str = None, output_areas: pd.DataFrame = None
+) -> pd.DataFrame:
     """
     Merge census tables from fetch_census
 
@@ -128,6 +443,8 @@ def merge_census(borough: str = None) -> pd.DataFrame:
     ----------
     borough : str, optional
          London borough name. The default is None (all boroughs returned).
+    output_areas : pd.DataFrame, optional
+        Output areas to keep, see fetch_census. The default is None.
 
     Returns
     -------
@@ -140,9 +457,16 @@ def merge_census(borough: str = None) -> pd.DataFrame:
         "hhold_comp_occ_rating",
         "tenure_occ_rating",
     ]
+    # Output areas are fetched once for all tables
+    if output_areas is None and borough is not None:
+        output_areas = reference.london_output_areas(
+            borough=utils.match_borough_name(borough)
+        )
+    elif output_areas is None:
+        output_areas = reference.london_output_areas()
     tables = []
     for table in census_tables:
-        df = fetch_census(table, borough=borough)
+        df = fetch_census(table, borough=borough, output_areas=output_areas)
         tables.append(df)
     start = True
     for table in tables:
@@ -187,14 +511,17 @@ def env_to_coord_str(env: shapely.geometry.Polygon) -> str:
     return coords_str
 
 
-def crime_month(poly: shapely.geometry.Polygon, date: str = None) -> gpd.GeoDataFrame:
+def crime_month(
+    poly: Union[shapely.geometry.Polygon, dict], date: str = None
+) -> gpd.GeoDataFrame:
     """
     Fetch monthly crime data from Police API
 
     Parameters
     ----------
-    poly : shapely.geometry.Polygon
-        Polygon of area required. Should be EPSG:4326
+    poly : Union[shapely.geometry.Polygon, dict]
+        Polygon of area required, or the output of reference.borough_area.
+        Should be EPSG:4326
     date : str, optional
         Month requested in form YYYY-MM.
         The default is None and returns the most recent month of data.
@@ -205,7 +532,16 @@ def crime_month(poly: shapely.geometry.Polygon, date: str = None) -> gpd.GeoData
         All crime data in relevant month and polygon at street level.
 
     """
+    import geopandas as gpd
+    import shapely.affinity
+    from pandas.io.json import json_normalize
+
     API = "https://data.police.uk/api/crimes-street/all-crime"
+    if isinstance(poly, dict):
+        area = poly
+        poly = area["exact"]
+    else:
+        area = reference.prepare_area(poly)
     # Get a list of the polygon bounding box coords
     # Get this into the right format for the API
     # lat,long:lat,long...
@@ -219,8 +555,9 @@ def crime_month(poly: shapely.geometry.Polygon, date: str = None) -> gpd.GeoData
         params = {"poly": coords_str}
         if date is not None:
             params["date"] = date
-        # Send a get request
-        r = requests.get(API, params=params)
+        # Send a get request. 503 means too many crimes in the area, so it
+        # isn't retried but split into quarters
+        r = transport.get(API, params=params, retry_statuses=(429, 500, 502, 504))
         if r.status_code == 503:
             new_envs = [
                 shapely.affinity.scale(
@@ -238,9 +575,6 @@ def crime_month(poly: shapely.geometry.Polygon, date: str = None) -> gpd.GeoData
             ]
             envs = envs + new_envs
             continue
-        elif r.status_code == 500:
-            time.sleep(20)
-            r = requests.get(API, params=params)
 
         r.raise_for_status()
         response = r.json()
@@ -260,11 +594,18 @@ def crime_month(poly: shapely.geometry.Polygon, date: str = None) -> gpd.GeoData
         crs="EPSG:4326",
     )
     # Only keep points within the original polygon
-    gdf = gdf.loc[gdf.geometry.within(poly), :]
+    gdf = gdf.loc[
+        reference.points_within(
+            all_df.location_longitude.values, all_df.location_latitude.values, area
+        ),
+        :,
+    ]
     return gdf
 
 
-def crime_year(borough: str = None, date: str = None) -> gpd.GeoDataFrame:
+def crime_year(
+    borough: str = None, date: str = None, archive: str = None
+) -> gpd.GeoDataFrame:
     """
     
     Fetch yearly crime data from Police API
@@ -277,20 +618,40 @@ def crime_year(borough: str = None, date: str = None) -> gpd.GeoDataFrame:
     date : str, optional
         Final month of year of data requested in form YYYY-MM.
         The default is None and returns the most recent year of data.
+    archive : str, optional
+        Directory of a store made by crime_archive for the same borough.
+        Months in the store are read from it, and only the others are
+        fetched from the API. The default is None (all from the API).
 
     Returns
     -------
     gdf : gpd.GeoDataFrame
-        All crime data in relevant year and borough at street level.
+        All crime data in relevant year and borough at street level, with
+        the columns in _CRIME_COLS (those both the API and archives have)
+        and geometry.
 
     """
-    boroughs = reference.london_boroughs(borough=borough, inc_geom=True)
-    polygon = boroughs.geometry.unary_union
+    import geopandas as gpd
+
+    polygon = reference.borough_area(borough)
+    archived = set()
+    if archive is not None:
+        archived = set(crime_months(archive))
     num_months = 0
     all_crime = []
     while num_months < 12:
-        crime = crime_month(polygon, date=date)
-        all_crime.append(crime)
+        if date in archived:
+            crime = crime_history(archive, [date])
+            crime = gpd.GeoDataFrame(
+                crime,
+                geometry=gpd.points_from_xy(
+                    crime.location_longitude, crime.location_latitude
+                ),
+                crs="EPSG:4326",
+            )
+        else:
+            crime = crime_month(polygon, date=date)
+        all_crime.append(crime.reindex(columns=_CRIME_COLS + ["geometry"]))
         if date is None:
             date = crime.month.unique()[0]
         date = (
@@ -302,30 +663,213 @@ def crime_year(borough: str = None, date: str = None) -> gpd.GeoDataFrame:
     return df
 
 
-# %% IMD
+# %% Crime archive
+
+# Archive crime types, as the category slugs returned by the Police API
+_CRIME_CATEGORIES = {
+    "Anti-social behaviour": "anti-social-behaviour",
+    "Bicycle theft": "bicycle-theft",
+    "Burglary": "burglary",
+    "Criminal damage and arson": "criminal-damage-arson",
+    "Drugs": "drugs",
+    "Other crime": "other-crime",
+    "Other theft": "other-theft",
+    "Possession of weapons": "possession-of-weapons",
+    "Public order": "public-order",
+    "Robbery": "robbery",
+    "Shoplifting": "shoplifting",
+    "Theft from the person": "theft-from-the-person",
+    "Vehicle crime": "vehicle-crime",
+    "Violence and sexual offences": "violent-crime",
+}
+# Columns of crime_month that archives have too, so crimes from either
+# look the same
+_CRIME_COLS = [
+    "persistent_id",
+    "category",
+    "month",
+    "location_latitude",
+    "location_longitude",
+    "location_street_name",
+    "outcome_status_category",
+    "context",
+]
+# Archive columns, renamed to match crime_month
+_CRIME_ARCHIVE_COLS = {
+    "Crime ID": "persistent_id",
+    "Month": "month",
+    "Longitude": "location_longitude",
+    "Latitude": "location_latitude",
+    "Location": "location_street_name",
+    "LSOA code": "lsoacd",
+    "Crime type": "category",
+    "Last outcome category": "outcome_status_category",
+    "Context": "context",
+}
+
+
+def crime_months(path: str) -> list:
+    """
+    Months in a crime store made by crime_archive, oldest first.
+    """
+    if not os.path.exists(path):
+        return []
+
+    # Months are written whole then renamed into place, so a month without
+    # its part.parquet was never finished
+    return sorted(
+        part.replace("month=", "")
+        for part in os.listdir(path)
+        if part.startswith("month=")
+        and os.path.exists(os.path.join(path, part, "part.parquet"))
+    )
 
 
-def imd(borough: str = None) -> pd.DataFrame:
+def crime_archive_csv(file, area: dict) -> pd.DataFrame:
     """
-    
-    Fetch Index of Multiple Deprivation (IMD) data from 
-    (here)[https://www.gov.uk/government/statistics/english-indices-of-deprivation-2019].
+
+    Read one street level crime CSV from a data.police.uk archive, keeping
+    only crimes within area.
 
     Parameters
     ----------
+    file : str or file-like
+        A force's street CSV, e.g. 2020-01/2020-01-metropolitan-street.csv.
+    area : dict
+        Area to keep, from reference.borough_area (EPSG:4326).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Crimes with the column names and category slugs of crime_month.
+
+    """
+    df = pd.read_csv(
+        file,
+        usecols=list(_CRIME_ARCHIVE_COLS),
+        dtype={"Longitude": "float64", "Latitude": "float64", "Context": str},
+    )
+    df = df.loc[
+        reference.points_within(df.Longitude.values, df.Latitude.values, area), :
+    ]
+    df = df.rename(columns=_CRIME_ARCHIVE_COLS).assign(
+        category=lambda x: x.category.map(_CRIME_CATEGORIES).astype("category")
+    )
+
+    return df.reset_index(drop=True)
+
+
+def crime_archive(
+    archive: str,
+    path: str,
+    borough: str = None,
+    forces: tuple = ("metropolitan", "city-of-london", "btp"),
+) -> list:
+    """
+
+    Add the months in a data.police.uk archive to a month partitioned crime
+    store, e.g. for backfilling years of crime without the API.
+
+    Archives (https://data.police.uk/data/archive/) hold every force's
+    street level crime for up to three years. Each force's CSV is read
+    straight out of the zip, filtered to the borough and appended as its
+    month's partition (path/month=YYYY-MM/part.parquet). Months already in
+    the store are skipped. Read the store with crime_history.
+
+    Parameters
+    ----------
+    archive : str
+        Path or URL of an archive zip, e.g.
+        "https://data.police.uk/data/archive/2020-01.zip".
+        URLs are downloaded to a temporary file first.
+    path : str
+        Directory of the store. Created if it doesn't exist.
+        A store should only ever be used for one borough (or all).
     borough : str, optional
-         London borough name. The default is None (all boroughs returned).
+        London borough name. The default is None (all boroughs).
+    forces : tuple, optional
+        Forces to read, as named in the archive. The default is
+        ("metropolitan", "city-of-london", "btp"), every force the Police
+        API returns crimes in London for.
+
+    Returns
+    -------
+    months : list
+        Months added to the store.
+
+    """
+    import tempfile
+    import zipfile
+
+    os.makedirs(path, exist_ok=True)
+    stored = set(crime_months(path))
+    area = reference.borough_area(borough)
+    with tempfile.TemporaryDirectory() as tmp:
+        if re.match("https?://", archive):
+            archive = transport.download(archive, os.path.join(tmp, "archive.zip"))
+        with zipfile.ZipFile(archive) as zf:
+            members = {}
+            for name in zf.namelist():
+                match = re.search(
+                    "([0-9]{4}-[0-9]{2})-(.+)-street\\.csv$", name
+                )
+                if match and match.group(2) in forces:
+                    members.setdefault(match.group(1), []).append(name)
+            months = sorted(m for m in members if m not in stored)
+            for month in months:
+                dfs = []
+                for name in members[month]:
+                    with zf.open(name) as f:
+                        dfs.append(crime_archive_csv(f, area))
+                df = utils.concat_categorical(dfs)
+                # Replaces any partial month left by a failed run
+                _write_partition(path, f"month={month}", df)
+
+    return months
+
+
+def crime_history(path: str, months: list = None) -> pd.DataFrame:
+    """
+
+    Read crimes from a store made by crime_archive.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the store.
+    months : list, optional
+        Months to read, in the form YYYY-MM. The default is None
+        (all months).
 
     Returns
     -------
     df : pd.DataFrame
-        IMD data for the relevant area as a pandas dataframe.
+        Crimes with the column names and category slugs of crime_month.
 
     """
-    url = "https://assets.publishing.service.gov.uk/government/uploads/system/uploads/attachment_data/file/833970/File_1_-_IMD2019_Index_of_Multiple_Deprivation.xlsx"
-    df = pd.read_excel(url, sheet_name="IMD2019")
-    df.columns = (
-        df.columns.str.lower()
+    if months is None:
+        months = crime_months(path)
+    dfs = [
+        pd.read_parquet(os.path.join(path, f"month={month}", "part.parquet"))
+        for month in months
+    ]
+    if len(dfs) == 0:
+        return pd.DataFrame(columns=list(_CRIME_ARCHIVE_COLS.values()))
+
+    return utils.concat_categorical(dfs)
+
+
+# %% IMD
+
+_IMD_URL = "https://assets.publishing.service.gov.uk/government/uploads/system/uploads/attachment_data/file/833970/File_1_-_IMD2019_Index_of_Multiple_Deprivation.xlsx"
+
+
+def _imd_columns(columns: list) -> list:
+    """
+    Snake case IMD column names, e.g. "LSOA code (2011)" to "lsoacd".
+    """
+    columns = (
+        pd.Index(columns).str.lower()
         .str.replace(" ", "_")
         .str.replace("\(|\)", "")
         .str.replace("name", "nm")
@@ -335,16 +879,285 @@ def imd(borough: str = None) -> pd.DataFrame:
         .str.replace("index_of_multiple_deprivation_", "")
         .str.replace("_[0-9]{4}$", "")
     )
+
+    return columns.tolist()
+
+
+def _sheet_rows(file, sheet: str):
+    """
+    Rows of a worksheet, read with python-calamine if it's installed (much
+    faster), otherwise streamed with openpyxl in read only mode.
+
+    calamine reads the whole sheet into its own (compact) cells, but rows
+    are converted to python objects one at a time where the installed
+    version has iter_rows. Older versions only have to_python, which
+    converts the whole sheet at once.
+    """
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        CalamineWorkbook = None
+    if CalamineWorkbook is not None:
+        if isinstance(file, str):
+            wb = CalamineWorkbook.from_path(file)
+        else:
+            wb = CalamineWorkbook.from_filelike(file)
+        ws = wb.get_sheet_by_name(sheet)
+        if hasattr(ws, "iter_rows"):
+            yield from ws.iter_rows()
+        else:
+            yield from ws.to_python()
+        return
+    import openpyxl
+
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from wb[sheet].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def read_imd(file, lad_prefix: str = "E09") -> pd.DataFrame:
+    """
+
+    Read the IMD workbook one row at a time, keeping only the rows of local
+    authorities starting with lad_prefix.
+
+    Rows outside the area are dropped as they're read, so the whole of
+    England is never held in a DataFrame or as python objects.
+    python-calamine is used if it's installed, otherwise openpyxl in read
+    only mode.
+
+    Parameters
+    ----------
+    file : str or file-like
+        The IMD workbook.
+    lad_prefix : str, optional
+        Start of the local authority codes to keep. The default is "E09"
+        (London boroughs).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        IMD data with snake case column names.
+
+    """
+    rows = _sheet_rows(file, "IMD2019")
+    columns = _imd_columns(next(rows))
+    lad = columns.index("ladcd")
+    kept = [
+        row
+        for row in rows
+        if isinstance(row[lad], str) and row[lad].startswith(lad_prefix)
+    ]
+    df = pd.DataFrame(kept, columns=columns)
+    # calamine reads every number as a float, ranks and deciles are ints
+    for col in df.select_dtypes("float").columns:
+        if (df[col] % 1 == 0).all():
+            df[col] = df[col].astype("int64")
+
+    return df
+
+
+def imd(
+    borough: str = None, cache_dir: str = None, refresh: bool = False
+) -> pd.DataFrame:
+    """
+    
+    Fetch Index of Multiple Deprivation (IMD) data from 
+    (here)[https://www.gov.uk/government/statistics/english-indices-of-deprivation-2019].
+
+    With cache_dir, the London rows are saved as Parquet named by the hash
+    of the workbook, so the workbook is only parsed again if it changes,
+    and later calls load the Parquet without downloading the workbook.
+
+    Parameters
+    ----------
+    borough : str, optional
+         London borough name. The default is None (all boroughs returned).
+    cache_dir : str, optional
+        Directory to cache the parsed data in, e.g. "data/interim/imd".
+        The default is None (no cache).
+    refresh : bool, optional
+        Download the workbook again, even if it's cached. It's only parsed
+        again if it has changed. The default is False.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        IMD data for the relevant area as a pandas dataframe.
+
+    """
+    import hashlib
+    import json
+
+    df = None
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Hash of the workbook last downloaded from each URL
+        index_file = os.path.join(cache_dir, "imd_sources.json")
+        sources = {}
+        if os.path.exists(index_file):
+            with open(index_file) as f:
+                sources = json.load(f)
+        if not refresh and _IMD_URL in sources:
+            file = os.path.join(cache_dir, f"imd_{sources[_IMD_URL]}.parquet")
+            if os.path.exists(file):
+                df = pd.read_parquet(file)
+    if df is None:
+        r = transport.get(_IMD_URL)
+        r.raise_for_status()
+        key = hashlib.blake2b(r.content, digest_size=16).hexdigest()
+        file = None
+        if cache_dir is not None:
+            file = os.path.join(cache_dir, f"imd_{key}.parquet")
+        if file is not None and os.path.exists(file):
+            df = pd.read_parquet(file)
+        else:
+            df = read_imd(io.BytesIO(r.content))
+        if file is not None:
+            if not os.path.exists(file):
+                df.to_parquet(file + ".tmp", index=False)
+                os.replace(file + ".tmp", file)
+            sources[_IMD_URL] = key
+            with open(index_file + ".tmp", "w") as f:
+                json.dump(sources, f)
+            os.replace(index_file + ".tmp", index_file)
     if borough is not None:
-        df = df.loc[df.ladnm == borough, :]
-    else:
-        df = df.loc[df.ladcd.str.startswith("E09"), :]
+        df = df.loc[df.ladnm == borough, :].reset_index(drop=True)
 
     return df
 
 
 # %% EPC data
 
+# Types to apply to EPC columns. Columns not listed (addresses, lmk_key and
+# free text) are kept as strings.
+_EPC_SCHEMA = {
+    "uprn": utils.KEY_DTYPE,
+    "current_energy_rating": "category",
+    "potential_energy_rating": "category",
+    "current_energy_efficiency": "Int32",
+    "potential_energy_efficiency": "Int32",
+    "property_type": "category",
+    "built_form": "category",
+    "inspection_date": "datetime64[ns]",
+    "local_authority": "category",
+    "constituency": "category",
+    "county": "category",
+    "lodgement_date": "datetime64[ns]",
+    "transaction_type": "category",
+    "environment_impact_current": "Int32",
+    "environment_impact_potential": "Int32",
+    "energy_consumption_current": "float32",
+    "energy_consumption_potential": "float32",
+    "co2_emissions_current": "float32",
+    "co2_emiss_curr_per_floor_area": "float32",
+    "co2_emissions_potential": "float32",
+    "lighting_cost_current": "float32",
+    "lighting_cost_potential": "float32",
+    "heating_cost_current": "float32",
+    "heating_cost_potential": "float32",
+    "hot_water_cost_current": "float32",
+    "hot_water_cost_potential": "float32",
+    "total_floor_area": "float32",
+    "energy_tariff": "category",
+    "mains_gas_flag": "category",
+    "floor_level": "category",
+    "flat_top_storey": "category",
+    "flat_storey_count": "float32",
+    "main_heating_controls": "category",
+    "multi_glaze_proportion": "float32",
+    "glazed_type": "category",
+    "glazed_area": "category",
+    "extension_count": "Int32",
+    "number_habitable_rooms": "Int32",
+    "number_heated_rooms": "Int32",
+    "low_energy_lighting": "float32",
+    "number_open_fireplaces": "Int32",
+    "hotwater_description": "category",
+    "hot_water_energy_eff": "category",
+    "hot_water_env_eff": "category",
+    "floor_description": "category",
+    "floor_energy_eff": "category",
+    "floor_env_eff": "category",
+    "windows_description": "category",
+    "windows_energy_eff": "category",
+    "windows_env_eff": "category",
+    "walls_description": "category",
+    "walls_energy_eff": "category",
+    "walls_env_eff": "category",
+    "secondheat_description": "category",
+    "sheating_energy_eff": "category",
+    "sheating_env_eff": "category",
+    "roof_description": "category",
+    "roof_energy_eff": "category",
+    "roof_env_eff": "category",
+    "mainheat_description": "category",
+    "mainheat_energy_eff": "category",
+    "mainheat_env_eff": "category",
+    "mainheatcont_description": "category",
+    "mainheatc_energy_eff": "category",
+    "mainheatc_env_eff": "category",
+    "lighting_description": "category",
+    "lighting_energy_eff": "category",
+    "lighting_env_eff": "category",
+    "main_fuel": "category",
+    "wind_turbine_count": "Int32",
+    "heat_loss_corridor": "category",
+    "unheated_corridor_length": "float32",
+    "floor_height": "float32",
+    "photo_supply": "float32",
+    "solar_water_heating_flag": "category",
+    "mechanical_ventilation": "category",
+    "local_authority_label": "category",
+    "constituency_label": "category",
+    "posttown": "category",
+    "construction_age_band": "category",
+    "lodgement_datetime": "datetime64[ns]",
+    "tenure": "category",
+    "fixed_lighting_outlets_count": "Int32",
+    "low_energy_fixed_light_count": "Int32",
+}
+
+
+def type_epc(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert EPC columns from strings to compact types.
+
+    Enumerations become categoricals, measurements float32, counts and
+    scores nullable Int32, dates datetime64 and UPRNs utils.KEY_DTYPE.
+    Values that can't be converted are set to missing.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        EPC data with snake case column names (as returned by epc).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        df with typed columns.
+
+    """
+    df = df.copy()
+    for col, dtype in _EPC_SCHEMA.items():
+        if col not in df.columns:
+            continue
+        if dtype == "datetime64[ns]":
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif dtype == "category":
+            df[col] = df[col].astype("category")
+        elif dtype == utils.KEY_DTYPE:
+            df[col] = utils.to_key(df[col])
+        else:
+            values = pd.to_numeric(df[col], errors="coerce")
+            if dtype == "Int32":
+                values = values.round()
+            df[col] = values.astype(dtype)
+
+    return df
+
 
 def epc(api_key: str, borough: str = None) -> pd.DataFrame:
     """
@@ -353,6 +1166,9 @@ def epc(api_key: str, borough: str = None) -> pd.DataFrame:
     (here)[https://epc.opendatacommunities.org/].
     An API key is needed.
 
+    Each page of results is typed with type_epc as it arrives, so the full
+    register is never held as strings.
+
     Parameters
     ----------
     api_key : str
@@ -367,6 +1183,8 @@ def epc(api_key: str, borough: str = None) -> pd.DataFrame:
 
     """
 
+    import dateutil.relativedelta
+
     url = "https://epc.opendatacommunities.org/api/v1/domestic/search"
 
     codes = reference.london_boroughs(borough).ladcd.tolist()
@@ -384,31 +1202,35 @@ def epc(api_key: str, borough: str = None) -> pd.DataFrame:
         }
 
         while num_rows == 5000:
-            r = requests.get(
-                url=url,
-                params=query,
-                headers={"Authorization": "Basic " + api_key, "Accept": "text/csv"},
-            )
-            r.raise_for_status()
-
-            if len(r.content.decode("utf-8")) > 0:
-                df = pd.read_csv(io.StringIO(r.content.decode("utf-8")), dtype=str)
+            try:
+                df = transport.read_csv(
+                    url,
+                    params=query,
+                    headers={"Authorization": "Basic " + api_key, "Accept": "text/csv"},
+                    dtype=str,
+                    encoding="utf-8",
+                )
+            except pd.errors.EmptyDataError:
+                # No certificates left
+                df = None
+            if df is not None:
+                df.columns = (
+                    df.columns.str.lower()
+                    .str.replace("-", "_")
+                    .str.replace("building_reference_number", "brn")
+                )
+                df = type_epc(df)
                 dfs.append(df)
                 num_rows = df.shape[0]
-                min_date = datetime.datetime.strptime(
-                    df.loc[num_rows - 1, "lodgement-date"], "%Y-%m-%d"
-                ).date()
+                min_date = df.lodgement_date.iloc[-1].date()
                 next_date = min_date + dateutil.relativedelta.relativedelta(months=1)
                 query["to-month"] = next_date.month
                 query["to-year"] = next_date.year
             else:
                 num_rows = 0
     if len(dfs) > 0:
-        all_df = pd.concat(dfs).drop_duplicates().reset_index(drop=True)
-        all_df.columns = (
-            all_df.columns.str.lower()
-            .str.replace("-", "_")
-            .str.replace("building_reference_number", "brn")
+        all_df = (
+            utils.concat_categorical(dfs).drop_duplicates().reset_index(drop=True)
         )
     else:
         all_df = pd.DataFrame()
@@ -460,14 +1282,24 @@ def land_registry(borough: str = None) -> pd.DataFrame:
 
     for year in years:
         url = f"{data_url}{year}.csv"
-        r = requests.get(url)
-        if r.status_code == 200:
-            df = pd.read_csv(url, header=None, names=cols)
-        else:
+        r = transport.get(url, stream=True)
+        if r.status_code != 200:
+            # This year's file may not be published yet
+            r.close()
             continue
-        df = df.loc[df.county == "GREATER LONDON", :]
+        # Each year covers England and Wales, so only London is kept from
+        # each chunk as it downloads
+        with r:
+            chunks = pd.read_csv(
+                transport.stream(r), header=None, names=cols, chunksize=200000
+            )
+            df = pd.concat(
+                [chunk.loc[chunk.county == "GREATER LONDON", :] for chunk in chunks]
+            )
         df = df.assign(
-            district=df.district.str.replace("CITY OF W", "W"),
+            district=utils.map_unique(
+                df.district, lambda x: x.str.replace("CITY OF W", "W")
+            ),
             trans_id=df.trans_id.str.replace("{|}", ""),
         )
         df = df.loc[df.district.isin(boroughs.ladnm.str.upper()), :]
@@ -477,50 +1309,3 @@ def land_registry(borough: str = None) -> pd.DataFrame:
     df = pd.concat(dfs)
 
     return df
-
-
-# %% Main
-if __name__ == "__main__":
-
-    if (len(sys.argv) == 1) | (sys.argv[1] == None):
-        borough = None
-    else:
-        borough = sys.argv[1]
-
-    # %% Airbnb data
-    abnb = airbnb(borough)
-    file = "data/raw/open/airbnb.csv"
-    print("Saving file", file)
-    abnb.to_csv(file, index=False)
-
-    # %% Census data:
-    census = merge_census(borough)
-    file = "data/raw/open/census.csv"
-    print("Saving file", file)
-    census.to_csv(file, index=False)
-
-    # %% Crime data
-    crime = crime_year(borough)
-    file = "data/raw/open/crime.csv"
-    print("Saving file", file)
-    (crime.drop(columns=["geometry"]).to_csv(file, index=False))
-
-    # %% IMD data
-    imd_data = imd(borough)
-    file = "data/raw/open/imd.csv"
-    print("Saving file", file)
-    imd_data.to_csv(file, index=False)
-
-    # %% EPC data
-    load_dotenv()
-    api_key = os.getenv("epc_api_key")
-    epc_data = epc(api_key=api_key, borough=borough)
-    file = "data/raw/open/epc.csv"
-    print("Saving file", file)
-    epc_data.to_csv(file, index=False)
-
-    # %% Land registry data
-    lr_data = land_registry(borough)
-    file = "data/raw/open/land_registry.csv"
-    print("Saving file", file)
-    lr_data.to_csv(file, index=False)
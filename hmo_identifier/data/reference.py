@@ -6,13 +6,23 @@ Import reference geographical data sets
 """
 
 
+from __future__ import annotations
+
+import os
+import numpy as np
 import pandas as pd
-import requests
-import geopandas as gpd
-import shapely
-from shapely import wkt
-from typing import Union
-import sys
+from hmo_identifier.data import transport
+from typing import TYPE_CHECKING, Union
+
+# geopandas and shapely are imported when geometries are needed, so
+# non-spatial lookups don't load the geo stack
+if TYPE_CHECKING:
+    import geopandas as gpd
+    import shapely.geometry.base
+
+
+# Borough areas already built this session, by borough, CRS and tolerance
+_AREAS = {}
 
 
 # %% Main ONS Geography Linked Data Query Function
@@ -83,7 +93,7 @@ def query_ons(
     }}
     """
     # Request and reformat data
-    r = requests.get(url, params={"query": query})
+    r = transport.get(url, params={"query": query})
     r.raise_for_status()
     data = r.json()["results"]["bindings"]
     data = {i: data[i] for i in range(0, len(data))}
@@ -113,6 +123,9 @@ def query_ons(
         df = df.drop(columns=["parent"])
 
     if inc_geom:
+        import geopandas as gpd
+        from shapely import wkt
+
         df.geometry = df.geometry.apply(wkt.loads)
         df = gpd.GeoDataFrame(df, geometry="geometry", crs="EPSG:4326")
         df = df.drop(columns=["geouri"])
@@ -248,23 +261,178 @@ def london_output_areas(
     return output_areas
 
 
-# %% Main
-if __name__ == "__main__":
+# %% Borough areas
+def prepare_area(polygon: shapely.geometry.base.BaseGeometry,
+                 tolerance: float = None) -> dict:
+    """
+    Prepare a (multi)polygon for fast repeated point and geometry tests.
+
+    As well as the exact polygon, simplified inner and outer hulls are made.
+    Anything within the inner hull is within the polygon and anything outside
+    the outer hull is outside it, so the exact polygon only needs testing
+    near its boundary.
 
-    if (len(sys.argv) == 1) | (sys.argv[1] is None):
-        borough = None
-    else:
-        borough = sys.argv[1]
-
-    boroughs = london_boroughs(borough=borough, inc_geom=True)
-    file = "data/raw/reference/boroughs.shp"
-    print("Saving file", file)
-    boroughs.to_file(file)
-    wards = london_wards(borough=borough, inc_geom=True)
-    file = "data/raw/reference/wards.shp"
-    print("Saving file", file)
-    wards.to_file(file)
-    oas = london_output_areas(borough=borough, inc_geom=True)
-    file = "data/raw/reference/output_areas.shp"
-    print("Saving file", file)
-    oas.to_file(file)
+    Parameters
+    ----------
+    polygon : shapely.geometry.base.BaseGeometry
+        Area, e.g. the union of borough boundaries.
+    tolerance : float, optional
+        Simplification tolerance in the units of the polygon's CRS.
+        The default is None (1/1000 of the larger side of its bounding box).
+
+    Returns
+    -------
+    area : dict
+        'exact' (the polygon), 'prepared' (prepared exact polygon),
+        'inner' and 'outer' (simplified hulls) and 'bounds'.
+
+    """
+    from shapely.prepared import prep
+
+    minx, miny, maxx, maxy = polygon.bounds
+    if tolerance is None:
+        tolerance = max(maxx - minx, maxy - miny) / 1000
+    # Buffering by twice the tolerance keeps the hulls on the right side of
+    # the boundary after simplifying
+    area = {
+        "exact": polygon,
+        "prepared": prep(polygon),
+        "inner": prep(polygon.buffer(-2 * tolerance).simplify(tolerance)),
+        "outer": prep(polygon.buffer(2 * tolerance).simplify(tolerance)),
+        "bounds": polygon.bounds,
+    }
+
+    return area
+
+
+def borough_area(borough: str = None, crs=4326, tolerance: float = None,
+                 cache_dir: str = None) -> dict:
+    """
+    The union of London borough boundaries, prepared for point and geometry
+    tests with prepare_area.
+
+    The union is only built once per borough and CRS in a session, and
+    can also be saved to cache_dir to reuse between sessions.
+
+    Parameters
+    ----------
+    borough : str, optional
+        London borough name. The default is None (all boroughs).
+    crs : optional
+        CRS of the area. The default is 4326.
+    tolerance : float, optional
+        Simplification tolerance of the inner and outer hulls, in the units of
+        the CRS. The default is None (see prepare_area).
+    cache_dir : str, optional
+        Directory to save the union in (as WKB). The default is None.
+
+    Returns
+    -------
+    area : dict
+        Output of prepare_area for the borough union.
+
+    """
+    key = (borough, str(crs), tolerance)
+    if key in _AREAS:
+        return _AREAS[key]
+    polygon = None
+    if cache_dir is not None:
+        name = "london" if borough is None else borough.lower().replace(" ", "_")
+        file = os.path.join(cache_dir, f"borough_area_{name}_{crs}.wkb")
+        if os.path.exists(file):
+            from shapely import wkb
+
+            with open(file, "rb") as f:
+                polygon = wkb.loads(f.read())
+    if polygon is None:
+        boroughs = london_boroughs(borough=borough, inc_geom=True)
+        polygon = boroughs.to_crs(crs).unary_union
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(file + ".tmp", "wb") as f:
+                f.write(polygon.wkb)
+            os.replace(file + ".tmp", file)
+    _AREAS[key] = prepare_area(polygon, tolerance=tolerance)
+
+    return _AREAS[key]
+
+
+def points_within(x: np.ndarray, y: np.ndarray,
+                  area: Union[dict, shapely.geometry.base.BaseGeometry]) -> np.ndarray:
+    """
+    Test which points are within an area.
+
+    Points outside the bounding box or outer hull are rejected, and points
+    within the inner hull accepted, without testing against the exact area.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        x coordinates (longitude in EPSG:4326).
+    y : np.ndarray
+        y coordinates (latitude in EPSG:4326).
+    area : Union[dict, shapely.geometry.base.BaseGeometry]
+        Output of borough_area or prepare_area, or a polygon.
+
+    Returns
+    -------
+    within : np.ndarray
+        True for points within the area.
+
+    """
+    from shapely import vectorized
+
+    if not isinstance(area, dict):
+        area = prepare_area(area)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    minx, miny, maxx, maxy = area["bounds"]
+    within = np.zeros(len(x), dtype=bool)
+    candidates = np.flatnonzero((x >= minx) & (x <= maxx) & (y >= miny) & (y <= maxy))
+    candidates = candidates[
+        vectorized.contains(area["outer"], x[candidates], y[candidates])
+    ]
+    inner = vectorized.contains(area["inner"], x[candidates], y[candidates])
+    within[candidates[inner]] = True
+    edge = candidates[~inner]
+    within[edge] = vectorized.contains(area["prepared"], x[edge], y[edge])
+
+    return within
+
+
+def geometries_intersect(geometry: gpd.GeoSeries,
+                         area: Union[dict, shapely.geometry.base.BaseGeometry]) -> np.ndarray:
+    """
+    Test which geometries (e.g. building footprints) intersect an area.
+
+    Parameters
+    ----------
+    geometry : gpd.GeoSeries
+        Geometries to test, in the same CRS as the area.
+    area : Union[dict, shapely.geometry.base.BaseGeometry]
+        Output of borough_area or prepare_area, or a polygon.
+
+    Returns
+    -------
+    intersects : np.ndarray
+        True for geometries intersecting the area.
+
+    """
+    if not isinstance(area, dict):
+        area = prepare_area(area)
+    minx, miny, maxx, maxy = area["bounds"]
+    bounds = np.asarray(geometry.bounds.values, dtype="float64")
+    intersects = np.zeros(len(bounds), dtype=bool)
+    candidates = np.flatnonzero(
+        (bounds[:, 0] <= maxx) & (bounds[:, 2] >= minx)
+        & (bounds[:, 1] <= maxy) & (bounds[:, 3] >= miny)
+    )
+    geoms = geometry.values
+    for i in candidates:
+        geom = geoms[i]
+        if area["inner"].intersects(geom):
+            intersects[i] = True
+        elif area["outer"].intersects(geom):
+            intersects[i] = area["prepared"].intersects(geom)
+
+    return intersects
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 18:41:17 2026
+Shared HTTP sessions with rate limiting and retries for the data fetchers.
+@author: LiRogers
+"""
+from __future__ import annotations
+
+import os
+import random
+import shutil
+import threading
+import time
+import urllib.parse
+import pandas as pd
+from typing import TYPE_CHECKING
+
+# requests takes longer to import than the rest of the data modules, so it's
+# only imported when the first request is made
+if TYPE_CHECKING:
+    import requests
+
+
+# Statuses worth retrying, as the server may succeed next time
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Longest wait between retries in seconds, including waits asked for with
+# Retry-After
+MAX_BACKOFF = 60
+# Connect and read timeouts in seconds
+TIMEOUT = (10, 300)
+# Connections kept open to each host, enough for parallel fetches
+POOL_SIZE = 10
+
+# Requests per second and burst allowed by each host, from their published
+# limits. Hosts not listed aren't limited.
+RATE_LIMITS = {
+    "data.police.uk": (15, 30),
+    "epc.opendatacommunities.org": (5, 10),
+    "statistics.data.gov.uk": (5, 10),
+    "opendata.camden.gov.uk": (5, 10),
+}
+
+# Sessions and token buckets by host, made on first use
+_SESSIONS = {}
+_BUCKETS = {}
+_LOCK = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter. Tokens are added at rate per second up to
+    burst, and each request waits for a token.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """
+        Take a token, waiting until one is available.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def session(url: str) -> requests.Session:
+    """
+
+    Keep-alive session for the host of url, shared by every fetcher.
+
+    requests asks for gzip and deflate compressed responses and decompresses
+    them, including when streaming with stream.
+
+    Parameters
+    ----------
+    url : str
+        Any URL on the host.
+
+    Returns
+    -------
+    requests.Session
+        Session with a connection pool for the host.
+
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    host = urllib.parse.urlsplit(url).netloc
+    with _LOCK:
+        if host not in _SESSIONS:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            s.headers["Accept-Encoding"] = "gzip, deflate"
+            _SESSIONS[host] = s
+            if host in RATE_LIMITS:
+                _BUCKETS[host] = TokenBucket(*RATE_LIMITS[host])
+
+    return _SESSIONS[host]
+
+
+def close() -> None:
+    """
+    Close all sessions and their connections.
+    """
+    with _LOCK:
+        for s in _SESSIONS.values():
+            s.close()
+        _SESSIONS.clear()
+        _BUCKETS.clear()
+
+
+def _backoff(attempt: int, backoff: float, response=None) -> float:
+    """
+    Seconds to wait before retrying: Retry-After if the server sent it,
+    otherwise exponential backoff with full jitter, at most MAX_BACKOFF.
+    """
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(MAX_BACKOFF, float(retry_after))
+
+    return random.uniform(0, min(MAX_BACKOFF, backoff * 2 ** attempt))
+
+
+def get(
+    url: str,
+    params: dict = None,
+    headers: dict = None,
+    stream: bool = False,
+    retries: int = 5,
+    backoff: float = 1.0,
+    retry_statuses: tuple = RETRY_STATUSES,
+    timeout: tuple = TIMEOUT,
+) -> requests.Response:
+    """
+
+    GET a URL through the shared session for its host, waiting for the
+    host's rate limit and retrying connection errors and retry_statuses.
+
+    Parameters
+    ----------
+    url : str
+        URL to get.
+    params : dict, optional
+        Query parameters. The default is None.
+    headers : dict, optional
+        Extra headers. The default is None.
+    stream : bool, optional
+        Don't download the body until it's read, see stream.
+        The default is False.
+    retries : int, optional
+        Number of retries. The default is 5.
+    backoff : float, optional
+        Base of the exponential backoff in seconds. The default is 1.0.
+    retry_statuses : tuple, optional
+        Statuses to retry. The default is RETRY_STATUSES.
+    timeout : tuple, optional
+        Connect and read timeouts in seconds. The default is TIMEOUT.
+
+    Returns
+    -------
+    r : requests.Response
+        The response. Statuses are not checked, so callers can handle
+        them, e.g. with r.raise_for_status().
+
+    """
+    import requests
+
+    s = session(url)
+    bucket = _BUCKETS.get(urllib.parse.urlsplit(url).netloc)
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            r = s.get(
+                url, params=params, headers=headers, stream=stream, timeout=timeout
+            )
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            time.sleep(_backoff(attempt, backoff))
+            continue
+        if r.status_code not in retry_statuses or attempt == retries:
+            return r
+        wait = _backoff(attempt, backoff, r)
+        r.close()
+        time.sleep(wait)
+
+
+def stream(r: requests.Response):
+    """
+
+    File-like object of a streamed response's body, decompressed if the
+    server compressed it, to pass straight to a parser.
+
+    Parameters
+    ----------
+    r : requests.Response
+        Response from get with stream=True.
+
+    Returns
+    -------
+    file-like
+        The body.
+
+    """
+    r.raw.decode_content = True
+
+    return r.raw
+
+
+def read_csv(
+    url: str, params: dict = None, headers: dict = None, **kwargs
+) -> pd.DataFrame:
+    """
+
+    Read a CSV as it downloads, without holding the whole response in
+    memory. The connection is closed once the CSV has been read.
+
+    Parameters
+    ----------
+    url : str
+        URL of the CSV.
+    params : dict, optional
+        Query parameters. The default is None.
+    headers : dict, optional
+        Extra headers. The default is None.
+    **kwargs
+        Passed to pd.read_csv, e.g. compression="gzip" for .csv.gz files.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The CSV (or an iterator of chunks if chunksize is given).
+
+    """
+    r = get(url, params=params, headers=headers, stream=True)
+    try:
+        r.raise_for_status()
+        df = pd.read_csv(stream(r), **kwargs)
+    except BaseException:
+        r.close()
+        raise
+    if kwargs.get("chunksize") or kwargs.get("iterator"):
+        # The connection is needed until the last chunk is read
+        return _close_after(df, r)
+    r.close()
+
+    return df
+
+
+def _close_after(chunks, r: requests.Response):
+    """
+    Yield chunks, closing r once they've been read (or the generator is
+    closed).
+    """
+    try:
+        yield from chunks
+    finally:
+        r.close()
+
+
+def download(url: str, file: str, **kwargs) -> str:
+    """
+
+    Download a URL to a file as it streams, without holding it in memory.
+    The file only appears once the download is complete.
+
+    Parameters
+    ----------
+    url : str
+        URL to download.
+    file : str
+        File to write.
+    **kwargs
+        Passed to get, e.g. params.
+
+    Returns
+    -------
+    file : str
+        The file written.
+
+    """
+    with get(url, stream=True, **kwargs) as r:
+        r.raise_for_status()
+        try:
+            with open(file + ".tmp", "wb") as f:
+                shutil.copyfileobj(stream(r), f, length=1024 * 1024)
+        except BaseException:
+            if os.path.exists(file + ".tmp"):
+                os.remove(file + ".tmp")
+            raise
+    os.replace(file + ".tmp", file)
+
+    return file
@@ -4,10 +4,16 @@ Created on Wed Mar 18 11:44:22 2020
 
 @author: lirogers
 """
-from hmo_identifier.data import reference
+import pandas as pd
 import re
 
 
+# Address identifiers (UPRNs and UDPRNs) are nullable 64 bit integers
+# everywhere, so joins between sources never miss on "123" != 123.0
+KEY_DTYPE = "Int64"
+KEY_COLUMNS = ("uprn", "udprn", "parent_uprn")
+
+
 def clean_borough_names(borough: str) -> str:
     """
     
@@ -59,6 +65,9 @@ def match_borough_name(borough: str) -> str:
         A matched borough name.
 
     """
+    # reference needs the geo stack, so is only imported when used
+    from hmo_identifier.data import reference
+
     boroughs = reference.london_boroughs()
     boroughs["ladnm_clean"] = boroughs.ladnm.apply(clean_borough_names)
     borough_clean = clean_borough_names(borough)
@@ -70,3 +79,133 @@ def match_borough_name(borough: str) -> str:
         raise ValueError("Invalid borough name")
 
     return borough_match_name
+
+
+def concat_categorical(dfs: list) -> pd.DataFrame:
+    """
+    
+    Concatenate dataframes while keeping categorical columns categorical.
+
+    pd.concat falls back to object columns when the categories of a column
+    differ between dataframes, so the categories are unioned first.
+
+    Parameters
+    ----------
+    dfs : list
+        A list of pandas dataframes to concatenate.
+
+    Returns
+    -------
+    pd.DataFrame
+        The concatenated dataframe.
+
+    """
+    cat_cols = {
+        col
+        for df in dfs
+        for col in df.columns
+        if pd.api.types.is_categorical_dtype(df[col])
+    }
+    for col in cat_cols:
+        categories = set()
+        for df in dfs:
+            if col in df.columns:
+                categories.update(df[col].astype("category").cat.categories)
+        categories = sorted(categories)
+        dfs = [
+            df.assign(**{col: df[col].astype("category").cat.set_categories(categories)})
+            if col in df.columns
+            else df
+            for df in dfs
+        ]
+
+    return pd.concat(dfs, sort=False)
+
+
+def map_unique(x: pd.Series, func) -> pd.Series:
+    """
+    
+    Apply a transformation to each unique value of a series only, and map
+    the results back.
+    
+    Much faster than transforming the whole series for text columns with
+    many rows but few distinct values, e.g. EPC construction age bands or
+    Land Registry districts.
+
+    Parameters
+    ----------
+    x : pd.Series
+        Series to transform.
+    func : function
+        Takes a series (of the unique values of x) and returns a series or
+        dataframe of the same length, e.g. lambda s: s.str.lower().
+
+    Returns
+    -------
+    result : pd.Series or pd.DataFrame
+        func applied to x, with the same index as x.
+        Missing values in x are missing in result.
+
+    """
+    codes, uniques = pd.factorize(x)
+    result = func(pd.Series(uniques, dtype=object, name=x.name))
+    result = result.reindex(codes)
+    result.index = x.index
+
+    return result
+
+
+def to_key(x: pd.Series) -> pd.Series:
+    """
+
+    Convert address identifiers to KEY_DTYPE (nullable int64).
+
+    Identifiers arrive as strings (CSVs and APIs), floats (integer columns
+    with missing values) or integers. Values that aren't whole numbers,
+    e.g. "" or "N/A", are set to missing.
+
+    Parameters
+    ----------
+    x : pd.Series
+        UPRNs or UDPRNs of any type.
+
+    Returns
+    -------
+    pd.Series
+        x as KEY_DTYPE.
+
+    """
+    if str(x.dtype) == KEY_DTYPE:
+        return x
+    values = pd.to_numeric(x, errors="coerce")
+    if values.dtype.kind == "f":
+        values = values.where(values % 1 == 0)
+
+    return values.astype(KEY_DTYPE)
+
+
+def type_keys(df: pd.DataFrame, cols: tuple = KEY_COLUMNS) -> pd.DataFrame:
+    """
+
+    Convert the address identifier columns of df with to_key.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Any dataframe. Columns in cols that it doesn't have are skipped.
+    cols : tuple, optional
+        Identifier columns. The default is KEY_COLUMNS.
+
+    Returns
+    -------
+    pd.DataFrame
+        df with its identifier columns as KEY_DTYPE.
+
+    """
+    keys = {
+        col: to_key(df[col])
+        for col in cols
+        if col in df.columns and str(df[col].dtype) != KEY_DTYPE
+    }
+
+    return df.assign(**keys) if keys else df
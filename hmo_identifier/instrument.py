@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 17:52:40 2026
+Opt-in timing and memory instrumentation of the data and process functions.
+@author: LiRogers
+"""
+
+import contextlib
+import functools
+import importlib
+import inspect
+import json
+import pkgutil
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+import pandas as pd
+import requests
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+_PACKAGES = ["hmo_identifier.data", "hmo_identifier.process"]
+
+# Original functions replaced by enable, by (module, name)
+_ORIGINALS = {}
+_ORIGINAL_SEND = None
+_RECORDS = []
+_RECORDS_LOCK = threading.Lock()
+# Each thread has its own stack of the stages it's in
+_LOCAL = threading.local()
+_STATE = {"run_id": None, "trace_memory": False}
+
+
+def _stack() -> list:
+    """
+    The current thread's stack of stages.
+    """
+    if not hasattr(_LOCAL, "stack"):
+        _LOCAL.stack = []
+
+    return _LOCAL.stack
+
+
+def _rss() -> int:
+    """
+    Peak resident memory of the process so far, in bytes, if available.
+    """
+    if resource is not None:
+        # macOS reports bytes, Linux and the BSDs kilobytes
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    if psutil is not None:
+        # Windows has no resource module, but psutil gives the peak working set
+        return getattr(psutil.Process().memory_info(), "peak_wset", None)
+
+    return None
+
+
+def _rows(obj) -> int:
+    """
+    Number of rows in DataFrames and Series, including those in dicts,
+    lists and tuples. None if there are none.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        rows = [_rows(o) for o in obj]
+        rows = [r for r in rows if r is not None]
+        return sum(rows) if rows else None
+
+    return None
+
+
+def _count_send(send):
+    """
+    Wrap requests.Session.send to count the bytes downloaded by each stage.
+    """
+
+    @functools.wraps(send)
+    def wrapper(self, request, **kwargs):
+        response = send(self, request, **kwargs)
+        stack = _stack()
+        if not stack:
+            return response
+        if kwargs.get("stream"):
+            raw_read = response.raw.read
+
+            def read(*args, **read_kwargs):
+                data = raw_read(*args, **read_kwargs)
+                # Streamed bodies are read after the request returns, so
+                # count towards the stage reading them
+                stack = _stack()
+                if stack:
+                    stack[-1]["bytes_downloaded"] += len(data or b"")
+                return data
+
+            response.raw.read = read
+        else:
+            stack[-1]["bytes_downloaded"] += len(response.content)
+
+        return response
+
+    return wrapper
+
+
+def _stage(func, stage: str):
+    """
+    Wrap a function to record a stage each time it's called.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        trace = _STATE["trace_memory"] and tracemalloc.is_tracing()
+        if trace and stack:
+            # Resetting the peak below would lose the parent's peak so far
+            stack[-1]["peak_traced"] = max(
+                stack[-1]["peak_traced"], tracemalloc.get_traced_memory()[1]
+            )
+        if trace and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        frame = {
+            "stage": stage,
+            "parent": stack[-1]["stage"] if stack else None,
+            "depth": len(stack),
+            "bytes_downloaded": 0,
+            "peak_traced": 0,
+            "start_traced": tracemalloc.get_traced_memory()[0] if trace else 0,
+        }
+        stack.append(frame)
+        start = time.time()
+        wall = time.perf_counter()
+        error = None
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            wall = time.perf_counter() - wall
+            stack.pop()
+            if trace:
+                frame["peak_traced"] = max(
+                    frame["peak_traced"], tracemalloc.get_traced_memory()[1]
+                )
+                if stack:
+                    stack[-1]["peak_traced"] = max(
+                        stack[-1]["peak_traced"], frame["peak_traced"]
+                    )
+            if stack:
+                # Downloads count towards every stage they happen within
+                stack[-1]["bytes_downloaded"] += frame["bytes_downloaded"]
+            record = {
+                "run_id": _STATE["run_id"],
+                "stage": stage,
+                "parent": frame["parent"],
+                "depth": frame["depth"],
+                "start": start,
+                "wall_seconds": wall,
+                "rows_in": _rows(list(args) + list(kwargs.values())),
+                "rows_out": None if error else _rows(result),
+                "bytes_downloaded": frame["bytes_downloaded"],
+                "peak_traced_bytes": (
+                    frame["peak_traced"] - frame["start_traced"] if trace else None
+                ),
+                "process_peak_rss_bytes": _rss(),
+                "error": error,
+            }
+            with _RECORDS_LOCK:
+                _RECORDS.append(record)
+
+        return result
+
+    wrapper.__instrumented__ = func
+
+    return wrapper
+
+
+def _modules(packages: list) -> list:
+    """
+    Import all modules of packages, skipping those with missing optional
+    dependencies.
+    """
+    modules = []
+    for name in packages:
+        package = importlib.import_module(name)
+        for info in pkgutil.iter_modules(package.__path__, prefix=f"{name}."):
+            try:
+                modules.append(importlib.import_module(info.name))
+            except ImportError:
+                continue
+
+    return modules
+
+
+def enable(packages: list = None, trace_memory: bool = True) -> str:
+    """
+
+    Start recording every call of the public functions in
+    hmo_identifier.data and hmo_identifier.process.
+
+    Each call records wall time, rows in and out (of DataFrame or Series
+    arguments and results), bytes downloaded with requests, peak memory
+    allocated by python during the call (tracemalloc, above what was
+    allocated at the start) and the peak resident memory of the process.
+    The process peak is over its whole life so far, not the call, so
+    every call after the largest reports the same value; use
+    peak_traced_bytes to compare stages.
+    Functions are replaced in their modules, so calls between functions are
+    recorded as nested stages. Use functions through their module
+    (e.g. merge.by_buffer) rather than importing them directly, as
+    names imported before enable aren't instrumented.
+
+    Each thread has its own stack of stages, so stages run in threads
+    (e.g. fetch jobs with --workers) don't nest under each other, and
+    downloads count towards the stage of the thread making them. Peak
+    memory is process wide though, so it includes stages running at the
+    same time in other threads.
+
+    Nothing is wrapped until enable is called, and disable restores the
+    original functions, so there is no overhead when disabled.
+
+    Parameters
+    ----------
+    packages : list, optional
+        Packages to instrument. The default is None
+        (hmo_identifier.data and hmo_identifier.process).
+    trace_memory : bool, optional
+        Record peak memory with tracemalloc. This slows down code that
+        allocates a lot of python objects. The default is True.
+
+    Returns
+    -------
+    run_id : str
+        ID added to the records of this run.
+
+    """
+    global _ORIGINAL_SEND
+    disable()
+    _STATE["run_id"] = uuid.uuid4().hex
+    _STATE["trace_memory"] = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _STATE["started_tracing"] = True
+    for module in _modules(packages or _PACKAGES):
+        for name, func in inspect.getmembers(module, inspect.isfunction):
+            if name.startswith("_") or func.__module__ != module.__name__:
+                continue
+            _ORIGINALS[(module, name)] = func
+            setattr(module, name, _stage(func, f"{module.__name__}.{name}"))
+    _ORIGINAL_SEND = requests.Session.send
+    requests.Session.send = _count_send(_ORIGINAL_SEND)
+
+    return _STATE["run_id"]
+
+
+def disable() -> None:
+    """
+
+    Stop recording and restore the original functions. Records are kept
+    until reset.
+
+    Returns
+    -------
+    None
+
+    """
+    global _ORIGINAL_SEND
+    for (module, name), func in _ORIGINALS.items():
+        setattr(module, name, func)
+    _ORIGINALS.clear()
+    if _ORIGINAL_SEND is not None:
+        requests.Session.send = _ORIGINAL_SEND
+        _ORIGINAL_SEND = None
+    if _STATE.pop("started_tracing", False):
+        tracemalloc.stop()
+
+
+def reset() -> None:
+    """
+    Clear all records.
+    """
+    with _RECORDS_LOCK:
+        _RECORDS.clear()
+
+
+@contextlib.contextmanager
+def instrumented(packages: list = None, trace_memory: bool = True):
+    """
+
+    Record stages within a with block, e.g.
+        with instrument.instrumented():
+            gaz = merge.by_buffer(gaz, crime, "crime", 200)
+        instrument.summary()
+
+    Parameters
+    ----------
+    packages : list, optional
+        Packages to instrument. The default is None (see enable).
+    trace_memory : bool, optional
+        Record peak memory with tracemalloc. The default is True.
+
+    Yields
+    ------
+    run_id : str
+        ID added to the records of this run.
+
+    """
+    run_id = enable(packages=packages, trace_memory=trace_memory)
+    try:
+        yield run_id
+    finally:
+        disable()
+
+
+def records(run_id: str = None) -> pd.DataFrame:
+    """
+
+    All recorded stages, one row per call.
+
+    Parameters
+    ----------
+    run_id : str, optional
+        Only return records of this run. The default is None (all runs).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        One row per call, in the order calls finished.
+
+    """
+    with _RECORDS_LOCK:
+        rows = list(_RECORDS)
+    df = pd.DataFrame(
+        rows,
+        columns=[
+            "run_id", "stage", "parent", "depth", "start", "wall_seconds",
+            "rows_in", "rows_out", "bytes_downloaded", "peak_traced_bytes",
+            "process_peak_rss_bytes", "error",
+        ],
+    )
+    numeric = ["rows_in", "rows_out", "peak_traced_bytes", "process_peak_rss_bytes"]
+    df[numeric] = df[numeric].apply(pd.to_numeric)
+    if run_id is not None:
+        df = df.loc[df.run_id == run_id, :].reset_index(drop=True)
+
+    return df
+
+
+def summary(run_id: str = None) -> pd.DataFrame:
+    """
+
+    Summary of recorded stages, slowest first.
+
+    Parameters
+    ----------
+    run_id : str, optional
+        Only summarise this run. The default is None (all runs).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Number of calls, total and mean wall time, total rows in and out,
+        total bytes downloaded, the largest peak memory of each stage and
+        the process's peak resident memory by the end of its last call.
+
+    """
+    df = (
+        records(run_id)
+        .groupby("stage")
+        .agg(
+            calls=("wall_seconds", "size"),
+            wall_seconds=("wall_seconds", "sum"),
+            mean_wall_seconds=("wall_seconds", "mean"),
+            rows_in=("rows_in", "sum"),
+            rows_out=("rows_out", "sum"),
+            bytes_downloaded=("bytes_downloaded", "sum"),
+            peak_traced_bytes=("peak_traced_bytes", "max"),
+            process_peak_rss_bytes=("process_peak_rss_bytes", "max"),
+            errors=("error", "count"),
+        )
+        .sort_values("wall_seconds", ascending=False)
+    )
+
+    return df
+
+
+def to_json(file: str, run_id: str = None) -> None:
+    """
+
+    Write records as JSON lines, one object per call.
+
+    Parameters
+    ----------
+    file : str
+        File to write, e.g. "data/interim/instrument.jsonl".
+    run_id : str, optional
+        Only write this run. The default is None (all runs).
+
+    Returns
+    -------
+    None
+
+    """
+    df = records(run_id).astype(object)
+    df = df.where(df.notna(), None)
+    with open(file, "w") as f:
+        for record in df.to_dict(orient="records"):
+            f.write(json.dumps(record) + "\n")
+
+
+def to_openmetrics(run_id: str = None) -> str:
+    """
+
+    Summary of stages in the OpenMetrics text format, e.g. to push to a
+    Prometheus gateway.
+
+    Parameters
+    ----------
+    run_id : str, optional
+        Only include this run. The default is None (all runs).
+
+    Returns
+    -------
+    str
+        Metrics text.
+
+    """
+    df = summary(run_id)
+    metrics = [
+        ("calls", "counter", "Number of calls", "_total"),
+        ("wall_seconds", "counter", "Total wall time in seconds", "_total"),
+        ("rows_in", "counter", "Total rows passed in", "_total"),
+        ("rows_out", "counter", "Total rows returned", "_total"),
+        ("bytes_downloaded", "counter", "Total bytes downloaded", "_total"),
+        ("peak_traced_bytes", "gauge", "Peak memory allocated by python", ""),
+        ("process_peak_rss_bytes", "gauge", "Peak resident memory of the process so far", ""),
+    ]
+    lines = []
+    for col, kind, help_text, suffix in metrics:
+        name = f"hmo_identifier_stage_{col}"
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"# HELP {name} {help_text}.")
+        for stage, value in df[col].items():
+            if pd.notna(value):
+                lines.append(f'{name}{suffix}{{stage="{stage}"}} {value}')
+    lines.append("# EOF")
+
+    return "\n".join(lines) + "\n"
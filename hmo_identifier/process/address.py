@@ -6,62 +6,107 @@ Created on Mon Aug 10 13:30:06 2020
 """
 
 import pandas as pd
-from recordlinkage.preprocessing import clean
-import recordlinkage
+import numpy as np
+import multiprocessing
+import re
 from itertools import product
+from hmo_identifier.data import utils
+
+
+# Words that don't help identify an estate - removed by clean_estate_name
+_ESTATE_STOPWORDS = frozenset(
+    [
+        "estate",
+        "road",
+        "street",
+        "crescent",
+        "close",
+        "place",
+        "st",
+        "rd",
+        "unknown",
+        "lane",
+        "way",
+        "est",
+        "end",
+        "apartments",
+        "square",
+        "odd",
+        "flats",
+        "cons",
+    ]
+)
+_ESTATE_PUNCTUATION = re.compile("[.,()']")
+_ESTATE_HYPHEN = re.compile(" ?- ?")
+_ESTATE_AND = re.compile(" and |&")
+_ESTATE_SPLIT = re.compile("[ /]+")
+_ESTATE_RANGE = re.compile("[0-9]+-[0-9]+|[a-z]-[a-z]")
+_ESTATE_DIGITS = re.compile("[0-9]+")
 
 
-def clean_estate_name(x: pd.Series) -> pd.Series:
+def _clean_estate(name: str) -> str:
+    """
+    Clean a single estate name for clean_estate_name.
+    """
+    if not isinstance(name, str):
+        return ""
+    name = _ESTATE_PUNCTUATION.sub("", name.lower())
+    name = _ESTATE_HYPHEN.sub("-", name)
+    name = _ESTATE_AND.sub(" ", name)
+    words = []
+    for token in _ESTATE_SPLIT.split(name):
+        # number and letter ranges e.g. 1-20, a-f
+        if _ESTATE_RANGE.fullmatch(token):
+            continue
+        token = "".join(
+            part for part in token.split("-") if part not in _ESTATE_STOPWORDS
+        )
+        token = _ESTATE_DIGITS.sub("", token)
+        if len(token) > 1 and token not in _ESTATE_STOPWORDS:
+            words.append(token)
+
+    return " ".join(words)
+
+
+def clean_estate_name(x: pd.Series, processes: int = None) -> pd.Series:
     """
     
     Clean the names of estates to get into a clean format and remove common
     words in preparation for matching to gazatteer.
+    
+    Each unique name is cleaned once in a single pass over its words.
 
     Parameters
     ----------
     x : pd.Series
         A pandas series of estate names.
+    processes : int, optional
+        Number of processes to clean names with. Only worth using for very
+        long lists of estates. The default is None (single process).
 
     Returns
     -------
-    x : TYPE
-        A pandas series of clean estate names.
-
-    """
-
-    common_words = [
-        "ESTATE",
-        "ROAD",
-        "STREET",
-        "CRESCENT",
-        "CLOSE",
-        "PLACE",
-        "ST",
-        "RD",
-        "UNKNOWN",
-        "LANE",
-        "WAY",
-        "EST",
-        "END",
-        "APARTMENTS",
-        "SQUARE",
-    ]
-    x = (
-        x.str.lower()
-        .str.replace("\.|,|\(|\)|'", "")
-        .str.replace(" ?- ?", "-")
-        .replace(pd.np.nan, "")
-        .str.replace(r"\b" + "\\b|\\b".join(common_words) + "\\b", "")
-        .str.replace(" AND |&", " ")
-        .str.replace("[0-9]+-[0-9]+", "")
-        .str.replace("[A-Z]-[A-Z]", "")
-        .str.replace("\(|\)|\-", "")
-        .str.replace(" [A-Z] | [A-Z]$", " ")
-        .str.replace("ODD|FLATS|CONS", "")
-        .str.replace("[0-9]+", "")
-        .str.replace("[ /]+", " ")
-        .str.strip()
-    )
+    x : pd.Series
+        A pandas series of clean estate names (lower case).
+
+    Examples
+    --------
+    >>> clean_estate_name(pd.Series(["Abbey Road Estate", "St. John's Wood (1-20)",
+    ...                              "Rose & Crown Flats 2-4", None])).tolist()
+    ['abbey', 'johns wood', 'rose crown', '']
+
+    """
+    codes, uniques = pd.factorize(x)
+    if processes is not None:
+        with multiprocessing.Pool(processes) as pool:
+            clean_names = pool.map(
+                _clean_estate, uniques, chunksize=max(1, len(uniques) // processes)
+            )
+    else:
+        clean_names = [_clean_estate(name) for name in uniques]
+    # Missing names have code -1, which picks up the empty string at the end
+    clean_names = np.array(clean_names + [""], dtype=object)
+    x = pd.Series(clean_names[codes], index=x.index, name=x.name)
 
     return x
 
@@ -82,9 +127,12 @@ def match_prep(df: pd.DataFrame, add_var: str) -> pd.DataFrame:
     Returns
     -------
     df : pd.DataFrame
-        df with 'clean_address' and 'numbers' adding. Postcode column cleaned.
+        df with 'clean_address' and 'numbers' adding. Postcode column cleaned
+        (see parse_postcode), invalid postcodes are missing.
 
     """
+    from recordlinkage.preprocessing import clean
+
     df = df.copy()
     df["clean_address"] = (
         clean(df[add_var], replace_by_whitespace="[\\_]")
@@ -102,24 +150,60 @@ def match_prep(df: pd.DataFrame, add_var: str) -> pd.DataFrame:
         .apply(sorted)
         .apply(lambda x: " ".join(x))
     )
-    df.postcode = clean(df.postcode, replace_by_whitespace="[\\_]")
+    df.postcode = parse_postcode(df.postcode).postcode.str.lower()
 
     return df
 
 
-def candidate_matches(
+def _shared_codes(left: pd.Series, right: pd.Series) -> tuple:
+    """
+    Integer encode two series with the same codes for the same values.
+    Missing values are -1.
+    """
+    codes, _ = pd.factorize(pd.concat([left, right], ignore_index=True))
+    codes = codes.astype("int32")
+
+    return codes[: len(left)], codes[len(left):]
+
+
+def _block_pairs(ref_block: np.ndarray, add_block: np.ndarray) -> tuple:
+    """
+    All pairs of rows with the same block code (missing blocks excluded),
+    as two arrays of row positions.
+    """
+    ref_rows = np.flatnonzero(ref_block >= 0)
+    add_rows = np.flatnonzero(add_block >= 0)
+    n_blocks = max(ref_block.max(initial=-1), add_block.max(initial=-1)) + 1
+    order = ref_rows[np.argsort(ref_block[ref_rows], kind="stable")]
+    counts = np.bincount(ref_block[ref_rows], minlength=n_blocks)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    per_add = counts[add_block[add_rows]]
+    pair_add = np.repeat(add_rows, per_add)
+    offsets = np.arange(per_add.sum()) - np.repeat(np.cumsum(per_add) - per_add, per_add)
+    pair_ref = order[np.repeat(starts[add_block[add_rows]], per_add) + offsets]
+
+    return pair_ref.astype("int32"), pair_add.astype("int32")
+
+
+def candidate_pairs(
     ref: pd.DataFrame,
     ref_id: str,
     ref_addresses: list,
     add: pd.DataFrame,
     add_id: str,
     add_addresses: list,
+    chunk_size: int = 1000000,
 ) -> pd.DataFrame:
     """
     
-    Finds address match candidates between ref and add.
+    Finds address match candidates between ref and add, without copying
+    any address text.
     Two records will be a candidate if they have the same postcode.
+    Records with an exact address match are only paired with those matches.
     Similarity scores between ref_addresses and add_addresses will be added.
+    
+    Pairs are held as row positions into ref and add. Use pair_details to
+    look up the records of the pairs you need.
 
     Parameters
     ----------
@@ -135,69 +219,416 @@ def candidate_matches(
         Record ID column in add.
     add_addresses : list
         Address columns in add.
+    chunk_size : int, optional
+        Number of pairs to score at once. The default is 1000000.
 
     Returns
     -------
-    features : pd.DataFrame
-        Candidate matches between ref and add.
+    pairs : pd.DataFrame
+        ref_row and add_row (int32 row positions in ref and add) and a
+        float32 similarity score column for each pair of address and
+        number columns.
 
     """
+    from recordlinkage.algorithms.string import levenshtein_similarity
 
-    ref_match = ref.copy()
-    add_match = add.copy()
     address_perms = list(product(ref_addresses, add_addresses))
-    exact = pd.concat(
-        [
+    ref_postcode, add_postcode = _shared_codes(ref.postcode, add.postcode)
+
+    # Exact matches on postcode and any pair of address columns
+    exact = []
+    for (l, r) in address_perms:
+        ref_add, add_add = _shared_codes(ref[l], add[r])
+        exact.append(
             pd.merge(
-                ref_match, add_match,
-                left_on=[l, "postcode"], right_on=[r, "postcode"]
-            )
-            for (l, r) in address_perms
-        ]
-    )
+                pd.DataFrame(
+                    {"postcode": ref_postcode, "address": ref_add,
+                     "ref_row": np.arange(len(ref), dtype="int32")}
+                ),
+                pd.DataFrame(
+                    {"postcode": add_postcode, "address": add_add,
+                     "add_row": np.arange(len(add), dtype="int32")}
+                ),
+            )[["ref_row", "add_row"]]
+        )
+    exact = pd.concat(exact, ignore_index=True).drop_duplicates()
 
-    ref_match = ref_match.loc[~ref_match[ref_id].isin(exact[ref_id]), :].set_index(
-        ref_id
+    # Everything else is blocked on postcode
+    ref_block = np.where(
+        np.isin(np.arange(len(ref)), exact.ref_row.values), -1, ref_postcode
     )
-    add_match = add_match.loc[~add_match[add_id].isin(exact[add_id]), :].set_index(
-        add_id
+    add_block = np.where(
+        np.isin(np.arange(len(add)), exact.add_row.values), -1, add_postcode
     )
-    indexer = recordlinkage.Index()
-    indexer.block("postcode")
-    candidate_links = indexer.index(ref_match, add_match)
+    ref_rows, add_rows = _block_pairs(ref_block, add_block)
 
-    compare_cl = recordlinkage.Compare()
     number_perms = list(
         product(
-            ref_match.columns[ref_match.columns.str.contains("number")],
-            add_match.columns[add_match.columns.str.contains("number")],
+            ref.columns[ref.columns.str.contains("number") & (ref.columns != ref_id)],
+            add.columns[add.columns.str.contains("number") & (add.columns != add_id)],
         )
     )
+    pairs = pd.DataFrame({"ref_row": ref_rows, "add_row": add_rows})
+    for (l, r) in address_perms + number_perms:
+        ref_values = ref[l].values
+        add_values = add[r].values
+        scores = np.empty(len(pairs), dtype="float32")
+        for start in range(0, len(pairs), chunk_size):
+            end = start + chunk_size
+            scores[start:end] = (
+                levenshtein_similarity(
+                    pd.Series(ref_values[ref_rows[start:end]]),
+                    pd.Series(add_values[add_rows[start:end]]),
+                )
+                .fillna(0)
+                .values
+            )
+        pairs[f"{l}_{r}_match"] = scores
+
+    exact = exact.reindex(columns=pairs.columns).astype(
+        {col: "float32" for col in pairs.columns[2:]}
+    ).fillna(1)
+    pairs = pd.concat([pairs, exact], ignore_index=True).astype(
+        {"ref_row": "int32", "add_row": "int32"}
+    )
+
+    return pairs
+
+
+def pair_details(
+    pairs: pd.DataFrame,
+    ref: pd.DataFrame,
+    ref_id: str,
+    ref_addresses: list,
+    add: pd.DataFrame,
+    add_id: str,
+    add_addresses: list,
+) -> pd.DataFrame:
+    """
+    
+    Look up the IDs and addresses of candidate pairs from candidate_pairs.
+    Filter pairs first to only look up the pairs you need, e.g.
+        pair_details(pairs.loc[pairs.numbers_numbers_match == 1, :], ...)
+
+    Parameters
+    ----------
+    pairs : pd.DataFrame
+        Candidate pairs from candidate_pairs.
+    ref : pd.DataFrame
+        Reference dataset the pairs were found with.
+    ref_id : str
+        Record ID column in ref.
+    ref_addresses : list
+        Address columns in ref.
+    add : pd.DataFrame
+        Additional dataset the pairs were found with.
+    add_id : str
+        Record ID column in add.
+    add_addresses : list
+        Address columns in add.
+
+    Returns
+    -------
+    features : pd.DataFrame
+        Candidate matches between ref and add, with any UPRN or UDPRN ID
+        columns as utils.KEY_DTYPE.
+
+    """
+    match_cols = sorted(pairs.columns[pairs.columns.str.endswith("_match")])
+    features = pd.concat(
+        [
+            ref[[ref_id]].iloc[pairs.ref_row.values].reset_index(drop=True),
+            add[[add_id]].iloc[pairs.add_row.values].reset_index(drop=True),
+            ref[ref_addresses].iloc[pairs.ref_row.values].reset_index(drop=True),
+            add[add_addresses].iloc[pairs.add_row.values].reset_index(drop=True),
+            pairs[match_cols].reset_index(drop=True),
+        ],
+        axis=1,
+    )
+
+    return utils.type_keys(features)
+
+
+def candidate_matches(
+    ref: pd.DataFrame,
+    ref_id: str,
+    ref_addresses: list,
+    add: pd.DataFrame,
+    add_id: str,
+    add_addresses: list,
+) -> pd.DataFrame:
+    """
+    
+    Finds address match candidates between ref and add.
+    Two records will be a candidate if they have the same postcode.
+    Similarity scores between ref_addresses and add_addresses will be added.
+    
+    This copies the addresses onto every candidate, for large datasets use
+    candidate_pairs and pair_details instead.
+
+    Parameters
+    ----------
+    ref : pd.DataFrame
+        Reference dataset to address match onto.
+    ref_id : str
+        Record ID column in ref.
+    ref_addresses : list
+        Address columns in ref.
+    add : pd.DataFrame
+        Additional dataset to address match from.
+    add_id : str
+        Record ID column in add.
+    add_addresses : list
+        Address columns in add.
+
+    Returns
+    -------
+    features : pd.DataFrame
+        Candidate matches between ref and add.
+
+    """
+    pairs = candidate_pairs(ref, ref_id, ref_addresses, add, add_id, add_addresses)
+    features = pair_details(
+        pairs, ref, ref_id, ref_addresses, add, add_id, add_addresses
+    )
 
-    for (l, r) in address_perms:
-        compare_cl.string(l, r, method="levenshtein", label=f"{l}_{r}_match")
-    for (l, r) in number_perms:
-        compare_cl.string(l, r, method="levenshtein", label=f"{l}_{r}_match")
-
-    features = compare_cl.compute(candidate_links, ref_match, add_match)
-
-    features = features.reset_index()
-
-    features = pd.merge(features, ref_match[ref_addresses + ["postcode"]].reset_index())
-    features = pd.merge(features, add_match[add_addresses].reset_index())
-    features = pd.concat([features, exact], sort=True)
-    features.loc[:, features.columns.str.endswith("_match")] = features.loc[
-        :, features.columns.str.endswith("_match")
-    ].fillna(1)
-    features = features[
-        [ref_id, add_id]
-        + ref_addresses
-        + add_addresses
-        + list(features.columns[features.columns.str.endswith("_match")])
-    ]
     return features
 
 
+# Words in addressable object text that don't help tell objects apart
+_AO_NOISE = r"\b(FLAT|FLATS|APARTMENT|APT|UNIT|MAISONETTE|ROOM)\b"
+
+
+def parse_ao(ao: pd.Series) -> pd.DataFrame:
+    """
+    
+    Split addressable objects (e.g. Land Registry paon and saon) into the
+    number range and text used by the gazatteer.
+    
+    "12A" becomes start_number 12 and start_suffix "A", "10-14" start_number
+    10 and end_number 14, and "ROSE COURT" text "ROSE COURT". Parsing is done
+    once for each unique value.
+
+    Parameters
+    ----------
+    ao : pd.Series
+        Addressable objects to parse.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        start_number, start_suffix, end_number, end_suffix and text columns
+        with the same index as ao. Missing numbers are -1 and missing
+        suffixes and text are "".
+
+    """
+    codes, uniques = pd.factorize(ao.fillna("").astype(str))
+    clean_ao = (
+        pd.Series(uniques)
+        .str.upper()
+        .str.replace("[^A-Z0-9 -]", "")
+        .str.replace(" +", " ")
+        .str.strip()
+    )
+    parts = clean_ao.str.extract(
+        "^(?P<text>.*?) ?(?P<start_number>[0-9]+)(?P<start_suffix>[A-Z]?)"
+        "(?: ?- ?(?P<end_number>[0-9]+)(?P<end_suffix>[A-Z]?))?$"
+    )
+    parts["text"] = parts.text.where(~parts.start_number.isna(), clean_ao)
+    parts["text"] = (
+        parts.text.str.replace(_AO_NOISE, "").str.replace(" +", " ").str.strip()
+    )
+    for col in ["start_number", "end_number"]:
+        parts[col] = pd.to_numeric(parts[col]).fillna(-1).astype("int64")
+    for col in ["start_suffix", "end_suffix", "text"]:
+        parts[col] = parts[col].fillna("")
+    df = parts.iloc[codes, :].set_index(ao.index)
+
+    return df
+
+
+def _gazatteer_ao(ref: pd.DataFrame, prefix: str) -> pd.DataFrame:
+    """
+    Get the gazatteer addressable object columns in the form of parse_ao.
+    Where the gazatteer has no numbers, numbers held in the text are used.
+    """
+    parsed = parse_ao(ref[f"{prefix}_text"])
+    df = pd.DataFrame(index=ref.index)
+    for col in ["start_number", "end_number"]:
+        numbers = pd.to_numeric(ref[f"{prefix}_{col}"], errors="coerce")
+        df[col] = numbers.fillna(-1).astype("int64")
+    for col in ["start_suffix", "end_suffix"]:
+        df[col] = ref[f"{prefix}_{col}"].fillna("").astype(str).str.upper()
+    from_text = df.start_number < 0
+    df.loc[from_text, :] = parsed.loc[from_text, df.columns]
+    df["text"] = parsed.text
+
+    return df
+
+
+def _structured_keys(
+    df: pd.DataFrame, id_col: str, pao: pd.DataFrame, sao: pd.DataFrame,
+    postcode: pd.Series, street: pd.Series
+) -> pd.DataFrame:
+    """
+    Combine ids, postcode, street and addressable objects into one frame
+    of matching keys.
+    """
+    keys = pd.concat(
+        [pao.add_prefix("pao_"), sao.add_prefix("sao_")], axis=1
+    ).assign(
+        postcode=postcode.fillna("").str.upper().str.replace("[^A-Z0-9]", ""),
+        street=street.fillna("").str.upper().str.replace("[^A-Z ]", "").str.strip(),
+    )
+    keys.insert(0, id_col, df[id_col])
+
+    return keys
+
+
+def structured_matches(
+    ref: pd.DataFrame,
+    ref_id: str,
+    add: pd.DataFrame,
+    add_id: str,
+    ref_postcode: str = "postcode_locator",
+    ref_street: str = "street_description",
+    add_postcode: str = "postcode",
+    add_street: str = "street",
+    ref_addresses: list = None,
+) -> dict:
+    """
+    
+    Match structured addresses (e.g. Land Registry paon, saon and street)
+    to the gazatteer's addressable objects.
+    
+    Matching is done in three stages:
+        1. exact - postcode, paon and saon numbers, suffixes and text are
+           all the same (and street if both have one). Only unambiguous
+           matches are kept.
+        2. range - a paon number falls within a gazatteer paon number range
+           with the same postcode and saon. Only unambiguous matches are kept.
+        3. residual - records still unmatched are combined into a single
+           address and scored with candidate_matches (if ref_addresses given).
+    Stages 1 and 2 are joins and integer comparisons, so string similarity
+    is only needed for the residual.
+
+    Parameters
+    ----------
+    ref : pd.DataFrame
+        Gazatteer to match onto. Must have the sao_* and pao_* columns.
+    ref_id : str
+        Record ID column in ref.
+    add : pd.DataFrame
+        Dataset to match from. Must have paon and saon columns.
+    add_id : str
+        Record ID column in add.
+    ref_postcode : str, optional
+        Postcode column in ref. The default is "postcode_locator".
+    ref_street : str, optional
+        Street column in ref. The default is "street_description".
+    add_postcode : str, optional
+        Postcode column in add. The default is "postcode".
+    add_street : str, optional
+        Street column in add. The default is "street".
+    ref_addresses : list, optional
+        Address columns in ref that have been through match_prep (which will
+        also have cleaned the postcode column) to score the residual with.
+        The default is None (residual is not scored).
+
+    Returns
+    -------
+    dict
+        A dictionary containing matched ref_id and add_id pairs with the
+        method used in 'matches', unmatched records from add in 'unmatched'
+        and, if ref_addresses is given, candidate_matches for the
+        unmatched records in 'candidates'.
+
+    """
+    ref_keys = _structured_keys(
+        ref, ref_id, _gazatteer_ao(ref, "pao"), _gazatteer_ao(ref, "sao"),
+        ref[ref_postcode], ref[ref_street]
+    )
+    add_keys = _structured_keys(
+        add, add_id, parse_ao(add.paon), parse_ao(add.saon),
+        add[add_postcode], add[add_street]
+    )
+    ao_cols = [
+        f"{ao}_{col}"
+        for ao in ["pao", "sao"]
+        for col in ["start_number", "start_suffix", "end_number", "end_suffix", "text"]
+    ]
+
+    # 1. Exact match on all parts of the addressable objects
+    exact = pd.merge(
+        ref_keys, add_keys, on=["postcode"] + ao_cols, suffixes=("_ref", "_add")
+    )
+    exact = exact.loc[
+        (exact.street_ref == "")
+        | (exact.street_add == "")
+        | (exact.street_ref == exact.street_add),
+        [ref_id, add_id],
+    ]
+    # Records matching more than one gazatteer address are left for the
+    # residual, as in the range stage
+    exact_ids = exact[add_id]
+    exact = exact.loc[~exact[add_id].duplicated(keep=False), :].assign(
+        method="exact"
+    )
+
+    # 2. paon number within a gazatteer number range
+    add_keys = add_keys.loc[
+        ~add_keys[add_id].isin(exact_ids) & (add_keys.pao_start_number >= 0), :
+    ]
+    block = ["postcode", "pao_text"] + [col for col in ao_cols if col.startswith("sao")]
+    in_range = pd.merge(
+        ref_keys.loc[ref_keys.pao_end_number >= 0, :],
+        add_keys,
+        on=block,
+        suffixes=("_ref", "_add"),
+    )
+    add_end = in_range.pao_end_number_add.where(
+        in_range.pao_end_number_add >= 0, in_range.pao_start_number_add
+    )
+    in_range = in_range.loc[
+        (in_range.pao_start_number_add >= in_range.pao_start_number_ref)
+        & (add_end <= in_range.pao_end_number_ref),
+        [ref_id, add_id],
+    ]
+    in_range = in_range.loc[~in_range[add_id].duplicated(keep=False), :].assign(
+        method="range"
+    )
+
+    matches = utils.type_keys(pd.concat([exact, in_range], ignore_index=True))
+
+    # 3. Residual - combine into one address and score similarity
+    unmatched = add.loc[~add[add_id].isin(matches[add_id]), :]
+    matched = {"matches": matches, "unmatched": unmatched}
+    if ref_addresses is not None:
+        residual = unmatched.assign(
+            address=unmatched[["saon", "paon", add_street]]
+            .fillna("")
+            .astype(str)
+            .apply(lambda x: " ".join(x), axis=1),
+            postcode=unmatched[add_postcode],
+        )
+        residual = match_prep(residual[[add_id, "address", "postcode"]], add_var="address")
+        ref_cols = (
+            [ref_id, "postcode"]
+            + ref_addresses
+            + ref.columns[ref.columns.str.startswith("numbers")].tolist()
+        )
+        matched["candidates"] = candidate_matches(
+            ref=ref[ref_cols],
+            ref_id=ref_id,
+            ref_addresses=ref_addresses,
+            add=residual,
+            add_id=add_id,
+            add_addresses=["clean_address"],
+        )
+
+    return matched
+
+
 def postcode_regex() -> str:
     """
     Regex to match UK postcodes
@@ -208,3 +639,212 @@ def postcode_regex() -> str:
 
     """
     return "[A-Z]{1,2}[0-9][A-Z0-9]? ?[0-9][A-Z]{2}"
+
+
+_LETTERS = {"": 0, **{chr(65 + i): i + 1 for i in range(26)}}
+
+
+def _letter_codes(letters: pd.Series) -> pd.Series:
+    """
+    Convert single letters to integers (A=1 to Z=26, missing or empty=0).
+    """
+    return letters.fillna("").map(_LETTERS).fillna(0).astype("int64")
+
+
+def parse_postcode(postcode: pd.Series) -> pd.DataFrame:
+    """
+    
+    Parse UK postcodes into their parts and integer codes.
+    
+    Postcodes take the same form as postcode_regex, but spacing, case and
+    punctuation are ignored so "nw1 2db", "NW12DB" and "NW1 2DB" all parse
+    to the same postcode. O and 0 are swapped where only the other can be
+    (the first character and the last two are letters, the inward code
+    starts with a number), so "NW1 O0B" parses as "NW1 0OB". Each unique
+    postcode is parsed once.
+    
+    The integer codes nest, so the key of a postcode's sector is
+    key // 676 and all postcodes in a district share key // 6760.
+
+    Parameters
+    ----------
+    postcode : pd.Series
+        Postcodes to parse.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        With the same index as postcode, containing:
+        postcode - normalised postcode (e.g. "NW1 2DB"), missing if invalid.
+        area, district, sector, unit - integer codes of each part.
+        key - a single integer code for the whole postcode, -1 if invalid.
+
+    """
+    codes, uniques = pd.factorize(postcode)
+    parts = (
+        pd.Series(uniques, dtype=object)
+        .astype(str)
+        .str.upper()
+        .str.replace("[^A-Z0-9]", "")
+        .str.replace("^0", "O")
+        .str.replace("O(?=[A-Z0-9]{2}$)", "0")
+        .str.replace("0(?=[A-Z0-9]?$)", "O")
+        .str.extract(
+            "^(?P<area_1>[A-Z])(?P<area_2>[A-Z]?)(?P<district_number>[0-9]{1,2})"
+            "(?P<district_letter>[A-Z]?)(?P<sector>[0-9])"
+            "(?P<unit_1>[A-Z])(?P<unit_2>[A-Z])$"
+        )
+    )
+    valid = ~parts.sector.isna()
+    df = pd.DataFrame(
+        {
+            "postcode": (
+                parts.area_1 + parts.area_2 + parts.district_number
+                + parts.district_letter + " " + parts.sector
+                + parts.unit_1 + parts.unit_2
+            ),
+            "area": _letter_codes(parts.area_1) * 27 + _letter_codes(parts.area_2),
+            "district": (
+                pd.to_numeric(parts.district_number).fillna(0).astype("int64") * 27
+                + _letter_codes(parts.district_letter)
+            ),
+            "sector": pd.to_numeric(parts.sector).fillna(0).astype("int64"),
+            "unit": (_letter_codes(parts.unit_1) - 1).clip(lower=0) * 26
+            + (_letter_codes(parts.unit_2) - 1).clip(lower=0),
+        }
+    )
+    df["key"] = (
+        ((df.area * 2700 + df.district) * 10 + df.sector) * 676 + df.unit
+    ).where(valid, -1)
+    # Missing postcodes have code -1 - add an invalid row for them to pick up
+    df = pd.concat(
+        [
+            df,
+            pd.DataFrame(
+                {"key": [-1], "area": 0, "district": 0, "sector": 0, "unit": 0}
+            ),
+        ],
+        ignore_index=True,
+        sort=False,
+    )
+    df = df.iloc[codes, :].set_index(postcode.index)
+
+    return df
+
+
+def postcode_index(postcodes: pd.Series) -> np.ndarray:
+    """
+    
+    Build a sorted index of valid postcodes, e.g. from the gazatteer
+    postcode_locator column or the ONS postcode directory.
+
+    Parameters
+    ----------
+    postcodes : pd.Series
+        Postcodes known to be valid.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted unique postcode keys (see parse_postcode).
+
+    """
+    keys = parse_postcode(postcodes.drop_duplicates()).key.values
+
+    return np.unique(keys[keys >= 0])
+
+
+def save_postcode_index(
+    index: np.ndarray, file: str = "data/auxillary/london_postcodes.npy"
+) -> None:
+    """
+    
+    Save a postcode index so it can be reused without rebuilding it.
+
+    Parameters
+    ----------
+    index : np.ndarray
+        Postcode index from postcode_index.
+    file : str, optional
+        File to save to. The default is "data/auxillary/london_postcodes.npy".
+
+    Returns
+    -------
+    None
+
+    """
+    np.save(file, index)
+
+
+def load_postcode_index(
+    file: str = "data/auxillary/london_postcodes.npy",
+) -> np.ndarray:
+    """
+    
+    Load a postcode index saved by save_postcode_index.
+    The index is memory mapped rather than read into memory.
+
+    Parameters
+    ----------
+    file : str, optional
+        File to load. The default is "data/auxillary/london_postcodes.npy".
+
+    Returns
+    -------
+    np.ndarray
+        Sorted postcode keys.
+
+    """
+    return np.load(file, mmap_mode="r")
+
+
+def validate_postcodes(keys: np.ndarray, index: np.ndarray) -> pd.DataFrame:
+    """
+    
+    Check postcodes against an index of valid postcodes, with a fallback
+    to the nearest valid postcode in the same sector for invalid ones.
+    
+    Uses binary search so each lookup is O(log n) in the size of the index.
+
+    Parameters
+    ----------
+    keys : np.ndarray
+        Postcode keys to check (see parse_postcode).
+    index : np.ndarray
+        Sorted valid postcode keys (see postcode_index).
+
+    Returns
+    -------
+    df : pd.DataFrame
+        valid - whether each postcode is in the index.
+        sector_valid - whether each postcode's sector is in the index.
+        nearest - the key itself if valid, otherwise the closest valid
+        postcode in the same sector (-1 if the sector isn't in the index).
+
+    """
+    keys = np.asarray(keys, dtype="int64")
+    index = np.asarray(index)
+    if len(index) == 0:
+        missing = np.zeros(len(keys), dtype=bool)
+        return pd.DataFrame(
+            {"valid": missing, "sector_valid": missing, "nearest": np.full(len(keys), -1)}
+        )
+    pos = np.searchsorted(index, keys)
+    before = index[np.clip(pos - 1, 0, len(index) - 1)]
+    after = index[np.clip(pos, 0, len(index) - 1)]
+    valid = (after == keys) & (keys >= 0)
+    sector = keys // 676
+    before_ok = (pos > 0) & (before // 676 == sector)
+    after_ok = (pos < len(index)) & (after // 676 == sector)
+    nearest = np.where(
+        before_ok & (~after_ok | (keys - before <= after - keys)),
+        before,
+        np.where(after_ok, after, -1),
+    )
+    nearest = np.where(valid, keys, nearest)
+    sector_valid = (before_ok | after_ok) & (keys >= 0)
+    df = pd.DataFrame(
+        {"valid": valid, "sector_valid": sector_valid, "nearest": nearest}
+    )
+
+    return df
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:40:22 2026
+
+@author: LiRogers
+"""
+
+import datetime
+import numpy as np
+import pandas as pd
+from hmo_identifier.data import utils
+
+
+# Columns of the combined gazatteer needed to generate all features
+FEATURE_INPUTS = [
+    "uprn",
+    "geo_address",
+    "postcode",
+    "date_lr",
+    "new_build_lr",
+    "lodgement_date_epc",
+    "transaction_type_epc",
+    "social_housing",
+    "built_form_epc",
+    "property_type_epc",
+    "dwelling_type_text_ukb",
+    "tertiary_desc",
+    "bedroom_number_ukb",
+    "wet_room_number_ukb",
+    "reception_number_ukb",
+    "building__age_text_ukb",
+    "construction_age_band_epc",
+    "energy_consumption_current_epc",
+    "energy_consumption_potential_epc",
+    "asb_sum_crime",
+    "price_pp_median_abnb",
+    "imd_decile_imd",
+    "hmo",
+]
+
+
+def tenure(df: pd.DataFrame) -> pd.Series:
+    """
+
+    Estimate tenure from the most recent of the EPC transaction type and
+    Land Registry sale, falling back to social housing.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Combined gazatteer with date_lr, lodgement_date_epc,
+        transaction_type_epc and social_housing.
+
+    Returns
+    -------
+    pd.Series
+        'Owner Occupied', 'Private Rent', 'Social Rent' or 'Unknown'.
+
+    """
+    date_lr = pd.to_datetime(df.date_lr)
+    date_epc = pd.to_datetime(df.lodgement_date_epc)
+    transaction = df.transaction_type_epc.astype(object)
+    epc_latest = (date_epc > date_lr) | (date_lr.isna() & date_epc.notna())
+    lr_latest = (date_epc < date_lr) | (date_lr.notna() & date_epc.isna())
+    rent_sale = utils.map_unique(
+        transaction, lambda x: x.str.contains("rental|sale", na=False)
+    ).fillna(False).astype(bool)
+    tenure = np.select(
+        [lr_latest, epc_latest & rent_sale, df.social_housing.fillna(False).astype(bool)],
+        [np.array("sale", dtype=object), transaction, np.array("Social Rent", dtype=object)],
+        default="Unknown",
+    )
+    tenure = utils.map_unique(
+        pd.Series(tenure, index=df.index),
+        lambda x: x.replace({"rental": "Private Rent", "rental (private)": "Private Rent"})
+        .str.replace("rental.*social.*", "Social Rent")
+        .str.replace(".*sale.*", "Owner Occupied"),
+    )
+
+    return tenure
+
+
+def building_type(df: pd.DataFrame) -> pd.Series:
+    """
+
+    Building type from EPC built form, falling back to UK Buildings and then
+    the gazatteer classification.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Combined gazatteer with built_form_epc, dwelling_type_text_ukb and
+        tertiary_desc.
+
+    Returns
+    -------
+    pd.Series
+        'flat', 'terrace', 'semi-detached', 'detached' or 'other'.
+
+    """
+    built_form = df.built_form_epc.astype(object)
+    dwelling = df.dwelling_type_text_ukb.astype(object)
+    building = np.select(
+        [built_form.notna() & (built_form != "NO DATA!"), dwelling.notna()],
+        [built_form, dwelling],
+        default=df.tertiary_desc.astype(object),
+    )
+    building = utils.map_unique(
+        pd.Series(building, index=df.index),
+        lambda x: x.str.lower()
+        .str.replace(".*flat.*", "flat")
+        .str.replace(".*terrace.*", "terrace"),
+    )
+    building = building.where(
+        building.isin(["terrace", "flat", "semi-detached", "detached"]), "other"
+    )
+
+    return building
+
+
+def flat(df: pd.DataFrame, building: pd.Series = None) -> pd.Series:
+    """
+
+    Whether a property is a flat according to any of EPC, UK Buildings or
+    building_type.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Combined gazatteer with property_type_epc and dwelling_type_text_ukb.
+    building : pd.Series, optional
+        Output of building_type, calculated if not given.
+
+    Returns
+    -------
+    pd.Series
+        True for flats.
+
+    """
+    if building is None:
+        building = building_type(df)
+    ukb_flat = utils.map_unique(
+        df.dwelling_type_text_ukb,
+        lambda x: x.str.contains("flat", case=False, na=False),
+    ).fillna(False).astype(bool)
+    is_flat = (
+        df.property_type_epc.isin(["Flat", "Maisonette"])
+        | (building == "flat")
+        | ukb_flat
+    )
+
+    return is_flat
+
+
+def _age_range(text: pd.Series) -> pd.DataFrame:
+    """
+    Extract the start and end years from age bands like "1930-1949" or
+    "England and Wales: 1967-1975", once per unique band.
+    """
+    return utils.map_unique(
+        text,
+        lambda x: pd.DataFrame(
+            {
+                "min": pd.to_numeric(x.str.extract(" ([0-9]{4})", expand=False)),
+                "max": pd.to_numeric(x.str.extract("-([0-9]{4})", expand=False)),
+            }
+        ),
+    )
+
+
+def build_age(df: pd.DataFrame) -> pd.Series:
+    """
+
+    Estimate the year a property was built from the ranges given by
+    UK Buildings, EPC and new build sales in the Land Registry.
+    Where the ranges overlap, the midpoint of the overlap is used.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Combined gazatteer with building__age_text_ukb,
+        construction_age_band_epc, date_lr and new_build_lr.
+
+    Returns
+    -------
+    pd.Series
+        Estimated build year.
+
+    """
+    this_year = datetime.datetime.today().year
+
+    ukb = _age_range(df.building__age_text_ukb)
+    ukb["max"] = np.where(ukb["max"].isna() & ukb["min"].notna(), this_year, ukb["max"])
+
+    epc = _age_range(df.construction_age_band_epc)
+    before_1900 = (epc["min"] == 1900) & epc["max"].isna()
+    after_2007 = (epc["min"] == 2007) & epc["max"].isna()
+    epc["min"] = np.where(before_1900, 1800, epc["min"])
+    epc["max"] = np.select([before_1900, after_2007], [1900, this_year], epc["max"])
+
+    lr_year = pd.to_datetime(df.date_lr).dt.year.where(df.new_build_lr == "Y")
+    lr = pd.DataFrame({"min": lr_year, "max": lr_year})
+
+    age_min = np.fmax(np.fmax(epc["min"].values, lr["min"].values), ukb["min"].values)
+    age_max = np.fmin(np.fmin(epc["max"].values, lr["max"].values), ukb["max"].values)
+    conflict = age_min > age_max
+    age_min[conflict] = np.nan
+    age_max[conflict] = np.nan
+    for source in [lr, ukb, epc]:
+        age_min = np.where(np.isnan(age_min), source["min"].values, age_min)
+        age_max = np.where(np.isnan(age_max), source["max"].values, age_max)
+    age = pd.DataFrame({"min": age_min, "max": age_max}, index=df.index).mean(axis=1)
+
+    return age
+
+
+def energy_eff_def(df: pd.DataFrame) -> pd.Series:
+    """
+
+    Energy efficiency deficit - current energy consumption as a proportion of
+    potential consumption.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Combined gazatteer with energy_consumption_current_epc and
+        energy_consumption_potential_epc.
+
+    Returns
+    -------
+    pd.Series
+        Energy efficiency deficit, missing where either consumption isn't
+        positive.
+
+    """
+    current = pd.to_numeric(df.energy_consumption_current_epc)
+    potential = pd.to_numeric(df.energy_consumption_potential_epc)
+    deficit = (current / potential).where((current > 0) & (potential > 0))
+
+    return deficit
+
+
+def other_households_3bed_plus(df: pd.DataFrame) -> pd.Series:
+    """
+
+    Number of "other" households (not families or single people) with 3 or
+    more bedrooms in the census output area.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Combined gazatteer with census household composition columns.
+
+    Returns
+    -------
+    pd.Series
+        Number of households.
+
+    """
+    cols = df.columns[
+        df.columns.str.startswith("household_composition")
+        & df.columns.str.contains("other_household")
+        & df.columns.str.contains("3|4")
+    ]
+
+    return df[cols].sum(axis=1)
+
+
+def generate(df: pd.DataFrame) -> pd.DataFrame:
+    """
+
+    Generate the modelling features from the combined gazatteer.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Combined gazatteer (output of notebook 02). Only FEATURE_INPUTS
+        and census household composition columns are used.
+
+    Returns
+    -------
+    features : pd.DataFrame
+        One row per UPRN with the modelling features.
+
+    """
+    building = building_type(df)
+    features = pd.DataFrame(
+        {
+            "uprn": df.uprn,
+            "geo_address": df.geo_address,
+            "postcode": df.postcode,
+            "tenure": tenure(df),
+            "social_housing": df.social_housing,
+            "building_type": building,
+            "flat": flat(df, building=building),
+            "bedrooms": df.bedroom_number_ukb,
+            "rooms": df.bedroom_number_ukb
+            + df.wet_room_number_ukb
+            + df.reception_number_ukb,
+            "build_age": build_age(df),
+            "other_households_3bed_plus": other_households_3bed_plus(df),
+            "energy_eff_def": energy_eff_def(df),
+            "asb_sum_crime": df.asb_sum_crime,
+            "price_pp_median_abnb": df.price_pp_median_abnb,
+            "imd_decile": df.imd_decile_imd,
+            "hmo": df.hmo,
+        },
+        index=df.index,
+    )
+
+    return features
+
+
+def generate_from_file(file: str, chunksize: int = 100000) -> pd.DataFrame:
+    """
+
+    Generate the modelling features from a combined gazatteer file, reading
+    only the columns needed a chunk at a time so memory use is bounded.
+
+    Parameters
+    ----------
+    file : str
+        Combined gazatteer csv, e.g. "data/interim/gazatteer_combined.csv".
+    chunksize : int, optional
+        Number of rows to read at once. The default is 100000.
+
+    Returns
+    -------
+    features : pd.DataFrame
+        One row per UPRN with the modelling features.
+
+    """
+    columns = pd.read_csv(file, nrows=0).columns
+    usecols = [
+        col
+        for col in columns
+        if col in FEATURE_INPUTS
+        or (col.startswith("household_composition") and "other_household" in col)
+    ]
+    features = pd.concat(
+        [generate(chunk) for chunk in pd.read_csv(file, usecols=usecols, chunksize=chunksize)],
+        ignore_index=True,
+    )
+
+    return features
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:02:51 2026
+
+@author: LiRogers
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def latest_index(keys: pd.Series, dates: pd.Series, latest: bool = True) -> np.ndarray:
+    """
+
+    Find the position of the latest (or earliest) record for each key.
+
+    Keys are integer encoded and the winner for each key is found with a
+    single group-wise maximum, so there is no sort of the whole dataset.
+    Where several records for a key share the winning date, the first in the
+    data is used. Records with missing dates only win if a key has no dated
+    records. Records with a missing key are ignored.
+
+    Parameters
+    ----------
+    keys : pd.Series
+        The key (e.g. brn) of each record.
+    dates : pd.Series
+        The date of each record. Strings will be parsed as dates.
+    latest : bool, optional
+        Find the latest record for each key.
+        If False find the earliest. The default is True.
+
+    Returns
+    -------
+    np.ndarray
+        Positions of the winning record for each key, in order of first
+        appearance of the key.
+
+    """
+    codes, uniques = pd.factorize(keys)
+    n_keys = len(uniques)
+    values = pd.to_datetime(dates).values.view("int64").copy()
+    missing = pd.isna(dates).values
+    if not latest:
+        values = -values
+    # NaT is the smallest int64 - make sure it never beats a real date
+    values[missing] = np.iinfo("int64").min
+    values[codes < 0] = np.iinfo("int64").min
+
+    valid = codes >= 0
+    best = np.full(n_keys, np.iinfo("int64").min, dtype="int64")
+    np.maximum.at(best, codes[valid], values[valid])
+
+    positions = np.arange(len(codes))
+    winner = valid & (values == best[np.where(valid, codes, 0)])
+    first = np.full(n_keys, len(codes), dtype="int64")
+    np.minimum.at(first, codes[winner], positions[winner])
+
+    return first
+
+
+def latest_records(
+    df: pd.DataFrame, key: str, date: str, latest: bool = True
+) -> pd.DataFrame:
+    """
+
+    Keep only the latest (or earliest) record for each key.
+
+    A replacement for sorting by date and dropping duplicate keys,
+    e.g. the latest EPC per building reference number:
+        latest_records(epc, key='brn', date='lodgement_date')
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Records to filter.
+    key : str
+        Column identifying records that belong together.
+    date : str
+        Date column used to choose between records.
+    latest : bool, optional
+        Keep the latest record for each key.
+        If False keep the earliest. The default is True.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per key, in order of first appearance of the key.
+
+    """
+    positions = latest_index(df[key], df[date], latest=latest)
+
+    return df.iloc[positions, :].reset_index(drop=True)
+
+
+def update_latest(
+    current: pd.DataFrame,
+    delta: pd.DataFrame,
+    key: str,
+    date: str,
+    latest: bool = True,
+) -> pd.DataFrame:
+    """
+
+    Update the latest (or earliest) record for each key with new records.
+
+    Only the current winners and the new records are compared, so a new
+    delta of EPC or Land Registry data doesn't need the full history.
+
+    Parameters
+    ----------
+    current : pd.DataFrame
+        Current winning records, as returned by latest_records.
+    delta : pd.DataFrame
+        New records.
+    key : str
+        Column identifying records that belong together.
+    date : str
+        Date column used to choose between records.
+    latest : bool, optional
+        Keep the latest record for each key.
+        If False keep the earliest. The default is True.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per key. Existing records win ties with new records.
+
+    """
+    df = pd.concat([current, delta], sort=False, ignore_index=True)
+
+    return latest_records(df, key=key, date=date, latest=latest)
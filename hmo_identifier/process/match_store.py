@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 12:08:14 2026
+
+@author: LiRogers
+"""
+
+import hashlib
+import sqlite3
+import numpy as np
+import pandas as pd
+from hmo_identifier.data import utils
+
+
+def address_key(clean_address: pd.Series) -> pd.Series:
+    """
+
+    Hash normalised addresses to integer keys.
+
+    The hash is stable between runs and python sessions, so keys can be
+    stored and looked up later. Each unique address is hashed once.
+
+    Parameters
+    ----------
+    clean_address : pd.Series
+        Addresses cleaned by address.match_prep.
+
+    Returns
+    -------
+    pd.Series
+        int64 key for each address.
+
+    """
+    codes, uniques = pd.factorize(clean_address.fillna("").astype(str))
+    keys = np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(add.encode("utf-8"), digest_size=8).digest(),
+                "little",
+                signed=True,
+            )
+            for add in uniques
+        ],
+        dtype="int64",
+    )
+
+    return pd.Series(keys[codes], index=clean_address.index, name="address_key")
+
+
+def open_store(file: str) -> sqlite3.Connection:
+    """
+
+    Open (or create) a persistent store of address matches.
+
+    The store maps an address (key from address_key) and postcode to a UPRN,
+    with the match score and the method used. Addresses that couldn't be
+    matched are stored without a UPRN so they aren't matched again.
+
+    Parameters
+    ----------
+    file : str
+        SQLite database file, e.g. "data/interim/matches.db".
+
+    Returns
+    -------
+    con : sqlite3.Connection
+        Connection to the store.
+
+    """
+    con = sqlite3.connect(file)
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS matches (
+            address_key INTEGER NOT NULL,
+            postcode TEXT NOT NULL,
+            uprn INTEGER,
+            score REAL,
+            method TEXT,
+            PRIMARY KEY (address_key, postcode)
+        )
+        """
+    )
+    con.commit()
+
+    return con
+
+
+def lookup(con: sqlite3.Connection, df: pd.DataFrame,
+           add_var: str = "clean_address") -> pd.DataFrame:
+    """
+
+    Look up addresses in the match store.
+
+    Use before address.candidate_matches so only addresses not in the store
+    need to be matched:
+        known = match_store.lookup(con, epc)
+        unseen = known.loc[~known.in_store, epc.columns]
+
+    Parameters
+    ----------
+    con : sqlite3.Connection
+        Connection from open_store.
+    df : pd.DataFrame
+        Addresses prepared by address.match_prep (with postcode column).
+    add_var : str, optional
+        The cleaned address column. The default is "clean_address".
+
+    Returns
+    -------
+    df : pd.DataFrame
+        df with uprn, score and method from the store, and in_store showing
+        which addresses were found.
+
+    """
+    keys = pd.DataFrame(
+        {"address_key": address_key(df[add_var]), "postcode": df.postcode.fillna("")}
+    )
+    # A temporary table is only visible to this connection and is never
+    # written to the store file
+    con.execute("DROP TABLE IF EXISTS temp.lookup_keys")
+    con.execute("CREATE TEMP TABLE lookup_keys (address_key INTEGER, postcode TEXT)")
+    try:
+        con.executemany(
+            "INSERT INTO temp.lookup_keys VALUES (?, ?)",
+            [(int(k), pc) for (k, pc) in keys.drop_duplicates().itertuples(index=False)],
+        )
+        stored = pd.read_sql(
+            """
+            SELECT m.address_key, m.postcode, m.uprn, m.score, m.method
+            FROM matches m
+            INNER JOIN temp.lookup_keys k
+            ON m.address_key = k.address_key AND m.postcode = k.postcode
+            """,
+            con,
+        )
+    finally:
+        con.execute("DROP TABLE temp.lookup_keys")
+        con.commit()
+    stored = stored.assign(in_store=True)
+    found = keys.merge(stored, how="left", on=["address_key", "postcode"])
+    found.index = df.index
+    # SQLite returns UPRNs as floats when any are missing
+    found["uprn"] = utils.to_key(found.uprn)
+    df = pd.concat(
+        [df, found[["uprn", "score", "method", "in_store"]]], axis=1
+    )
+    df["in_store"] = df.in_store.fillna(False).astype(bool)
+
+    return df
+
+
+def record(
+    con: sqlite3.Connection,
+    df: pd.DataFrame,
+    add_var: str = "clean_address",
+    uprn: str = "uprn",
+    score: str = "score",
+    method: str = "method",
+) -> None:
+    """
+
+    Add matches to the match store, replacing any existing match for
+    the same address.
+
+    Parameters
+    ----------
+    con : sqlite3.Connection
+        Connection from open_store.
+    df : pd.DataFrame
+        Matched addresses with a postcode column. Rows with a missing UPRN
+        record addresses that couldn't be matched.
+    add_var : str, optional
+        The cleaned address column. The default is "clean_address".
+    uprn : str, optional
+        UPRN column. The default is "uprn".
+    score : str, optional
+        Match score column. The default is "score".
+    method : str, optional
+        Match method column, e.g. "exact" or "fuzzy". The default is "method".
+
+    Returns
+    -------
+    None
+
+    """
+    rows = pd.DataFrame(
+        {
+            "address_key": address_key(df[add_var]),
+            "postcode": df.postcode.fillna(""),
+            "uprn": df[uprn],
+            "score": df[score],
+            "method": df[method],
+        }
+    ).astype(object)
+    rows = rows.where(~pd.isna(rows), None)
+    con.executemany(
+        "INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?)",
+        [
+            (int(k), pc, None if u is None else int(u), s, m)
+            for (k, pc, u, s, m) in rows.itertuples(index=False)
+        ],
+    )
+    con.commit()
@@ -4,9 +4,40 @@ Created on Tue Mar 31 14:51:01 2020
 
 @author: lirogers
 """
-import geopandas as gpd
+from __future__ import annotations
+
+import numpy as np
 import pandas as pd
-from typing import Union
+from typing import TYPE_CHECKING, Union
+from hmo_identifier.data import utils
+from hmo_identifier.process import spatial_index
+
+# Merges work on coordinates, so geopandas and shapely are only imported
+# when geometries are needed
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+
+def _key_rows(keys: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Row of each of values in the unique int64 array keys, or -1 if it isn't
+    there. When values are sorted, keys are sorted too (unless they already
+    are) and both are walked through in order with binary searches (a merge
+    join), otherwise keys are hashed.
+    """
+    if len(keys) == 0:
+        return np.full(len(values), -1, dtype="int64")
+    if not (values[1:] >= values[:-1]).all():
+        return pd.Index(keys).get_indexer(values)
+    if (keys[1:] > keys[:-1]).all():
+        key_order = np.arange(len(keys))
+    else:
+        key_order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[key_order]
+    pos = np.searchsorted(sorted_keys, values)
+    pos[pos == len(keys)] = 0
+
+    return np.where(sorted_keys[pos] == values, key_order[pos], -1)
 
 
 def by_uprn(ref: Union[pd.DataFrame, gpd.GeoDataFrame],
@@ -14,6 +45,13 @@ def by_uprn(ref: Union[pd.DataFrame, gpd.GeoDataFrame],
             name: str) -> Union[pd.DataFrame, gpd.GeoDataFrame]:
     """
     
+    Left join add onto ref by UPRN.
+
+    UPRNs of any type (strings, floats or integers) are converted to
+    utils.KEY_DTYPE first, and missing UPRNs never match. When add has one
+    row per UPRN (e.g. the latest EPC of each address) rows are looked up
+    on int64 UPRNs directly, by merging sorted arrays when ref is sorted by
+    UPRN (as gla.gazateer returns it). Otherwise pandas merge is used.
 
     Parameters
     ----------
@@ -28,16 +66,36 @@ def by_uprn(ref: Union[pd.DataFrame, gpd.GeoDataFrame],
     Returns
     -------
     df : Union[pd.DataFrame, gpd.GeoDataFrame]
-        ref with add left joined by UPRN
+        ref with add left joined by UPRN, and merge_{name} showing which
+        rows matched ("both") or not ("left_only").
 
     """
 
-    add = add.copy()
+    ref_uprn = utils.to_key(ref.uprn)
+    add = utils.type_keys(add, cols=["uprn"])
+    add = add.loc[add.uprn.notna(), :]
     # add name label to all columns - so we know where they came from
     add.columns = [f"{col}_{name}" for col in add.columns]
     add.columns = add.columns.str.replace(f"uprn_{name}", "uprn")
-    df = ref.merge(add, how='left', on='uprn',
-                   indicator=f"merge_{name}")
+    if add.uprn.duplicated().any():
+        df = ref.assign(uprn=ref_uprn).merge(add, how='left', on='uprn',
+                                             indicator=f"merge_{name}")
+        return df
+
+    # Missing ref UPRNs are -1, which no UPRN is
+    rows = _key_rows(add.uprn.astype("int64").values,
+                          ref_uprn.fillna(-1).astype("int64").values)
+    add_cols = add.drop(columns="uprn").reset_index(drop=True)
+    # Row -1 isn't in add, so reindex fills unmatched rows as missing
+    add_cols = add_cols.reindex(rows)
+    add_cols.index = ref.index
+    df = pd.concat([ref, add_cols], axis=1)
+    df.index = pd.RangeIndex(len(df))
+    df["uprn"] = ref_uprn.values
+    df[f"merge_{name}"] = pd.Categorical.from_codes(
+        np.where(rows >= 0, 2, 0), categories=["left_only", "right_only", "both"]
+    )
+
     return df
 
 
@@ -74,20 +132,164 @@ def by_geog(ref: Union[pd.DataFrame, gpd.GeoDataFrame],
     return df
 
 
-def by_buffer(ref: gpd.GeoDataFrame, add: gpd.GeoDataFrame,
+def points_xy(df: Union[pd.DataFrame, gpd.GeoDataFrame],
+              x: str = "x_coordinate", y: str = "y_coordinate") -> tuple:
+    """
+    Get point coordinates as arrays, from x and y columns if df has them,
+    otherwise from the geometry.
+
+    Parameters
+    ----------
+    df : Union[pd.DataFrame, gpd.GeoDataFrame]
+        Points dataset.
+    x : str, optional
+        x coordinate column. The default is "x_coordinate".
+    y : str, optional
+        y coordinate column. The default is "y_coordinate".
+
+    Returns
+    -------
+    tuple
+        x and y coordinates as float64 numpy arrays.
+
+    """
+    if x in df.columns and y in df.columns:
+        return (df[x].values.astype("float64"), df[y].values.astype("float64"))
+
+    return (df.geometry.x.values, df.geometry.y.values)
+
+
+def to_geo(df: pd.DataFrame, x: str = "x_coordinate",
+           y: str = "y_coordinate", crs=27700) -> gpd.GeoDataFrame:
+    """
+    Create point geometries from coordinate columns, e.g. for plotting
+    or export. Not needed for merges, which work on the coordinates.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataset with coordinate columns.
+    x : str, optional
+        x coordinate column. The default is "x_coordinate".
+    y : str, optional
+        y coordinate column. The default is "y_coordinate".
+    crs : optional
+        CRS of the coordinates. The default is 27700.
+
+    Returns
+    -------
+    gpd.GeoDataFrame
+        df with point geometries.
+
+    """
+    import geopandas as gpd
+
+    return gpd.GeoDataFrame(
+        df, geometry=gpd.points_from_xy(df[x], df[y]), crs=crs
+    )
+
+
+def by_geography(ref: pd.DataFrame,
+                 geog: gpd.GeoDataFrame,
+                 x: str = "x_coordinate",
+                 y: str = "y_coordinate",
+                 cache_dir: str = None,
+                 lsuffix: str = "left",
+                 rsuffix: str = "right") -> pd.DataFrame:
+    """
+    Add the reference geography (e.g. output area or ward) each point falls in,
+    working directly on the point coordinates.
+
+    Points are only tested against polygons whose bounding box they
+    fall in, and no point geometries are created.
+
+    Parameters
+    ----------
+    ref : pd.DataFrame
+        Reference dataset with coordinate columns (or point geometry)
+        - usually address base or gazatteer.
+    geog : gpd.GeoDataFrame
+        Geography polygons, in the same CRS as the coordinates.
+    x : str, optional
+        x coordinate column. The default is "x_coordinate".
+    y : str, optional
+        y coordinate column. The default is "y_coordinate".
+    cache_dir : str, optional
+        Directory to cache the point order in, so it isn't recalculated for
+        the same points. The default is None.
+    lsuffix : str, optional
+        Suffix of ref columns also in geog, as in gpd.sjoin.
+        The default is "left".
+    rsuffix : str, optional
+        Suffix of geog columns also in ref. The default is "right".
+
+    Returns
+    -------
+    df : pd.DataFrame
+        ref with the geog columns left joined. Points in more than one
+        polygon take the first.
+
+    """
+    from shapely import vectorized
+
+    px, py = points_xy(ref, x=x, y=y)
+    order = spatial_index.point_order(px, cache_dir=cache_dir)
+    sorted_x = px[order]
+    match = np.full(len(px), -1, dtype="int64")
+    bounds = np.asarray(geog.geometry.bounds.values, dtype="float64")
+    for i, (geom, box) in enumerate(zip(geog.geometry, bounds)):
+        minx, miny, maxx, maxy = box
+        # Points within the polygon's x range, then its y range
+        start = np.searchsorted(sorted_x, minx, side="left")
+        end = np.searchsorted(sorted_x, maxx, side="right")
+        candidates = order[start:end]
+        candidates = candidates[
+            (py[candidates] >= miny) & (py[candidates] <= maxy)
+            & (match[candidates] < 0)
+        ]
+        if len(candidates) == 0:
+            continue
+        inside = vectorized.contains(geom, px[candidates], py[candidates])
+        match[candidates[inside]] = i
+    attributes = pd.DataFrame(geog.drop(columns="geometry")).reset_index(drop=True)
+    attributes = attributes.reindex(match)
+    attributes.index = ref.index
+    # Columns in both (e.g. ladcd of output areas and wards) are suffixed
+    overlap = ref.columns.intersection(attributes.columns)
+    if len(overlap) > 0:
+        ref = ref.rename(columns={col: f"{col}_{lsuffix}" for col in overlap})
+        attributes = attributes.rename(
+            columns={col: f"{col}_{rsuffix}" for col in overlap}
+        )
+    df = pd.concat([ref, attributes], axis=1)
+
+    return df
+
+
+def by_buffer(ref: Union[pd.DataFrame, gpd.GeoDataFrame],
+              add: Union[pd.DataFrame, gpd.GeoDataFrame],
               name: str, buffer: float,
-              sum_cols: list=['median', 'mean', 'max', 'min', 'sum']) -> gpd.GeoDataFrame:
+              sum_cols: list=['median', 'mean', 'max', 'min', 'sum'],
+              ref_xy: tuple=("x_coordinate", "y_coordinate"),
+              add_xy: tuple=("x_coordinate", "y_coordinate"),
+              cache_dir: str=None) -> Union[pd.DataFrame, gpd.GeoDataFrame]:
 
     """
     Merge a reference and additional geo dataframe by summarising features of
     additional within a buffer of points in reference
 
+    Points are found with a KD-tree on the coordinates, so no buffer
+    polygons (or point geometries, if coordinate columns are given)
+    are created.
+
     Parameters
     ----------
-    ref : gpd.GeoDataFrame
+    ref : Union[pd.DataFrame, gpd.GeoDataFrame]
         Reference spatial dataset - usually address base or gazatteer.
-    add : gpd.GeoDataFrame
+        Either point geometry or coordinate columns.
+    add : Union[pd.DataFrame, gpd.GeoDataFrame]
         New spatial dataset to add.
+        Either point geometry or coordinate columns.
     name : str
         Name to append to add columns.
     buffer : float
@@ -95,27 +297,48 @@ def by_buffer(ref: gpd.GeoDataFrame, add: gpd.GeoDataFrame,
     sum_cols : TYPE, optional
         What summary variables to produce.
         The default is ['median', 'mean', 'max', 'min', 'sum']: list.
+    ref_xy : tuple, optional
+        Coordinate columns in ref, used instead of the geometry if present.
+        The default is ("x_coordinate", "y_coordinate").
+    add_xy : tuple, optional
+        Coordinate columns in add, used instead of the geometry if present.
+        These are not summarised. The default is ("x_coordinate", "y_coordinate").
+    cache_dir : str, optional
+        Directory to cache the KD-tree of ref in, so it isn't rebuilt for
+        the same reference points. The default is None.
 
     Returns
     -------
-    df : gpd.GeoDataFrame
+    df : Union[pd.DataFrame, gpd.GeoDataFrame]
         ref with a summary of add left joined.
 
     """
 
-    add = add.copy()
-    add_cols = add.columns
-    add_agg = {col: sum_cols for col in add_cols if col != 'geometry'}
-    ref = ref.copy()
-    ref_buff = ref[['uprn', 'geometry']].assign(geometry=ref.buffer(buffer))
-    ref_join = (gpd.sjoin(ref_buff, add, how='left')
-                .drop(columns=['index_right', 'geometry']))
+    ref_x, ref_y = points_xy(ref, *ref_xy)
+    add_x, add_y = points_xy(add, *add_xy)
+    add_cols = [col for col in add.columns
+                if col not in ['geometry'] + list(add_xy)]
+    add_agg = {col: sum_cols for col in add_cols}
+
+    # All pairs of ref and add points within the buffer. The tree is built
+    # on ref so the same (cached) tree is used for every layer added
+    tree = spatial_index.kd_tree(ref_x, ref_y, cache_dir=cache_dir)
+    neighbours = tree.query_ball_point(np.column_stack([add_x, add_y]), r=buffer)
+    counts = np.array([len(n) for n in neighbours], dtype="int64")
+    add_rows = np.repeat(np.arange(len(add)), counts)
+    ref_rows = np.concatenate([np.asarray(n, dtype="int64") for n in neighbours]
+                              + [np.empty(0, dtype="int64")])
+    ref_join = (pd.DataFrame(add[add_cols]).iloc[add_rows]
+                .assign(uprn=ref.uprn.values[ref_rows]))
     ref_sum = (ref_join
                .groupby("uprn")
                .agg(add_agg)
-               .reset_index())
+               .reindex(ref.uprn.dropna().unique()))
     ref_sum.columns = ["_".join([a, b]) for (a, b) in ref_sum.columns]
-    ref_sum.columns = ref_sum.columns.str.replace("_$", "")
+    # Points with nothing in their buffer sum to 0
+    sum_names = [col for col in ref_sum.columns if col.endswith("_sum")]
+    ref_sum[sum_names] = ref_sum[sum_names].fillna(0)
+    ref_sum = ref_sum.rename_axis("uprn").reset_index()
 
     ref_sum.columns = [f"{col}_{name}" for col in ref_sum.columns]
     ref_sum.columns = ref_sum.columns.str.replace(f"uprn_{name}", "uprn")
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:21:37 2026
+
+@author: LiRogers
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def match_features(candidates: pd.DataFrame) -> list:
+    """
+
+    List the similarity columns in the output of address.candidate_matches.
+
+    Parameters
+    ----------
+    candidates : pd.DataFrame
+        Candidate matches from address.candidate_matches.
+
+    Returns
+    -------
+    list
+        Columns ending in "_match".
+
+    """
+    return candidates.columns[candidates.columns.str.endswith("_match")].tolist()
+
+
+def train(
+    candidates: pd.DataFrame, labels: pd.Series, method: str = "logistic"
+):
+    """
+
+    Train a classifier to tell true matches from the similarity scores of
+    candidate matches.
+
+    Labels can come from a sample of candidates checked by hand, or from
+    matches made with strict thresholds, e.g. numbers match exactly and
+    address similarity above 0.7.
+
+    Parameters
+    ----------
+    candidates : pd.DataFrame
+        Candidate matches from address.candidate_matches.
+    labels : pd.Series
+        True for candidates that are matches, False otherwise.
+    method : str, optional
+        Classifier to train, 'logistic' (logistic regression) or
+        'boosting' (gradient boosted trees). The default is "logistic".
+
+    Raises
+    ------
+    ValueError
+        If an invalid method is provided.
+
+    Returns
+    -------
+    model : sklearn classifier
+        Trained classifier. The features it was trained on are stored in
+        model.match_features_.
+
+    """
+    # scikit-learn is only needed to train a model
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    if method == "logistic":
+        model = LogisticRegression(solver="lbfgs")
+    elif method == "boosting":
+        model = GradientBoostingClassifier()
+    else:
+        raise ValueError("Invalid method, use 'logistic' or 'boosting'")
+    features = match_features(candidates)
+    model.fit(candidates[features].fillna(0).values, np.asarray(labels, dtype=bool))
+    model.match_features_ = features
+
+    return model
+
+
+def score(model, candidates: pd.DataFrame, batch_size: int = 1000000) -> np.ndarray:
+    """
+
+    Score candidate matches with a classifier from train.
+
+    The similarity columns are converted to a float32 array once and scored
+    in batches, so the classifier's working memory doesn't grow with the
+    number of candidates.
+
+    Parameters
+    ----------
+    model : sklearn classifier
+        Classifier from train.
+    candidates : pd.DataFrame
+        Candidate matches from address.candidate_matches.
+    batch_size : int, optional
+        Number of candidates to score at once. The default is 1000000.
+
+    Returns
+    -------
+    scores : np.ndarray
+        Probability that each candidate is a match.
+
+    """
+    # The features are copied once, a column at a time, as float32, and
+    # batches are views of that copy
+    features = np.empty((len(candidates), len(model.match_features_)), dtype="float32")
+    for i, col in enumerate(model.match_features_):
+        features[:, i] = candidates[col].values
+    np.nan_to_num(features, copy=False)
+    scores = np.empty(len(candidates), dtype="float32")
+    for start in range(0, len(candidates), batch_size):
+        batch = features[start : start + batch_size]
+        scores[start : start + batch_size] = model.predict_proba(batch)[:, 1]
+
+    return scores
+
+
+def _greedy(ref_codes: np.ndarray, add_codes: np.ndarray,
+            scores: np.ndarray) -> np.ndarray:
+    """
+    Greedy one to one assignment. Pairs are accepted in order of score,
+    skipping those whose ref or add record has already been matched.
+    """
+    # Stable, so ties are taken in candidate order
+    order = np.argsort(-scores, kind="stable")
+    taken_ref = np.zeros(ref_codes.max() + 1, dtype=bool)
+    taken_add = np.zeros(add_codes.max() + 1, dtype=bool)
+    accepted = np.zeros(len(scores), dtype=bool)
+    for i, ref, add in zip(order.tolist(), ref_codes[order].tolist(),
+                           add_codes[order].tolist()):
+        if not (taken_ref[ref] or taken_add[add]):
+            taken_ref[ref] = taken_add[add] = accepted[i] = True
+
+    return accepted
+
+
+def _hungarian(ref_codes: np.ndarray, add_codes: np.ndarray,
+               scores: np.ndarray) -> np.ndarray:
+    """
+    Optimal one to one assignment, solved separately for each connected
+    block of candidates (in practice, each postcode).
+    """
+    from scipy.optimize import linear_sum_assignment
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n_ref = ref_codes.max() + 1
+    graph = coo_matrix(
+        (np.ones(len(scores)), (ref_codes, add_codes + n_ref)),
+        shape=(n_ref + add_codes.max() + 1,) * 2,
+    )
+    _, labels = connected_components(graph, directed=False)
+    accepted = np.zeros(len(scores), dtype=bool)
+    blocks = pd.Series(np.arange(len(scores))).groupby(labels[ref_codes])
+    for _, rows in blocks:
+        rows = rows.values
+        block_ref, ref_pos = np.unique(ref_codes[rows], return_inverse=True)
+        block_add, add_pos = np.unique(add_codes[rows], return_inverse=True)
+        if len(rows) == 1:
+            accepted[rows] = True
+            continue
+        cost = np.zeros((len(block_ref), len(block_add)))
+        cost[ref_pos, add_pos] = -scores[rows]
+        pair_id = np.full(cost.shape, -1)
+        pair_id[ref_pos, add_pos] = rows
+        row_ind, col_ind = linear_sum_assignment(cost)
+        chosen = pair_id[row_ind, col_ind]
+        accepted[chosen[chosen >= 0]] = True
+
+    return accepted
+
+
+def resolve(
+    candidates: pd.DataFrame,
+    scores: np.ndarray,
+    ref_id: str,
+    add_id: str,
+    threshold: float = 0.5,
+    method: str = "greedy",
+    one_to_one: bool = True,
+) -> pd.DataFrame:
+    """
+
+    Choose final matches from scored candidate matches.
+
+    Parameters
+    ----------
+    candidates : pd.DataFrame
+        Candidate matches from address.candidate_matches.
+    scores : np.ndarray
+        Match score of each candidate, e.g. from score.
+    ref_id : str
+        Record ID column of the reference dataset.
+    add_id : str
+        Record ID column of the additional dataset.
+    threshold : float, optional
+        Minimum score for a match. The default is 0.5.
+    method : str, optional
+        'greedy' accepts the highest scoring pairs first,
+        'hungarian' finds the assignment with the highest total score in each
+        block of candidates. The default is "greedy".
+    one_to_one : bool, optional
+        Each record in both datasets can only be matched once. If False,
+        each reference record gets its best match but records in the additional
+        dataset can match many (e.g. a HMO licence covering several flats).
+        The default is True.
+
+    Raises
+    ------
+    ValueError
+        If an invalid method is provided.
+
+    Returns
+    -------
+    matches : pd.DataFrame
+        ref_id, add_id and score of the chosen matches.
+
+    """
+    if method not in ["greedy", "hungarian"]:
+        raise ValueError("Invalid method, use 'greedy' or 'hungarian'")
+    scores = np.asarray(scores, dtype="float32")
+    keep = scores >= threshold
+    pairs = candidates.loc[keep, [ref_id, add_id]].assign(score=scores[keep])
+    pairs = pairs.reset_index(drop=True)
+    if len(pairs) == 0:
+        return pairs
+
+    ref_codes = pd.factorize(pairs[ref_id])[0]
+    add_codes = pd.factorize(pairs[add_id])[0]
+    if not one_to_one:
+        accepted = pairs.groupby(ref_codes).score.idxmax().values
+    elif method == "greedy":
+        accepted = _greedy(ref_codes, add_codes, pairs.score.values)
+    else:
+        accepted = _hungarian(ref_codes, add_codes, pairs.score.values)
+    matches = pairs.loc[accepted, :].reset_index(drop=True)
+
+    return matches
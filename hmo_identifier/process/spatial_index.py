@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:12:37 2026
+
+@author: LiRogers
+"""
+
+from __future__ import annotations
+
+import os
+import hashlib
+import pickle
+import numpy as np
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from scipy.spatial import cKDTree
+
+
+def fingerprint(*arrays) -> str:
+    """
+
+    Fingerprint the data an index is built from, so a cached index is only
+    used with the data it was built for.
+
+    Parameters
+    ----------
+    *arrays : np.ndarray
+        Arrays (e.g. x and y coordinates) the index is built from.
+
+    Returns
+    -------
+    str
+        Hex digest of the arrays' shapes, types and contents.
+
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        digest.update(f"{arr.dtype.str}{arr.shape}".encode("utf-8"))
+        digest.update(arr.tobytes())
+
+    return digest.hexdigest()
+
+
+def _cache_file(cache_dir: str, kind: str, key: str, ext: str) -> str:
+    """
+    Path of a cached index, creating the cache directory if needed.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+
+    return os.path.join(cache_dir, f"{kind}_{key}.{ext}")
+
+
+def _cached_array(cache_dir: str, kind: str, key: str, build) -> np.ndarray:
+    """
+    Load an array from the cache (memory mapped), or build and save it.
+    """
+    if cache_dir is None:
+        return build()
+    file = _cache_file(cache_dir, kind, key, "npy")
+    if os.path.exists(file):
+        return np.load(file, mmap_mode="r")
+    arr = build()
+    with open(file + ".tmp", "wb") as f:
+        np.save(f, arr)
+    os.replace(file + ".tmp", file)
+
+    return arr
+
+
+def point_order(x: np.ndarray, cache_dir: str = None) -> np.ndarray:
+    """
+
+    Order of points sorted by x coordinate, used to find the points within
+    a bounding box with a binary search.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        x coordinates of the points.
+    cache_dir : str, optional
+        Directory to cache the order in. The default is None (no cache).
+
+    Returns
+    -------
+    np.ndarray
+        Positions of the points in x order.
+
+    """
+    x = np.asarray(x, dtype="float64")
+
+    return _cached_array(
+        cache_dir, "order", fingerprint(x),
+        lambda: np.argsort(x, kind="stable"),
+    )
+
+
+def kd_tree(x: np.ndarray, y: np.ndarray, cache_dir: str = None) -> cKDTree:
+    """
+
+    KD-tree of points for finding the points within a distance.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        x coordinates of the points.
+    y : np.ndarray
+        y coordinates of the points.
+    cache_dir : str, optional
+        Directory to cache the tree in. The default is None (no cache).
+
+    Returns
+    -------
+    cKDTree
+        Tree of the points.
+
+    """
+    from scipy.spatial import cKDTree
+
+    points = np.column_stack([np.asarray(x, dtype="float64"),
+                              np.asarray(y, dtype="float64")])
+    if cache_dir is None:
+        return cKDTree(points)
+    # cKDTree can't be memory mapped, it is pickled with its nodes so
+    # loading doesn't rebuild it
+    file = _cache_file(cache_dir, "kdtree", fingerprint(points), "pkl")
+    if os.path.exists(file):
+        with open(file, "rb") as f:
+            return pickle.load(f)
+    tree = cKDTree(points)
+    with open(file + ".tmp", "wb") as f:
+        pickle.dump(tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(file + ".tmp", file)
+
+    return tree
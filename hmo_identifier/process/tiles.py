@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 15:05:48 2026
+
+@author: LiRogers
+"""
+
+from __future__ import annotations
+
+import os
+import functools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from typing import TYPE_CHECKING, Union
+from hmo_identifier.process import merge, spatial_index
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+
+def tile_ids(x: np.ndarray, y: np.ndarray, size: float) -> np.ndarray:
+    """
+
+    Assign points to square tiles.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        x coordinates (e.g. eastings).
+    y : np.ndarray
+        y coordinates (e.g. northings).
+    size : float
+        Width of the tiles, in the units of the coordinates.
+
+    Returns
+    -------
+    np.ndarray
+        Tile id of each point, in the form "column_row".
+
+    """
+    col = np.floor(np.asarray(x) / size).astype("int64")
+    row = np.floor(np.asarray(y) / size).astype("int64")
+
+    return pd.Series(col).astype(str).str.cat(pd.Series(row).astype(str), sep="_").values
+
+
+def _run_tile(func, tile: str, ref_tile, layer_tiles: dict, out_dir: str):
+    """
+    Run func on one tile, writing the result to out_dir if given.
+    """
+    result = func(ref_tile, **layer_tiles)
+    if out_dir is None:
+        return result
+    part_path = os.path.join(out_dir, f"tile={tile}")
+    os.makedirs(part_path, exist_ok=True)
+    file = os.path.join(part_path, "part.parquet")
+    pd.DataFrame(result.drop(columns="geometry", errors="ignore")).to_parquet(
+        file + ".tmp", index=False
+    )
+    os.replace(file + ".tmp", file)
+
+    return file
+
+
+def _layer_index(layer):
+    """
+    Index a layer for _clip: a KD-tree of the coordinates of point layers,
+    otherwise the layer's own spatial index.
+    """
+    has_xy = "x_coordinate" in layer.columns and "y_coordinate" in layer.columns
+    if has_xy or (layer.geom_type == "Point").all():
+        x, y = merge.points_xy(layer)
+        # Points without coordinates are never in a tile
+        rows = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        return rows, x[rows], y[rows], spatial_index.kd_tree(x[rows], y[rows])
+
+    return layer.sindex
+
+
+def _clip(layer, index, minx: float, miny: float, maxx: float, maxy: float):
+    """
+    Features of layer within a box, found with the index from _layer_index.
+    """
+    if isinstance(index, tuple):
+        rows, x, y, tree = index
+        # Points within the square around the box (Chebyshev distance),
+        # then exactly those within the box
+        half = max(maxx - minx, maxy - miny) / 2
+        near = np.sort(
+            tree.query_ball_point(
+                [(minx + maxx) / 2, (miny + maxy) / 2], r=half * (1 + 1e-9), p=np.inf
+            )
+        ).astype("int64")
+        inside = (
+            (x[near] >= minx) & (x[near] <= maxx) & (y[near] >= miny) & (y[near] <= maxy)
+        )
+        return layer.iloc[rows[near[inside]]]
+
+    # Polygons whose bounds overlap the box, then those that intersect it,
+    # as layer.cx does
+    from shapely.geometry import box
+
+    near = np.sort(np.fromiter(index.intersection((minx, miny, maxx, maxy)), dtype="int64"))
+    candidates = layer.iloc[near]
+
+    return candidates[candidates.intersects(box(minx, miny, maxx, maxy))]
+
+
+def run_tiled(
+    func,
+    ref: Union[pd.DataFrame, gpd.GeoDataFrame],
+    layers: dict,
+    size: float = 2000,
+    halo: float = 0,
+    processes: int = None,
+    out_dir: str = None,
+):
+    """
+
+    Run a spatial processing step tile by tile, so only one tile of data is
+    processed at a time.
+
+    Reference points are split into square tiles. Each tile is processed
+    with the features of each layer that fall within the tile plus a halo
+    around it. The halo should be at least the largest distance func looks
+    around a point (e.g. the buffer of merge.by_buffer), so that results
+    for points at the edge of a tile are the same as without tiling.
+
+    Parameters
+    ----------
+    func : function
+        Called as func(ref_tile, **layer_tiles) for each tile. Must be
+        defined at module level (or a functools.partial of one) to run in
+        worker processes.
+    ref : Union[pd.DataFrame, gpd.GeoDataFrame]
+        Reference points - usually address base or gazatteer.
+        Either point geometry or x_coordinate and y_coordinate columns.
+    layers : dict
+        Datasets to pass to func by keyword, in the same CRS as ref.
+        Either geometries or x_coordinate and y_coordinate columns.
+    size : float, optional
+        Width of tiles in the units of the CRS. The default is 2000.
+    halo : float, optional
+        Margin around each tile to include layer features from.
+        The default is 0.
+    processes : int, optional
+        Number of worker processes. The default is None (run in this process).
+    out_dir : str, optional
+        Directory to write each tile's result to (as out_dir/tile=.../part.parquet,
+        without geometry). The default is None (results are returned).
+
+    Returns
+    -------
+    pd.DataFrame or list
+        The combined results, or the list of files written if out_dir given.
+
+    """
+    tiles = tile_ids(*merge.points_xy(ref), size)
+    # Each layer is indexed once, so cutting a tile only looks at the
+    # features near it
+    indexes = {name: _layer_index(layer) for name, layer in layers.items()}
+
+    def tile_jobs():
+        # Tiles are cut one at a time so only the tiles being processed
+        # are held in memory
+        for tile, ref_tile in ref.groupby(tiles):
+            minx, miny = (float(i) * size for i in tile.split("_"))
+            layer_tiles = {
+                name: _clip(layer, indexes[name], minx - halo, miny - halo,
+                            minx + size + halo, miny + size + halo)
+                for name, layer in layers.items()
+            }
+            yield (tile, ref_tile, layer_tiles)
+
+    if processes is None:
+        results = [
+            _run_tile(func, tile, ref_tile, layer_tiles, out_dir)
+            for (tile, ref_tile, layer_tiles) in tile_jobs()
+        ]
+    else:
+        results = []
+        with ProcessPoolExecutor(processes) as pool:
+            running = []
+            for (tile, ref_tile, layer_tiles) in tile_jobs():
+                if len(running) >= 2 * processes:
+                    results.append(running.pop(0).result())
+                running.append(
+                    pool.submit(_run_tile, func, tile, ref_tile, layer_tiles, out_dir)
+                )
+            results += [future.result() for future in running]
+
+    if out_dir is not None:
+        return results
+
+    return pd.concat(results, sort=False)
+
+
+def sjoin_tiled(
+    ref: Union[pd.DataFrame, gpd.GeoDataFrame],
+    geog: gpd.GeoDataFrame,
+    size: float = 2000,
+    processes: int = None,
+    out_dir: str = None,
+):
+    """
+
+    Add reference geographies (e.g. output areas or wards) to points
+    tile by tile.
+
+    Parameters
+    ----------
+    ref : Union[pd.DataFrame, gpd.GeoDataFrame]
+        Reference points - usually address base or gazatteer.
+    geog : gpd.GeoDataFrame
+        Geography polygons in the same CRS as ref.
+    size : float, optional
+        Width of tiles in the units of the CRS. The default is 2000.
+    processes : int, optional
+        Number of worker processes. The default is None (run in this process).
+    out_dir : str, optional
+        Directory to write tile results to. The default is None.
+
+    Returns
+    -------
+    pd.DataFrame or list
+        ref with geog columns added, or the files written if out_dir given.
+
+    """
+    # Polygons overlapping a tile are always included, so no halo is needed
+    return run_tiled(
+        merge.by_geography, ref, {"geog": geog}, size=size, halo=0,
+        processes=processes, out_dir=out_dir,
+    )
+
+
+def by_buffer_tiled(
+    ref: Union[pd.DataFrame, gpd.GeoDataFrame],
+    add: Union[pd.DataFrame, gpd.GeoDataFrame],
+    name: str,
+    buffer: float,
+    sum_cols: list = ["median", "mean", "max", "min", "sum"],
+    size: float = 2000,
+    processes: int = None,
+    out_dir: str = None,
+):
+    """
+
+    merge.by_buffer tile by tile, with a halo of the buffer size so results
+    are the same as merging the whole dataset at once.
+
+    Parameters
+    ----------
+    ref : Union[pd.DataFrame, gpd.GeoDataFrame]
+        Reference spatial dataset - usually address base or gazatteer.
+    add : Union[pd.DataFrame, gpd.GeoDataFrame]
+        New spatial dataset to add.
+    name : str
+        Name to append to add columns.
+    buffer : float
+        Buffer around points in reference to summarise add in.
+    sum_cols : list, optional
+        What summary variables to produce.
+        The default is ['median', 'mean', 'max', 'min', 'sum'].
+    size : float, optional
+        Width of tiles in the units of the CRS. The default is 2000.
+    processes : int, optional
+        Number of worker processes. The default is None (run in this process).
+    out_dir : str, optional
+        Directory to write tile results to. The default is None.
+
+    Returns
+    -------
+    pd.DataFrame or list
+        ref with a summary of add left joined, or the files written if
+        out_dir given.
+
+    """
+    func = functools.partial(
+        merge.by_buffer, name=name, buffer=buffer, sum_cols=sum_cols
+    )
+
+    return run_tiled(
+        func, ref, {"add": add}, size=size, halo=buffer,
+        processes=processes, out_dir=out_dir,
+    )
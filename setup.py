@@ -8,6 +8,23 @@ setup(
     description='Identify Houses of Multiple Occupation',
     author='Libby Rogers',
     license='MIT',
+    install_requires=[
+        'pandas',
+        'requests',
+        'python-dotenv',
+        'openpyxl',
+    ],
+    # Heavy dependencies are only imported by the functions that use them,
+    # e.g. pip install -e .[geo,match]
+    extras_require={
+        'geo': ['geopandas', 'shapely', 'scipy', 'pyarrow'],
+        'db': ['psycopg2'],
+        'scrape': ['beautifulsoup4', 'python-dateutil'],
+        'match': ['recordlinkage', 'scikit-learn'],
+    },
+    entry_points={
+        'console_scripts': ['hmo_identifier=hmo_identifier.cli:main'],
+    },
 )
 
 load_dotenv()
\ No newline at end of file
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:20:48 2026
+Shared fixtures: local HTTP servers standing in for the data APIs.
+@author: LiRogers
+"""
+
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from hmo_identifier.data import transport
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Request handler that answers with send and doesn't log.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status: int, body: bytes = b"", headers: dict = None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Server(ThreadingHTTPServer):
+    """
+    Server that ignores clients closing the connection early, as
+    transport does when it stops reading a response.
+    """
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+@pytest.fixture
+def serve():
+    """
+    Start a local server with a Handler subclass, returning its base URL.
+    Servers and transport's sessions are closed after the test.
+    """
+    servers = []
+
+    def start(handler) -> str:
+        server = Server(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    transport.close()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
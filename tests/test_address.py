@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 10:05:41 2026
+Cleaning, parsing and matching addresses.
+@author: LiRogers
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from benchmarks import synthetic
+from hmo_identifier.process import address
+
+
+def _clean_estate_name_by_row(name) -> str:
+    """
+    The regex chain clean_estate_name used before, one name at a time,
+    with its patterns lower case to match the lower-cased names.
+    """
+    if not isinstance(name, str):
+        return ""
+    common_words = [
+        "estate", "road", "street", "crescent", "close", "place", "st", "rd",
+        "unknown", "lane", "way", "est", "end", "apartments", "square",
+    ]
+    for pattern, repl in [
+        (r"\.|,|\(|\)|'", ""),
+        (" ?- ?", "-"),
+        (r"\b" + r"\b|\b".join(common_words) + r"\b", ""),
+        (" and |&", " "),
+        ("[0-9]+-[0-9]+", ""),
+        ("[a-z]-[a-z]", ""),
+        (r"\(|\)|\-", ""),
+        (" [a-z] | [a-z]$", " "),
+        ("odd|flats|cons", ""),
+        ("[0-9]+", ""),
+        ("[ /]+", " "),
+    ]:
+        name = re.sub(pattern, repl, name.lower())
+
+    return name.strip()
+
+
+ESTATES = synthetic._ESTATES + [
+    "Church Lane/Mansion Apartments",
+    "Flats A-F Kings Cross Est.",
+    "Odd Numbers 1 - 9, Primrose Hill",
+    "West End Green (Cons)",
+    "Holly Lodge and Highgate Road",
+    "Chalcot Square 10-12 Flats",
+    "Goldington Crescent, Pancras Way",
+    "Ferdinand Place & Harmood Street",
+    "Agar Close / Regent's Park Rd",
+    "Unknown",
+    None,
+]
+
+
+def test_clean_estate_name_matches_by_row():
+    names = pd.Series(
+        ESTATES
+        + [n.upper() for n in ESTATES if n]
+        + [n.lower() for n in ESTATES if n],
+        index=range(100, 100 + 3 * len(ESTATES) - 2),
+    )
+    expected = names.map(_clean_estate_name_by_row)
+    pd.testing.assert_series_equal(address.clean_estate_name(names), expected)
+    pd.testing.assert_series_equal(address.clean_estate_name(names, processes=2), expected)
+
+
+def test_clean_estate_name_whole_words():
+    names = pd.Series(["Bacon's College", "Rose & Crown Flats Q-4", "St. John's Wood (1-20)"])
+    # The row by row chain removed "cons" from within words, and left
+    # single letters behind once numbers were removed
+    assert address.clean_estate_name(names).tolist() == [
+        "bacons college", "rose crown", "johns wood",
+    ]
+
+
+def test_parse_ao():
+    ao = pd.Series(
+        ["12A", "10-14", "10A - 10C", "Flat 3", "FLAT B", "Rose Court", "Rose Court 5", None],
+        index=list("abcdefgh"),
+    )
+    df = address.parse_ao(ao)
+    assert df.index.tolist() == list("abcdefgh")
+    assert df.start_number.tolist() == [12, 10, 10, 3, -1, -1, 5, -1]
+    assert df.start_suffix.tolist() == ["A", "", "A", "", "", "", "", ""]
+    assert df.end_number.tolist() == [-1, 14, 10, -1, -1, -1, -1, -1]
+    assert df.end_suffix.tolist() == ["", "", "C", "", "", "", "", ""]
+    assert df.text.tolist() == ["", "", "", "", "B", "ROSE COURT", "ROSE COURT", ""]
+
+
+def _ao(start=None, end=None, text=None, suffix=None) -> dict:
+    return {
+        "start_number": start, "start_suffix": suffix, "end_number": end,
+        "end_suffix": None, "text": text,
+    }
+
+
+def _gazatteer(rows: list) -> pd.DataFrame:
+    """
+    Gazatteer addresses from (uprn, postcode, pao, sao) tuples.
+    """
+    return pd.DataFrame(
+        [
+            {
+                "uprn": uprn,
+                "postcode_locator": postcode,
+                "street_description": "HIGH STREET",
+                **{f"pao_{k}": v for k, v in pao.items()},
+                **{f"sao_{k}": v for k, v in sao.items()},
+            }
+            for (uprn, postcode, pao, sao) in rows
+        ]
+    )
+
+
+def test_structured_matches():
+    ref = _gazatteer(
+        [
+            (1, "NW1 1AA", _ao(10), _ao(1)),
+            (2, "NW1 1AA", _ao(10), _ao(2)),
+            (3, "NW1 1AA", _ao(10), _ao(text="FLAT B")),
+            (4, "NW1 1AA", _ao(20, 30), _ao()),
+            (5, "NW1 2BB", _ao(10), _ao(1)),
+            (6, "NW1 1AA", _ao(12, suffix="A"), _ao()),
+            (7, "NW1 1AA", _ao(text="ROSE COURT"), _ao(4)),
+        ]
+    )
+    add = pd.DataFrame(
+        {
+            "id": list("abcdefghi"),
+            "paon": ["10", "10", "24", "10", "24", "10", "12a", "Rose Court", "22-24"],
+            "saon": ["FLAT 1", "Flat B", None, "Flat 1", None, "Flat 9", None, "Flat 4", None],
+            "street": ["High Street", None, "HIGH STREET", "High St.", "High Street",
+                       "High Street", "High Street", "High Street", "High Street"],
+            "postcode": ["NW1 1AA", "nw11aa", "NW1 1AA", "NW1 2BB", "NW1 2BB",
+                         "NW1 1AA", "NW1 1AA", "NW1 1AA", "NW1 1AA"],
+        }
+    )
+    matched = address.structured_matches(ref, "uprn", add, "id")
+    matches = matched["matches"].set_index("id")
+    assert matches.uprn.to_dict() == {
+        "a": 1, "b": 3, "c": 4, "g": 6, "h": 7, "i": 4,
+    }
+    assert matches.method.to_dict() == {
+        "a": "exact", "b": "exact", "c": "range", "g": "exact", "h": "exact",
+        "i": "range",
+    }
+    # d has a different street from the gazatteer's, e is only in range of
+    # a gazatteer address in another postcode, and f has no flat 9
+    assert matched["unmatched"].id.tolist() == ["d", "e", "f"]
+
+
+def test_structured_matches_within_postcode():
+    # The same address in two postcodes matches the one in its own
+    ref = _gazatteer(
+        [
+            (1, "NW1 1AA", _ao(10), _ao()),
+            (2, "NW1 2BB", _ao(10), _ao()),
+            (3, "NW1 3CC", _ao(2, 20), _ao()),
+        ]
+    )
+    add = pd.DataFrame(
+        {
+            "id": ["a", "b", "c", "d"],
+            "paon": ["10", "10", "10", "5"],
+            "saon": None,
+            "street": None,
+            "postcode": ["NW1 2BB", "NW1 1AA", "NW1 3CC", "NW1 1AA"],
+        }
+    )
+    matched = address.structured_matches(ref, "uprn", add, "id")
+    assert matched["matches"].set_index("id").uprn.to_dict() == {"a": 2, "b": 1, "c": 3}
+    assert matched["unmatched"].id.tolist() == ["d"]
+
+
+def test_structured_matches_ambiguous():
+    # Two gazatteer addresses with the same keys are left for the residual
+    ref = _gazatteer(
+        [
+            (1, "NW1 1AA", _ao(10), _ao()),
+            (2, "NW1 1AA", _ao(10), _ao()),
+            (3, "NW1 1AA", _ao(1, 9), _ao()),
+            (4, "NW1 1AA", _ao(5, 15), _ao()),
+        ]
+    )
+    add = pd.DataFrame(
+        {"id": ["a", "b"], "paon": ["10", "7"], "saon": None, "street": None,
+         "postcode": "NW1 1AA"}
+    )
+    matched = address.structured_matches(ref, "uprn", add, "id")
+    assert len(matched["matches"]) == 0
+    assert matched["unmatched"].id.tolist() == ["a", "b"]
+
+
+def test_parse_postcode_normalises():
+    postcodes = pd.Series(
+        ["NW1 2DB", "nw1 2db", "NW12DB", " n.w.1  2-d b ", "NW1 O0B", "0X4 4DQ",
+         "SO14 0AA", "EC1A 1BB", "W1A 0AX"],
+        index=range(10, 19),
+    )
+    df = address.parse_postcode(postcodes)
+    assert df.index.tolist() == list(range(10, 19))
+    assert df.postcode.tolist() == [
+        "NW1 2DB", "NW1 2DB", "NW1 2DB", "NW1 2DB", "NW1 0OB", "OX4 4DQ",
+        "SO14 0AA", "EC1A 1BB", "W1A 0AX",
+    ]
+    assert df.key.iloc[:4].nunique() == 1
+    # Keys nest, so postcodes in a sector share key // 676
+    same_sector = address.parse_postcode(pd.Series(["NW1 2DB", "NW1 2AA", "NW1 3AA"]))
+    assert (same_sector.key // 676).tolist()[:2] == [same_sector.key.iloc[0] // 676] * 2
+    assert same_sector.key.iloc[2] // 676 != same_sector.key.iloc[0] // 676
+
+
+def test_parse_postcode_invalid():
+    postcodes = pd.Series(["W1 1A", "XX 1AA", "12345", "NW1 2DBX", "", None])
+    df = address.parse_postcode(postcodes)
+    assert df.postcode.isna().all()
+    assert (df.key == -1).all()
+
+
+def test_validate_postcodes(tmp_path):
+    index = address.postcode_index(
+        pd.Series(["NW1 2DB", "NW1 2DD", "NW1 2DB", "NW1 3AA", "not a postcode"])
+    )
+    assert len(index) == 3 and (index == np.sort(index)).all()
+    file = str(tmp_path / "postcodes.npy")
+    address.save_postcode_index(index, file)
+    index = address.load_postcode_index(file)
+
+    keys = address.parse_postcode(
+        pd.Series(["nw12db", "NW1 2DC", "NW1 2ZZ", "NW1 4AA", "NW1 1AA", "bad"])
+    ).key.values
+    df = address.validate_postcodes(keys, index)
+    assert df.valid.tolist() == [True, False, False, False, False, False]
+    assert df.sector_valid.tolist() == [True, True, True, False, False, False]
+    nearest = address.parse_postcode(pd.Series(["NW1 2DB", "NW1 2DD"])).key.tolist()
+    assert df.nearest.tolist() == [nearest[0], nearest[0], nearest[1], -1, -1, -1]
+
+    empty = address.validate_postcodes(keys, np.array([], dtype="int64"))
+    assert not empty.valid.any() and (empty.nearest == -1).all()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 23:02:16 2026
+Writing fetched files into the data directory.
+@author: LiRogers
+"""
+
+import os
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+from hmo_identifier import cli
+
+
+def _wards(names):
+    return gpd.GeoDataFrame(
+        {"name": names},
+        geometry=[Point(i, i) for i in range(len(names))],
+        crs="EPSG:27700",
+    )
+
+
+def test_write_atomic(tmp_path):
+    data_dir = str(tmp_path)
+    files = {
+        "open/airbnb.csv": pd.DataFrame({"id": [1, 2]}),
+        "reference/wards/wards.shp": _wards(["a", "b"]),
+    }
+    paths = cli.write_atomic(files, data_dir, workers=2)
+    assert os.path.join(data_dir, "open", "airbnb.csv") in paths
+    assert os.path.join(data_dir, "reference", "wards", "wards.dbf") in paths
+
+    cli.write_atomic({"reference/wards/wards.shp": _wards(["c"])}, data_dir)
+    wards = gpd.read_file(os.path.join(data_dir, "reference", "wards", "wards.shp"))
+    assert wards.name.tolist() == ["c"]
+    assert os.listdir(os.path.join(data_dir, "reference")) == ["wards"]
+
+
+def test_write_atomic_failure_keeps_shapefile(tmp_path):
+    data_dir = str(tmp_path)
+    cli.write_atomic({"reference/wards/wards.shp": _wards(["a", "b"])}, data_dir)
+    before = sorted(os.listdir(os.path.join(data_dir, "reference", "wards")))
+
+    class Broken(gpd.GeoDataFrame):
+        def to_file(self, path, **kwargs):
+            # Part of the shapefile is written before the failure
+            open(path[:-4] + ".dbf", "w").close()
+            raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        cli.write_atomic({"reference/wards/wards.shp": Broken(_wards(["c"]))}, data_dir)
+    assert sorted(os.listdir(os.path.join(data_dir, "reference", "wards"))) == before
+    assert os.listdir(os.path.join(data_dir, "reference")) == ["wards"]
+    wards = gpd.read_file(os.path.join(data_dir, "reference", "wards", "wards.shp"))
+    assert wards.name.tolist() == ["a", "b"]
+
+
+def test_write_atomic_interrupted_swap(tmp_path, monkeypatch):
+    data_dir = str(tmp_path)
+    cli.write_atomic({"reference/wards/wards.shp": _wards(["a", "b"])}, data_dir)
+    replace = os.replace
+    calls = []
+
+    def interrupted(src, dst):
+        calls.append(src)
+        if len(calls) == 2:
+            raise OSError("interrupted")
+        replace(src, dst)
+
+    monkeypatch.setattr(cli.os, "replace", interrupted)
+    with pytest.raises(OSError):
+        cli.write_atomic({"reference/wards/wards.shp": _wards(["c"])}, data_dir)
+    monkeypatch.setattr(cli.os, "replace", replace)
+    # Not a mix of old and new parts
+    wards = gpd.read_file(os.path.join(data_dir, "reference", "wards", "wards.shp"))
+    assert wards.name.tolist() == ["a", "b"]
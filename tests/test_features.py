@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 22:14:37 2026
+features.generate gives the same features as notebook 03.
+@author: LiRogers
+"""
+
+import pandas as pd
+from benchmarks import synthetic
+from benchmarks.bench_features import notebook_features
+from hmo_identifier.process import features
+
+
+def test_generate_matches_notebook():
+    df = synthetic.combined(5000)
+    expected = notebook_features(df)
+    result = features.generate(df)
+    assert list(result.columns) == list(expected.columns)
+    for col in expected.columns:
+        pd.testing.assert_series_equal(
+            result[col].astype(object), expected[col].astype(object), check_names=False
+        )
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 23:18:43 2026
+Reading the IMD workbook with python-calamine and openpyxl.
+@author: LiRogers
+"""
+
+import sys
+import openpyxl
+import pytest
+from hmo_identifier.data import open
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    file = str(tmp_path / "imd.xlsx")
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("IMD2019")
+    ws.append([
+        "LSOA code (2011)",
+        "Local Authority District code (2019)",
+        "Index of Multiple Deprivation (IMD) Rank",
+        "Index of Multiple Deprivation (IMD) Decile",
+    ])
+    for i in range(100):
+        ws.append([f"E0{i:07d}", "E09000007" if i % 4 == 0 else "E08000001", i, i % 10 + 1])
+    wb.save(file)
+
+    return file
+
+
+@pytest.mark.parametrize("calamine", [True, False])
+def test_read_imd(workbook, calamine, monkeypatch):
+    if calamine:
+        pytest.importorskip("python_calamine")
+    else:
+        monkeypatch.setitem(sys.modules, "python_calamine", None)
+    df = open.read_imd(workbook)
+    assert list(df.columns) == ["lsoacd", "ladcd", "imd_rank", "imd_decile"]
+    assert len(df) == 25 and (df.ladcd == "E09000007").all()
+    assert df.imd_rank.tolist() == list(range(0, 100, 4))
+    assert str(df.imd_decile.dtype) == "int64"
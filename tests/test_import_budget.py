@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:05:12 2026
+Modules import within their budget and without heavy dependencies.
+@author: LiRogers
+"""
+
+import pytest
+from benchmarks import bench_import
+
+
+@pytest.mark.parametrize("module", list(bench_import.BUDGET))
+def test_import_budget(module):
+    assert bench_import.over_budget(module) == []
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 22:47:55 2026
+Memory reported by the instrumentation.
+@author: LiRogers
+"""
+
+import json
+import threading
+import numpy as np
+from benchmarks import synthetic
+from hmo_identifier import instrument
+from hmo_identifier.data import transport, utils
+from hmo_identifier.process import features
+from conftest import Handler
+
+
+def test_rss_is_peak():
+    block = np.ones(64 * 2 ** 20 // 8)
+    during = instrument._rss()
+    del block
+    # Freed memory doesn't lower the peak
+    assert instrument._rss() >= during
+
+
+def test_instrumented_wraps_and_restores():
+    flat, concat = features.flat, utils.concat_categorical
+    with instrument.instrumented(trace_memory=False):
+        assert features.flat.__instrumented__ is flat
+        assert utils.concat_categorical.__instrumented__ is concat
+    assert features.flat is flat
+    assert utils.concat_categorical is concat
+
+
+def test_nested_stages(tmp_path):
+    df = synthetic.combined(1000)
+    with instrument.instrumented(["hmo_identifier.process"]) as run_id:
+        features.flat(df)
+    df = instrument.records(run_id).set_index("stage")
+    outer = "hmo_identifier.process.features.flat"
+    inner = "hmo_identifier.process.features.building_type"
+    assert df.loc[outer, "depth"] == 0 and df.loc[outer, "parent"] is None
+    assert df.loc[inner, "depth"] == 1 and df.loc[inner, "parent"] == outer
+    assert df.loc[outer, "rows_in"] == 1000 and df.loc[outer, "rows_out"] == 1000
+    assert df.loc[outer, "peak_traced_bytes"] >= df.loc[inner, "peak_traced_bytes"] > 0
+    assert df.loc[outer, "process_peak_rss_bytes"] > 0
+
+    summary = instrument.summary(run_id)
+    assert summary.loc[outer, "calls"] == 1
+    assert summary.loc[inner, "wall_seconds"] <= summary.loc[outer, "wall_seconds"]
+    assert 'stage="hmo_identifier.process.features.flat"' in instrument.to_openmetrics(run_id)
+    instrument.to_json(str(tmp_path / "instrument.jsonl"), run_id)
+    with open(tmp_path / "instrument.jsonl") as f:
+        assert len([json.loads(line) for line in f]) == 2
+
+
+def test_threads_have_their_own_stages(serve):
+    # Both requests are in flight at once before either is answered
+    barrier = threading.Barrier(2)
+    sizes = {"/small": 1000, "/large": 50000}
+
+    class Server(Handler):
+        def do_GET(self):
+            barrier.wait(timeout=5)
+            self.send(200, b"x" * sizes[self.path])
+
+    url = serve(Server)
+    with instrument.instrumented(["hmo_identifier.data"], trace_memory=False) as run_id:
+        threads = [
+            threading.Thread(target=transport.get, args=(url + path,))
+            for path in sizes
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    df = instrument.records(run_id)
+    gets = df.loc[df.stage == "hmo_identifier.data.transport.get", :]
+    assert len(gets) == 2
+    assert gets.parent.isna().all() and (gets.depth == 0).all()
+    assert sorted(gets.bytes_downloaded) == sorted(sizes.values())
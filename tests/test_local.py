@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:26:03 2026
+Socrata fetching and syncing against a mock SODA endpoint.
+@author: LiRogers
+"""
+
+import json
+import re
+import urllib.parse
+import pandas as pd
+import pytest
+from hmo_identifier.data import local
+from conftest import Handler
+
+
+def _rows(n: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            ":id": [f"row-{i:05d}" for i in range(n)],
+            ":updated_at": ["2020-01-01T00:00:00.000"] * n,
+            "licence_number": [f"L{i}" for i in range(n)],
+            "ward": ["Camden Town" if i % 3 == 0 else "Kilburn" for i in range(n)],
+            "number_of_occupants": [str(i % 9) for i in range(n)],
+        }
+    )
+
+
+def _where(df: pd.DataFrame, where: str) -> pd.DataFrame:
+    """
+    The rows of df matching a $where of "col = 'x'" and "col >= 'x'"
+    conditions joined with AND.
+    """
+    for col, op, value in re.findall(r"([:\w]+) (>=|=) '([^']*)'", where or ""):
+        df = df.loc[df[col] >= value if op == ">=" else df[col] == value, :]
+
+    return df
+
+
+@pytest.fixture
+def soda(serve, monkeypatch):
+    """
+    Mock SODA endpoint serving state["rows"] as every dataset.
+    Every request's query is logged in state["queries"].
+    """
+    state = {"rows": _rows(2345), "queries": []}
+
+    class Soda(Handler):
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            query = dict(urllib.parse.parse_qsl(url.query))
+            state["queries"].append(query)
+            df = _where(state["rows"], query.get("$where"))
+            if query["$select"] == "count(*) AS n":
+                self.send(200, json.dumps([{"n": str(len(df))}]).encode())
+                return
+            select = query["$select"].split(",")
+            if "*" in select:
+                select = [c for c in select if c != "*"] + [
+                    c for c in df.columns if not c.startswith(":")
+                ]
+            offset, limit = int(query["$offset"]), int(query["$limit"])
+            page = df.sort_values(query["$order"]).iloc[offset:offset + limit]
+            self.send(200, page[select].to_csv(index=False).encode())
+
+    monkeypatch.setattr(local, "SODA_URL", serve(Soda) + "/resource")
+
+    return state
+
+
+def test_soda_count(soda):
+    assert local.soda_count("test-data") == 2345
+    assert local.soda_count("test-data", where="ward = 'Camden Town'") == 782
+
+
+def test_soda_pages(soda):
+    df = local.soda("test-data", page_size=500)
+    pages = [q for q in soda["queries"] if "$offset" in q]
+    assert sorted(int(q["$offset"]) for q in pages) == [0, 500, 1000, 1500, 2000]
+    assert len(df) == 2345
+    assert list(df.soda_id) == list(soda["rows"][":id"])
+
+
+def test_soda_select_where(soda):
+    df = local.soda(
+        "test-data", select=["licence_number", "ward"], where="ward = 'Camden Town'"
+    )
+    assert list(df.columns) == ["soda_id", "soda_updated_at", "licence_number", "ward"]
+    assert len(df) == 782
+    assert (df.ward == "Camden Town").all()
+
+
+def test_soda_sync_upserts_changed_rows(soda, tmp_path):
+    first = local.soda_sync("test-data", str(tmp_path))
+    assert len(first) == 2345
+
+    rows = soda["rows"]
+    rows.loc[[5, 10], ["number_of_occupants", ":updated_at"]] = [
+        "99", "2020-02-01T10:00:00.000"
+    ]
+    new = pd.DataFrame(
+        {
+            ":id": ["row-99999"],
+            ":updated_at": ["2020-02-02T00:00:00.000"],
+            "licence_number": ["LNEW"],
+            "ward": ["Kilburn"],
+            "number_of_occupants": ["3"],
+        }
+    )
+    soda["rows"] = pd.concat([rows, new], ignore_index=True)
+    soda["queries"].clear()
+
+    synced = local.soda_sync("test-data", str(tmp_path))
+    # Only rows updated since the last sync are fetched
+    where = soda["queries"][0]["$where"]
+    assert where == ":updated_at >= '2020-01-01T00:00:00.000'"
+    assert len(synced) == 2346
+    assert synced.soda_id.is_unique
+    occupants = synced.set_index("soda_id").number_of_occupants
+    assert occupants[["row-00005", "row-00010", "row-99999"]].tolist() == ["99", "99", "3"]
+
+    soda["queries"].clear()
+    local.soda_sync("test-data", str(tmp_path))
+    assert soda["queries"][0]["$where"] == ":updated_at >= '2020-02-02T00:00:00.000'"
+
+
+def test_soda_sync_keeps_where(soda, tmp_path):
+    local.soda_sync("test-data", str(tmp_path), where="ward = 'Camden Town'")
+    soda["queries"].clear()
+    synced = local.soda_sync("test-data", str(tmp_path), where="ward = 'Camden Town'")
+    assert soda["queries"][0]["$where"].startswith("(ward = 'Camden Town') AND ")
+    assert len(synced) == 782
+
+
+def test_hmo_register_types_columns(soda):
+    df = local.hmo_register(select=["licence_number", "number_of_occupants"])
+    assert df.number_of_occupants.dtype.kind == "i"
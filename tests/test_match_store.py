@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 22:31:08 2026
+Looking up and recording matches in the match store.
+@author: LiRogers
+"""
+
+import sqlite3
+import pytest
+import pandas as pd
+from hmo_identifier.process import match_store
+
+
+def test_lookup(tmp_path):
+    file = str(tmp_path / "matches.db")
+    con = match_store.open_store(file)
+    match_store.record(
+        con,
+        pd.DataFrame(
+            {
+                "clean_address": ["1 a street", "2 b street"],
+                "postcode": ["E1 1AA", "E2 2BB"],
+                "uprn": [1, None],
+                "score": [1.0, None],
+                "method": ["exact", None],
+            }
+        ),
+    )
+    found = match_store.lookup(
+        con,
+        pd.DataFrame(
+            {
+                "clean_address": ["1 a street", "2 b street", "3 c street", "1 a street"],
+                "postcode": ["E1 1AA", "E2 2BB", "E3 3CC", "E1 1AA"],
+            }
+        ),
+    )
+    con.close()
+    assert found.in_store.tolist() == [True, True, False, True]
+    assert found.uprn.tolist()[0] == 1 and found.uprn.tolist()[3] == 1
+    assert found.uprn.isna().tolist() == [False, True, True, False]
+    # Keys are looked up through a temporary table, never the store itself
+    tables = sqlite3.connect(file).execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    ).fetchall()
+    assert tables == [("matches",)]
+
+
+def test_lookup_error_leaves_store(tmp_path, monkeypatch):
+    file = str(tmp_path / "matches.db")
+    con = match_store.open_store(file)
+
+    def fail(*args, **kwargs):
+        raise sqlite3.OperationalError("interrupted")
+
+    monkeypatch.setattr(pd, "read_sql", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        match_store.lookup(
+            con, pd.DataFrame({"clean_address": ["1 a street"], "postcode": ["E1 1AA"]})
+        )
+    con.close()
+    tables = sqlite3.connect(file).execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    ).fetchall()
+    assert tables == [("matches",)]
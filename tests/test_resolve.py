@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:12:27 2026
+Scoring and resolving candidate matches.
+@author: LiRogers
+"""
+
+import numpy as np
+import pandas as pd
+from hmo_identifier.process import resolve
+
+
+def _candidates(n, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = rng.random(n) < 0.3
+    candidates = pd.DataFrame(
+        {
+            f"{name}_match": np.clip(rng.normal(0.4 + 0.4 * labels, 0.15), 0, 1)
+            for name in ["address", "number", "street"]
+        }
+    )
+    candidates.loc[::5, "number_match"] = np.nan
+
+    return candidates, labels
+
+
+def test_score_batches():
+    candidates, labels = _candidates(10000)
+    model = resolve.train(candidates, labels)
+    before = candidates.copy()
+    scores = resolve.score(model, candidates, batch_size=999)
+    expected = model.predict_proba(candidates.fillna(0).values)[:, 1]
+    np.testing.assert_allclose(scores, expected, atol=1e-6)
+    pd.testing.assert_frame_equal(candidates, before)
+
+
+def _block(size, seed=0):
+    """
+    Every pair of size ref and add records in one block, with distinct
+    scores that are high for the true pairs.
+    """
+    rng = np.random.default_rng(seed)
+    true_add = rng.permutation(size)
+    ref_codes = np.repeat(np.arange(size), size)
+    add_codes = np.tile(np.arange(size), size)
+    scores = rng.uniform(0, 0.4, size * size)
+    true = add_codes == true_add[ref_codes]
+    scores[true] = rng.uniform(0.6, 1, size)
+    assert len(np.unique(scores)) == len(scores)
+
+    return ref_codes, add_codes, scores
+
+
+def test_greedy_agrees_with_hungarian():
+    ref_codes, add_codes, scores = _block(12)
+    greedy = resolve._greedy(ref_codes, add_codes, scores)
+    np.testing.assert_array_equal(greedy, resolve._hungarian(ref_codes, add_codes, scores))
+    assert greedy.sum() == 12
+
+
+def test_greedy_takes_highest_first():
+    # ref 0 prefers add 0, which goes to ref 1 with a higher score
+    ref_codes = np.array([0, 0, 1])
+    add_codes = np.array([0, 1, 0])
+    scores = np.array([0.8, 0.6, 0.9])
+    assert resolve._greedy(ref_codes, add_codes, scores).tolist() == [False, True, True]
+
+
+def test_resolve_one_to_one():
+    candidates = pd.DataFrame(
+        {"uprn": [1, 1, 2, 2, 3], "brn": ["a", "b", "a", "b", "c"]}
+    )
+    scores = np.array([0.9, 0.7, 0.8, 0.95, 0.4])
+    for method in ["greedy", "hungarian"]:
+        matches = resolve.resolve(candidates, scores, "uprn", "brn", method=method)
+        assert matches[["uprn", "brn"]].values.tolist() == [[1, "a"], [2, "b"]]
+    many = resolve.resolve(candidates, scores, "uprn", "brn", one_to_one=False)
+    assert many[["uprn", "brn"]].values.tolist() == [[1, "a"], [2, "b"]]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 11:32:09 2026
+Tiled spatial merges give the same results as merging all at once.
+@author: LiRogers
+"""
+
+import glob
+import os
+import pandas as pd
+import pytest
+from benchmarks import synthetic
+from hmo_identifier.process import merge, tiles
+
+
+@pytest.fixture(scope="module")
+def gaz():
+    return synthetic.gazatteer(5000)
+
+
+def _same(tiled: pd.DataFrame, untiled: pd.DataFrame):
+    assert len(tiled) == len(untiled)
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(tiled).set_index("uprn").sort_index()[untiled.columns.drop("uprn")],
+        pd.DataFrame(untiled).set_index("uprn").sort_index(),
+        check_dtype=False,
+    )
+
+
+@pytest.mark.parametrize("processes", [None, 2])
+def test_by_buffer_tiled(gaz, processes):
+    crime = synthetic.crime(2000)
+    untiled = merge.by_buffer(gaz, crime, "crime", 200, sum_cols=["sum", "median"])
+    tiled = tiles.by_buffer_tiled(
+        gaz, crime, "crime", 200, sum_cols=["sum", "median"], size=1000,
+        processes=processes,
+    )
+    _same(tiled, untiled)
+
+
+@pytest.mark.parametrize("processes", [None, 2])
+def test_sjoin_tiled(gaz, processes):
+    oas = synthetic.output_areas(gaz, size=300)
+    untiled = merge.by_geography(gaz, oas)
+    tiled = tiles.sjoin_tiled(gaz, oas, size=1000, processes=processes)
+    _same(tiled, untiled)
+
+
+def test_tiled_out_dir(gaz, tmp_path):
+    airbnb = synthetic.airbnb(500)
+    untiled = merge.by_buffer(gaz, airbnb, "abnb", 100, sum_cols=["median"])
+    files = tiles.by_buffer_tiled(
+        gaz, airbnb, "abnb", 100, sum_cols=["median"], size=1500,
+        out_dir=str(tmp_path),
+    )
+    assert sorted(files) == sorted(glob.glob(os.path.join(tmp_path, "tile=*", "part.parquet")))
+    tiled = pd.concat([pd.read_parquet(f) for f in files])
+    _same(tiled, untiled.drop(columns="geometry", errors="ignore"))
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 21:41:37 2026
+Retries, rate limits and streaming of the shared transport.
+@author: LiRogers
+"""
+
+import gzip
+import time
+import urllib.parse
+import pytest
+from hmo_identifier.data import transport
+from conftest import Handler
+
+CSV = "a,b\n" + "".join(f"{i},{i * 2}\n" for i in range(20000))
+# Larger than pandas reads at once, so reading can stop part way through
+BIG_CSV = "a,b\n" + "".join(f"{i},{i * 2}\n" for i in range(500000))
+
+
+@pytest.fixture
+def server(serve):
+    """
+    Server with endpoints for each behaviour. Requests to each path are
+    counted in hits, with their times in times.
+    """
+    state = {"hits": {}, "times": {}}
+
+    class Server(Handler):
+        def do_GET(self):
+            path = urllib.parse.urlsplit(self.path).path
+            hits = state["hits"][path] = state["hits"].get(path, 0) + 1
+            state["times"].setdefault(path, []).append(time.monotonic())
+            if path == "/flaky":
+                # Fails twice, then succeeds
+                self.send(500 if hits < 3 else 200, b"ok")
+            elif path == "/busy":
+                self.send(503, b"busy")
+            elif path == "/slow-down":
+                if hits == 1:
+                    self.send(429, headers={"Retry-After": "1"})
+                else:
+                    self.send(200, b"ok")
+            elif path == "/go-away":
+                if hits == 1:
+                    self.send(429, headers={"Retry-After": "3600"})
+                else:
+                    self.send(200, b"ok")
+            elif path == "/gone":
+                self.send(404, BIG_CSV.encode())
+            elif path == "/big":
+                self.send(200, BIG_CSV.encode())
+            elif path == "/csv":
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(CSV.encode())
+                    self.send(200, body, {"Content-Encoding": "gzip"})
+                else:
+                    self.send(200, CSV.encode())
+            else:
+                self.send(404)
+
+    state["url"] = serve(Server)
+
+    return state
+
+
+def test_retry_then_success(server):
+    r = transport.get(server["url"] + "/flaky", backoff=0.01)
+    assert r.status_code == 200
+    assert server["hits"]["/flaky"] == 3
+
+
+def test_retries_give_up(server):
+    r = transport.get(server["url"] + "/busy", retries=2, backoff=0.01)
+    assert r.status_code == 503
+    assert server["hits"]["/busy"] == 3
+
+
+def test_503_not_retried_when_excluded(server):
+    # crime_month splits the area on 503 rather than retrying
+    r = transport.get(
+        server["url"] + "/busy", retry_statuses=(429, 500, 502, 504)
+    )
+    assert r.status_code == 503
+    assert server["hits"]["/busy"] == 1
+
+
+def test_retry_after(server):
+    r = transport.get(server["url"] + "/slow-down", backoff=0.01)
+    assert r.status_code == 200
+    first, second = server["times"]["/slow-down"]
+    assert second - first >= 1
+
+
+def test_retry_after_capped(server, monkeypatch):
+    monkeypatch.setattr(transport, "MAX_BACKOFF", 0.1)
+    start = time.monotonic()
+    r = transport.get(server["url"] + "/go-away")
+    assert r.status_code == 200
+    assert time.monotonic() - start < 5
+
+
+def test_rate_limit(server, monkeypatch):
+    host = urllib.parse.urlsplit(server["url"]).netloc
+    monkeypatch.setitem(transport.RATE_LIMITS, host, (20, 5))
+    start = time.monotonic()
+    for _ in range(25):
+        transport.get(server["url"] + "/missing")
+    # 5 requests in the burst, then 20 at 20 a second
+    assert time.monotonic() - start >= 0.9
+    times = server["times"]["/missing"]
+    assert len(times) == 25
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    """
+    Responses returned by transport.get during the test.
+    """
+    responses = []
+    get = transport.get
+
+    def spy(*args, **kwargs):
+        responses.append(get(*args, **kwargs))
+        return responses[-1]
+
+    monkeypatch.setattr(transport, "get", spy)
+
+    return responses
+
+
+def test_read_csv_decompresses(server, responses):
+    df = transport.read_csv(server["url"] + "/csv")
+    assert df.shape == (20000, 2)
+    assert (df.b == 2 * df.a).all()
+    assert responses[0].headers["Content-Encoding"] == "gzip"
+
+
+def test_read_csv_closes_on_error(server, responses):
+    with pytest.raises(ValueError):
+        transport.read_csv(server["url"] + "/big", usecols=["c"])
+    assert responses[0].raw.closed
+
+
+def test_read_csv_chunks(server, responses):
+    chunks = transport.read_csv(server["url"] + "/csv", chunksize=5000)
+    assert [len(chunk) for chunk in chunks] == [5000] * 4
+    # Stopping part way through also closes the response
+    chunks = transport.read_csv(server["url"] + "/big", chunksize=5000)
+    next(chunks)
+    assert not responses[1].raw.closed
+    chunks.close()
+    assert responses[1].raw.closed
+
+
+def test_download(server, tmp_path):
+    file = str(tmp_path / "data.csv")
+    assert transport.download(server["url"] + "/csv", file) == file
+    with open(file) as f:
+        assert f.read() == CSV
+    assert not (tmp_path / "data.csv.tmp").exists()
+
+
+def test_download_error_closes(server, responses, tmp_path):
+    file = str(tmp_path / "data.csv")
+    with pytest.raises(Exception, match="404"):
+        transport.download(server["url"] + "/gone", file)
+    assert responses[0].raw.closed
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_download_failure_removes_tmp(server, responses, tmp_path, monkeypatch):
+    def copy_part(src, dst, length=0):
+        dst.write(src.read(1000))
+        raise ConnectionResetError("connection lost")
+
+    monkeypatch.setattr(transport.shutil, "copyfileobj", copy_part)
+    file = str(tmp_path / "data.csv")
+    with pytest.raises(ConnectionResetError):
+        transport.download(server["url"] + "/big", file)
+    assert responses[0].raw.closed
+    assert list(tmp_path.iterdir()) == []